@@ -0,0 +1,269 @@
+"""
+Analyse a directory (or manifest) of clips from the command line.
+
+Videos are read in place; nothing is copied into data/jobs. Each clip's
+outputs (meta.json, results.json, tracks, thumbnails, profile.json) go to
+its own directory under --output, and every finished clip is appended to
+batch.jsonl there. Re-running the same command skips clips already in the
+ledger, so an interrupted batch resumes where it stopped.
+
+    python -m app.batch /footage/2024-season --workers 4
+    python -m app.batch --manifest clips.txt --output data/batch/season
+    python -m app.batch /footage --retry-failed     # re-run failed clips too
+
+A manifest lists one video path per line; blank lines and lines starting
+with '#' are ignored, and relative paths are resolved against the
+manifest's directory.
+"""
+import argparse
+import hashlib
+import json
+import os
+import re
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from pathlib import Path
+from typing import Dict, List, Any, Iterable
+
+from app.services.pipeline import analyze_video, AnalysisError
+from app.services.profiling import JobProfiler
+from app.config import DATA_DIR, BATCH_WORKERS
+
+VIDEO_EXTENSIONS = (".mp4", ".mov")
+LEDGER_NAME = "batch.jsonl"
+SUMMARY_NAME = "summary.json"
+
+
+def find_videos(inputs: Iterable[Path]) -> List[Path]:
+    """Expand files and directories (recursively) into a sorted list of videos."""
+    videos = set()
+    for path in inputs:
+        if path.is_dir():
+            videos.update(
+                p.resolve() for p in path.rglob("*")
+                if p.is_file() and p.suffix.lower() in VIDEO_EXTENSIONS
+            )
+        elif path.is_file():
+            videos.add(path.resolve())
+        else:
+            raise FileNotFoundError(f"No such file or directory: {path}")
+    return sorted(videos)
+
+
+def read_manifest(manifest_path: Path) -> List[Path]:
+    """Read video paths from a manifest file, one per line."""
+    paths = []
+    with open(manifest_path, "r") as f:
+        for line in f:
+            line = line.strip()
+            if not line or line.startswith("#"):
+                continue
+            path = Path(line).expanduser()
+            paths.append(path if path.is_absolute() else manifest_path.parent / path)
+    return paths
+
+
+def clip_id(video_path: Path) -> str:
+    """Stable, filesystem-safe output directory name for a video path."""
+    digest = hashlib.sha1(str(video_path).encode("utf-8")).hexdigest()[:10]
+    stem = re.sub(r"[^A-Za-z0-9._-]+", "-", video_path.stem).strip("-")[:60]
+    return f"{stem}-{digest}"
+
+
+def clip_fingerprint(video_path: Path) -> Dict[str, int]:
+    """Size and mtime of a video; a changed file is analysed again on resume."""
+    stat = video_path.stat()
+    return {"size": stat.st_size, "mtimeNs": stat.st_mtime_ns}
+
+
+def load_ledger(ledger_path: Path) -> Dict[str, Dict[str, Any]]:
+    """
+    Read the batch ledger, keeping the latest record per video.
+
+    A torn final line (the process was killed mid-write) is ignored.
+    """
+    records = {}
+    if not ledger_path.exists():
+        return records
+    with open(ledger_path, "r") as f:
+        for line in f:
+            try:
+                record = json.loads(line)
+            except json.JSONDecodeError:
+                continue
+            records[record["video"]] = record
+    return records
+
+
+def append_ledger(ledger_path: Path, record: Dict[str, Any]) -> None:
+    """Append one record and flush it to disk before moving on."""
+    with open(ledger_path, "a") as f:
+        f.write(json.dumps(record) + "\n")
+        f.flush()
+        os.fsync(f.fileno())
+
+
+def is_done(record: Dict[str, Any], video_path: Path, retry_failed: bool) -> bool:
+    """Check whether a ledger record still covers the video as it is on disk."""
+    if record is None:
+        return False
+    fingerprint = clip_fingerprint(video_path)
+    if record.get("size") != fingerprint["size"] or record.get("mtimeNs") != fingerprint["mtimeNs"]:
+        return False
+    return record["status"] == "completed" or (record["status"] == "failed" and not retry_failed)
+
+
+def analyze_clip(video_path: Path, output_dir: Path) -> Dict[str, Any]:
+    """
+    Run the analysis pipeline on one clip (in a worker process).
+
+    Failures are recorded rather than raised so one bad clip doesn't stop
+    the batch.
+
+    Returns:
+        Ledger record for the clip
+    """
+    output_dir.mkdir(parents=True, exist_ok=True)
+    record = {
+        "video": str(video_path),
+        "output": str(output_dir),
+        **clip_fingerprint(video_path)
+    }
+
+    profiler = JobProfiler()
+    try:
+        results = analyze_video(video_path, output_dir, profiler=profiler)
+        record["status"] = "completed"
+        record["metrics"] = results["metrics"]
+    except AnalysisError as e:
+        record["status"] = "failed"
+        record["error"] = str(e)
+    except Exception as e:
+        record["status"] = "failed"
+        record["error"] = f"{type(e).__name__}: {e}"
+    finally:
+        report = profiler.save(output_dir)
+
+    meta_path = output_dir / "meta.json"
+    duration = 0.0
+    if meta_path.exists():
+        with open(meta_path, "r") as f:
+            duration = json.load(f).get("duration", 0.0)
+
+    record["videoSeconds"] = duration
+    record["framesDecoded"] = report["counters"].get("framesDecoded", 0)
+    record["wallSeconds"] = report["totalWallSeconds"]
+    return record
+
+
+def summarize(records: List[Dict[str, Any]], skipped: int, wall_seconds: float, workers: int) -> Dict[str, Any]:
+    """Aggregate throughput for the clips analysed in this run."""
+    completed = [r for r in records if r["status"] == "completed"]
+    video_seconds = sum(r["videoSeconds"] for r in records)
+    frames = sum(r["framesDecoded"] for r in records)
+    return {
+        "clips": len(records) + skipped,
+        "analysed": len(records),
+        "completed": len(completed),
+        "failed": len(records) - len(completed),
+        "skipped": skipped,
+        "workers": workers,
+        "wallSeconds": wall_seconds,
+        "videoSeconds": video_seconds,
+        "framesDecoded": frames,
+        # Throughput over the whole run, so it includes pool start-up and stragglers
+        "realtimeFactor": video_seconds / wall_seconds if wall_seconds > 0 else None,
+        "framesPerSecond": frames / wall_seconds if wall_seconds > 0 else None,
+        "clipsPerHour": len(records) * 3600 / wall_seconds if wall_seconds > 0 else None,
+        "failures": [{"video": r["video"], "error": r.get("error")} for r in records if r["status"] != "completed"]
+    }
+
+
+def run_batch(
+    videos: List[Path],
+    output_root: Path,
+    workers: int = BATCH_WORKERS,
+    retry_failed: bool = False
+) -> Dict[str, Any]:
+    """
+    Analyse videos with a process pool, skipping clips already in the ledger.
+
+    Returns:
+        Throughput summary for this run (also written to summary.json)
+    """
+    output_root.mkdir(parents=True, exist_ok=True)
+    ledger_path = output_root / LEDGER_NAME
+    ledger = load_ledger(ledger_path)
+
+    pending = [v for v in videos if not is_done(ledger.get(str(v)), v, retry_failed)]
+    skipped = len(videos) - len(pending)
+    if skipped:
+        print(f"resuming: {skipped} of {len(videos)} clips already done", file=sys.stderr)
+
+    start = time.perf_counter()
+    records = []
+
+    def finish(record: Dict[str, Any]) -> None:
+        append_ledger(ledger_path, record)
+        records.append(record)
+        detail = f"{record['wallSeconds']:.1f}s"
+        if record["status"] != "completed":
+            detail += f", {record['error']}"
+        print(f"[{len(records)}/{len(pending)}] {record['status']} {record['video']} ({detail})", file=sys.stderr)
+
+    if workers <= 1:
+        # In-process: simpler to debug and profile
+        for video in pending:
+            finish(analyze_clip(video, output_root / "clips" / clip_id(video)))
+    else:
+        with ProcessPoolExecutor(max_workers=workers) as pool:
+            futures = [
+                pool.submit(analyze_clip, video, output_root / "clips" / clip_id(video))
+                for video in pending
+            ]
+            for future in as_completed(futures):
+                finish(future.result())
+
+    summary = summarize(records, skipped, time.perf_counter() - start, workers)
+    with open(output_root / SUMMARY_NAME, "w") as f:
+        json.dump(summary, f, indent=2)
+    return summary
+
+
+def main(argv: List[str] = None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("inputs", nargs="*", type=Path, help="Video files or directories (searched recursively)")
+    parser.add_argument("--manifest", type=Path, help="File listing one video path per line")
+    parser.add_argument("--output", type=Path, default=DATA_DIR / "batch", help="Directory for per-clip results and the ledger")
+    parser.add_argument("--workers", type=int, default=BATCH_WORKERS, help="Worker processes (1 runs in-process)")
+    parser.add_argument("--retry-failed", action="store_true", help="Re-run clips that failed in an earlier run")
+    args = parser.parse_args(argv)
+
+    inputs = list(args.inputs)
+    if args.manifest:
+        inputs += read_manifest(args.manifest)
+    if not inputs:
+        parser.error("no inputs: pass video files/directories or --manifest")
+
+    videos = find_videos(inputs)
+    if not videos:
+        print("no videos found", file=sys.stderr)
+        return 1
+
+    summary = run_batch(videos, args.output, workers=args.workers, retry_failed=args.retry_failed)
+
+    print(
+        f"{summary['completed']} completed, {summary['failed']} failed, {summary['skipped']} skipped "
+        f"in {summary['wallSeconds']:.1f}s"
+    )
+    if summary["realtimeFactor"] is not None:
+        print(
+            f"{summary['videoSeconds']:.0f}s of video at {summary['realtimeFactor']:.2f}x realtime, "
+            f"{summary['framesPerSecond']:.1f} frames/s, {summary['clipsPerHour']:.0f} clips/hour"
+        )
+    return 1 if summary["failed"] else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
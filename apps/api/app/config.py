@@ -1,8 +1,71 @@
 from pathlib import Path
 
-# Detection model settings
+# Detection model settings. The backend follows the suffix: ".pt" runs on
+# ultralytics/PyTorch, ".onnx" on ONNX Runtime (FP32 or INT8, see
+# benchmarks/export_model.py), ".xml" or "*_openvino_model" on OpenVINO.
 YOLO_MODEL = "yolov8n.pt"  # or yolov8s.pt for better accuracy
 FRAME_PROCESSING_INTERVAL = 3  # Process every 3 frames
+DETECTION_CONFIDENCE_THRESHOLD = 0.25
+DETECTION_IOU_THRESHOLD = 0.7  # NMS overlap; matches ultralytics' default
+DETECTION_MAX_DETECTIONS = 300
+DETECTION_THREADS = None  # intra-op threads for ONNX Runtime/OpenVINO; None = all cores
+# Full-quality detection in this many worker processes, each with its own model,
+# reading decoded frames from shared memory. 0 or 1 detects in the job's process.
+INFERENCE_PROCESSES = 0
+
+# Two-pass analysis. A preview pass (sparse sampling, low inference resolution)
+# publishes provisional results within seconds; a refine pass then re-detects
+# at full quality only around events and low-confidence stretches and
+# overwrites them. Refined frames are capped at REFINE_MAX_FRACTION of the
+# video, so both passes together do less inference than one full pass.
+PREVIEW_ENABLED = True
+PREVIEW_MODEL = None  # None = YOLO_MODEL; static-shape exports ignore PREVIEW_INPUT_SIZE
+PREVIEW_INPUT_SIZE = 320  # pixels (square); full quality uses the model's 640
+PREVIEW_FRAME_INTERVAL = 10  # Process every 10 frames
+REFINE_EVENT_PADDING = 1.0  # seconds re-detected either side of a provisional event
+REFINE_LOW_CONFIDENCE = 0.5  # preview frames whose best detection is below this are refined
+REFINE_MAX_FRACTION = 0.5  # of the video's frames; events first, then least confident
+
+# Ride segmentation from the preview pass. Stretches where someone moves faster
+# than RIDE_MIN_SPEED box diagonals per second relative to the scene (camera
+# motion subtracted) are rides. When rides are found, only they are refined,
+# each gets its own results, and idle footage costs just the preview.
+RIDE_SEGMENTATION_ENABLED = True
+RIDE_MIN_SPEED = 1.0  # box diagonals per second; paddling is well below
+RIDE_MIN_DURATION = 3.0  # seconds
+RIDE_MERGE_GAP = 2.0  # seconds; fast stretches closer than this are one ride
+RIDE_PADDING_BEFORE = 2.0  # seconds; take-off and pop-up come before the speed
+RIDE_PADDING_AFTER = 1.0  # seconds
+RIDE_TRACK_MAX_DISTANCE = 3.0  # box diagonals a rider may move between preview samples
+RIDE_WORKERS = 2  # rides refined concurrently (threads sharing the detector)
+
+# Detection reuse across jobs. Each job keeps a perceptual hash of its sampled
+# frames; a new upload matching part of an earlier job (a trimmed or
+# re-encoded copy) takes that job's detections for the shared frames and runs
+# inference only on the rest. Each reused frame's hash is checked first, so
+# edited footage falls back to inference.
+DETECTION_REUSE_ENABLED = True
+FINGERPRINT_INTERVAL = 3  # frames between hashed frames
+FINGERPRINT_PROBE_FRAMES = 24  # frames of a new upload hashed to look it up
+FINGERPRINT_MAX_DISTANCE = 6  # bits (of 64) two hashes of the same frame may differ by
+FINGERPRINT_MIN_MATCHES = 6  # probe frames that must agree on one time offset
+
+# Tracking of sparsely sampled streams (the preview pass, and preview frames
+# left between refined ranges): detections that overlap no track continue the
+# nearest one within this many box diagonals (None = IoU matching only). Full
+# passes always match by IoU only.
+TRACK_MAX_CENTER_DISTANCE = 1.0
+
+# Multi-surfer analysis: besides the primary track, every track whose detections
+# span at least MULTI_TRACK_MIN_DURATION seconds gets its own metrics, events and
+# tips (the longest MULTI_TRACK_MAX_TRACKS of them)
+MULTI_TRACK_MIN_DURATION = 3.0
+MULTI_TRACK_MAX_TRACKS = 12
+
+# Track resampling onto a uniform timebase
+TRACK_INTERPOLATION_STEP = 1  # frames between resampled track samples
+TRACK_INTERPOLATION_METHOD = "linear"  # or "spline"
+TRACK_INTERPOLATION_MAX_GAP = 30  # frames; longer gaps are left unfilled
 
 # Event detection thresholds
 POPUP_HEIGHT_INCREASE_THRESHOLD = 0.3  # 30% increase
@@ -12,6 +75,12 @@ POPUP_VERTICAL_VELOCITY_THRESHOLD = 10  # pixels per frame
 TURN_ANGULAR_VELOCITY_THRESHOLD = 45  # degrees per second
 TURN_MIN_DURATION = 0.3  # seconds
 
+# Coaching rules (data, see app/services/coaching.py). Editing them, MAX_TIPS
+# or MIN_TIP_CONFIDENCE changes the rules version; `python -m app.rescore`
+# then re-scores the tips of stored results
+COACHING_RULES_PATH = Path(__file__).parent / "coaching_rules.json"
+MAX_TIPS = 3  # per result, highest impact first
+
 # Confidence thresholds
 MIN_TIP_CONFIDENCE = 0.7
 DETECTION_QUALITY_WEIGHT = 0.7
@@ -19,14 +88,52 @@ METRIC_RELIABILITY_WEIGHT = 0.3
 
 # File limits
 MAX_FILE_SIZE_MB = 500
+MAX_VIDEO_DURATION = 20 * 60  # seconds; longer uploads are rejected before a job is queued
+PROBE_TIMEOUT = 15  # seconds allowed for ffprobe to read an upload
+
+# Resumable uploads
+UPLOAD_CHUNK_SIZE = 8 * 1024 * 1024  # bytes per PUT suggested to clients
+UPLOAD_TTL_HOURS = 24  # unfinished uploads idle this long are removed by the sweeper
 
 # Video processing
 VIDEO_CODEC = "libx264"
 VIDEO_FORMAT = "mp4"
 
+# Thumbnail sprite (timeline scrubbing previews)
+THUMBNAIL_INTERVAL = 1.0  # seconds between tiles (minimum)
+THUMBNAIL_MAX_TILES = 120  # interval grows for long clips to stay under this
+THUMBNAIL_WIDTH = 160  # pixels; height follows the video aspect ratio
+THUMBNAIL_COLUMNS = 10
+THUMBNAIL_JPEG_QUALITY = 75
+
+# Event clips (stream-copied, so actual start snaps to the previous keyframe)
+CLIP_PRE_ROLL = 2.0  # seconds before the event
+CLIP_POST_ROLL = 3.0  # seconds after the event
+
+# HLS packaging (optional; stream-copies the video into segments after analysis)
+HLS_ENABLED = False
+HLS_SEGMENT_DURATION = 4  # seconds (segments split on keyframes when stream-copying)
+
+# Batch CLI (python -m app.batch): worker processes, each loading its own model
+BATCH_WORKERS = 2
+
+# Storage retention. Inputs are stored once per content hash under BLOBS_DIR
+# and hardlinked into jobs; the sweeper evicts videos and derived artifacts
+# (keeping results.json) of jobs unused for STORAGE_TTL_DAYS, then least
+# recently used jobs while usage exceeds STORAGE_QUOTA_GB. None disables either.
+STORAGE_TTL_DAYS = 30
+STORAGE_QUOTA_GB = 50
+STORAGE_SWEEP_INTERVAL = 3600  # seconds between background sweeps
+
+# Code-level profiling dump per job: None, "cprofile" or "pyinstrument"
+PROFILE_JOBS = None
+
 # Data directories (relative to project root)
 PROJECT_ROOT = Path(__file__).parent.parent.parent.parent
 DATA_DIR = PROJECT_ROOT / "data"
 JOBS_DIR = DATA_DIR / "jobs"
 UPLOADS_DIR = DATA_DIR / "uploads"
+BLOBS_DIR = DATA_DIR / "blobs"
+ANALYTICS_DIR = DATA_DIR / "analytics"  # metrics of completed jobs, for trend queries
+RESCORE_LEDGER = DATA_DIR / "rescore.jsonl"  # results files already re-scored (python -m app.rescore)
 
@@ -1,8 +1,30 @@
+import asyncio
+from contextlib import asynccontextmanager
 from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
-from app.routes import videos, jobs
+from fastapi.responses import JSONResponse, ORJSONResponse
+from app.routes import videos, jobs, monitoring, analytics
+from app.services.storage import run_sweeper
+from app.services.worker import fail_interrupted_jobs
+from app.services.json_codec import orjson
 
-app = FastAPI(title="Surf Coach API", version="0.1.0")
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # Background tasks die with the process; don't leave their jobs spinning forever
+    fail_interrupted_jobs()
+    # Background retention sweeper (TTL/quota eviction, orphaned input cleanup)
+    sweeper = asyncio.create_task(run_sweeper())
+    yield
+    sweeper.cancel()
+
+
+app = FastAPI(
+    title="Surf Coach API",
+    version="0.1.0",
+    lifespan=lifespan,
+    default_response_class=ORJSONResponse if orjson is not None else JSONResponse
+)
 
 # CORS middleware for local development
 app.add_middleware(
@@ -15,6 +37,8 @@ app.add_middleware(
 
 app.include_router(videos.router, prefix="/api", tags=["videos"])
 app.include_router(jobs.router, prefix="/api/jobs", tags=["jobs"])
+app.include_router(monitoring.router, prefix="/api", tags=["monitoring"])
+app.include_router(analytics.router, prefix="/api/analytics", tags=["analytics"])
 
 @app.get("/")
 async def root():
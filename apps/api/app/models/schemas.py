@@ -4,12 +4,31 @@ from typing import Optional, List, Dict, Any
 
 class VideoUploadResponse(BaseModel):
     jobId: str
+    metadata: Optional[Dict[str, Any]] = None  # fps, size, duration from the upload probe
+
+
+class UploadInitRequest(BaseModel):
+    filename: str
+    size: int  # bytes
+    surferId: Optional[str] = None  # whose clip this is, for trends across jobs
+
+
+class UploadSession(BaseModel):
+    uploadId: str
+    filename: str
+    size: int  # declared total, bytes
+    offset: int  # bytes received so far; the next PUT starts here
+    chunkSize: int  # suggested bytes per PUT
+    surferId: Optional[str] = None
+    jobId: Optional[str] = None  # set once finalized
 
 
 class JobStatus(BaseModel):
     status: str  # 'pending' | 'processing' | 'completed' | 'failed'
     progress: float  # 0.0 to 1.0
     error: Optional[str] = None
+    evicted: bool = False  # video and derived artifacts removed; results remain
+    provisional: bool = False  # preview results are available while the refine pass runs
 
 
 class Event(BaseModel):
@@ -26,10 +45,41 @@ class Tip(BaseModel):
     impact: str  # 'high' | 'medium' | 'low'
 
 
+class Ride(BaseModel):
+    rideId: int
+    start: float  # seconds
+    end: float
+    startFrame: int
+    endFrame: int  # exclusive
+    metrics: Dict[str, Any]
+    events: List[Event]
+    tips: List[Tip]
+    confidence: Optional[float] = None
+
+
+class Surfer(BaseModel):
+    trackId: int
+    primary: bool
+    start: float  # seconds
+    end: float
+    startFrame: int
+    endFrame: int  # exclusive
+    metrics: Dict[str, Any]
+    events: List[Event]
+    tips: List[Tip]
+    confidence: Optional[float] = None
+
+
 class JobResults(BaseModel):
     metrics: Dict[str, Any]
     events: List[Event]
     tips: List[Tip]
+    confidence: Optional[float] = None  # overall analysis confidence the tips were scored at
+    rulesVersion: Optional[str] = None  # coaching rules the tips come from
+    provisional: bool = False  # from the preview pass; replaced when refinement finishes
+    rides: List[Ride] = []  # per-ride results when the clip was segmented into rides
+    primaryTrackId: Optional[int] = None
+    surfers: List[Surfer] = []  # per-track results; the primary's match the top level
 
 
 class TrackFrame(BaseModel):
@@ -37,8 +87,39 @@ class TrackFrame(BaseModel):
     bbox: List[float]  # [x1, y1, x2, y2]
     centroid: List[float]  # [x, y]
     trackId: int
+    interpolated: bool = False  # filled in between detected frames
 
 
 class JobTracks(BaseModel):
     frames: List[TrackFrame]
 
+
+
+class ThumbnailTile(BaseModel):
+    timestamp: float
+    x: int
+    y: int
+
+
+class ThumbnailIndex(BaseModel):
+    sprite: str  # URL of the sprite sheet image
+    tileWidth: int
+    tileHeight: int
+    columns: int
+    interval: float  # seconds between tiles
+    tiles: List[ThumbnailTile]
+
+
+class TrendBucket(BaseModel):
+    periodStart: str  # ISO date of the day, week (Monday) or month
+    count: int  # jobs in the period with the metric defined
+    mean: float
+    min: float
+    max: float
+
+
+class MetricTrend(BaseModel):
+    metric: str
+    period: str  # 'day' | 'week' | 'month'
+    surferId: Optional[str] = None  # None: every surfer's jobs
+    buckets: List[TrendBucket]
@@ -0,0 +1,213 @@
+"""
+Re-score the coaching tips of stored results after the rules change.
+
+Each results.json (the top level, every surfer and every ride) is run
+through the current coaching rules (app/coaching_rules.json) and rewritten
+if its tips or rules version changed. Results are evaluated a chunk of jobs
+at a time, in one array pass per chunk.
+
+It is incremental: every results file checked is recorded in a ledger with
+its size, mtime and the rules version it was checked against. A re-run
+skips files unchanged since then, so after a rules edit only the stored
+results are re-scored, and after that only jobs analysed since.
+
+    python -m app.rescore                          # every job in data/jobs
+    python -m app.rescore data/batch/2024/clips    # batch outputs
+    python -m app.rescore --force                  # ignore the ledger
+
+Provisional results (a job still refining) are skipped and picked up by
+the next run. Results written before confidence was stored keep their
+tips where no tip records the confidence they were scored at.
+"""
+import argparse
+import json
+import os
+import sys
+import time
+from pathlib import Path
+from typing import Any, Dict, Iterator, List, Optional, Tuple
+
+from app.services.coaching import CoachingRules, RULES
+from app.services.json_codec import dumps, read_json, write_atomic
+from app.config import JOBS_DIR, RESCORE_LEDGER
+
+RESULTS_NAME = "results.json"
+CHUNK_JOBS = 1000  # results files loaded and evaluated together
+
+
+def find_results(roots: List[Path]) -> List[Path]:
+    """results.json of every job directory directly under the roots, sorted."""
+    paths = []
+    for root in roots:
+        if not root.is_dir():
+            raise FileNotFoundError(f"No such directory: {root}")
+        paths.extend(path for path in root.glob(f"*/{RESULTS_NAME}") if path.is_file())
+    return sorted(path.resolve() for path in paths)
+
+
+def load_ledger(ledger_path: Path) -> Dict[str, Dict[str, Any]]:
+    """
+    Read the ledger, keeping the latest record per results file.
+
+    A torn final line (the process was killed mid-write) is ignored.
+    """
+    records = {}
+    if not ledger_path.exists():
+        return records
+    with open(ledger_path, "r") as f:
+        for line in f:
+            try:
+                record = json.loads(line)
+            except json.JSONDecodeError:
+                continue
+            records[record["path"]] = record
+    return records
+
+
+def append_ledger(ledger_path: Path, records: List[Dict[str, Any]]) -> None:
+    """Append records and flush them to disk before moving on."""
+    if not records:
+        return
+    ledger_path.parent.mkdir(parents=True, exist_ok=True)
+    with open(ledger_path, "a") as f:
+        f.write("".join(json.dumps(record) + "\n" for record in records))
+        f.flush()
+        os.fsync(f.fileno())
+
+
+def ledger_record(path: Path, rules_version: str) -> Dict[str, Any]:
+    stat = path.stat()
+    return {"path": str(path), "size": stat.st_size, "mtimeNs": stat.st_mtime_ns, "rulesVersion": rules_version}
+
+
+def is_current(record: Optional[Dict[str, Any]], path: Path, rules_version: str) -> bool:
+    """Whether the ledger says the file was checked, as it is now, against these rules."""
+    if record is None or record.get("rulesVersion") != rules_version:
+        return False
+    stat = path.stat()
+    return record.get("size") == stat.st_size and record.get("mtimeNs") == stat.st_mtime_ns
+
+
+def result_blocks(results: Dict[str, Any]) -> Iterator[Dict[str, Any]]:
+    """Every part of a results file that carries tips: the top level, surfers and rides."""
+    yield results
+    for key in ("surfers", "rides"):
+        for block in results.get(key) or []:
+            yield from result_blocks(block)
+
+
+def block_confidence(block: Dict[str, Any]) -> Optional[float]:
+    """The confidence a block's tips were scored at, or None if it wasn't recorded."""
+    if block.get("confidence") is not None:
+        return block["confidence"]
+    tips = block.get("tips") or []
+    # Older results only kept it on the tips themselves
+    return tips[0]["confidence"] if tips else None
+
+
+def rescore_chunk(paths: List[Path], rules: CoachingRules) -> Tuple[Dict[str, int], List[Path]]:
+    """
+    Re-score a chunk of results files in one evaluation and rewrite those that changed.
+
+    Returns:
+        Counts (rescored, rewritten, skipped: provisional or unreadable) and
+        the files that were rescored
+    """
+    counts = {"rescored": 0, "rewritten": 0, "skipped": 0}
+    loaded = []
+    for path in paths:
+        try:
+            results = read_json(path)
+        except (OSError, ValueError):
+            counts["skipped"] += 1
+            continue
+        if results.get("provisional"):
+            counts["skipped"] += 1
+            continue
+        loaded.append((path, results))
+
+    # (index into loaded, block) for every block whose confidence is known
+    blocks = []
+    records = []
+    for job, (_, results) in enumerate(loaded):
+        for block in result_blocks(results):
+            confidence = block_confidence(block)
+            if confidence is None:
+                continue
+            blocks.append((job, block))
+            records.append((block.get("metrics") or {}, block.get("events") or [], confidence))
+
+    changed = [results.get("rulesVersion") != rules.version for _, results in loaded]
+    for (job, block), tips in zip(blocks, rules.tips(records) if records else []):
+        if block.get("tips") != tips:
+            block["tips"] = tips
+            changed[job] = True
+
+    for (path, results), rewrite in zip(loaded, changed):
+        counts["rescored"] += 1
+        if rewrite:
+            results["rulesVersion"] = rules.version
+            write_atomic(path, dumps(results, indent=True))
+            counts["rewritten"] += 1
+    return counts, [path for path, _ in loaded]
+
+
+def rescore(
+    roots: List[Path],
+    ledger_path: Path = RESCORE_LEDGER,
+    rules: CoachingRules = RULES,
+    force: bool = False,
+    chunk_jobs: int = CHUNK_JOBS
+) -> Dict[str, Any]:
+    """
+    Re-score every results file under the roots that the ledger doesn't cover.
+
+    Returns:
+        Summary: rulesVersion, files found, unchanged (skipped via the
+        ledger), rescored, rewritten, skipped, wallSeconds
+    """
+    start = time.perf_counter()
+    ledger = {} if force else load_ledger(ledger_path)
+    paths = find_results(roots)
+    pending = [path for path in paths if not is_current(ledger.get(str(path)), path, rules.version)]
+
+    summary = {
+        "rulesVersion": rules.version,
+        "files": len(paths),
+        "unchanged": len(paths) - len(pending),
+        "rescored": 0,
+        "rewritten": 0,
+        "skipped": 0
+    }
+    for i in range(0, len(pending), chunk_jobs):
+        chunk = pending[i:i + chunk_jobs]
+        counts, rescored = rescore_chunk(chunk, rules)
+        for key, value in counts.items():
+            summary[key] += value
+        # Stat after writing, so the rewritten files themselves are current
+        append_ledger(ledger_path, [ledger_record(path, rules.version) for path in rescored])
+        print(f"[{min(i + chunk_jobs, len(pending))}/{len(pending)}] {summary['rewritten']} rewritten", file=sys.stderr)
+
+    summary["wallSeconds"] = time.perf_counter() - start
+    return summary
+
+
+def main(argv: List[str] = None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("roots", nargs="*", type=Path, help="Directories of job directories (default: data/jobs)")
+    parser.add_argument("--ledger", type=Path, default=RESCORE_LEDGER, help="Record of results files already checked")
+    parser.add_argument("--force", action="store_true", help="Re-score every file, ignoring the ledger")
+    parser.add_argument("--chunk", type=int, default=CHUNK_JOBS, help="Results files evaluated together")
+    args = parser.parse_args(argv)
+
+    summary = rescore(args.roots or [JOBS_DIR], args.ledger, force=args.force, chunk_jobs=args.chunk)
+    print(
+        f"rules {summary['rulesVersion']}: {summary['rewritten']} of {summary['files']} results rewritten "
+        f"({summary['unchanged']} unchanged since the last run, {summary['skipped']} skipped) "
+        f"in {summary['wallSeconds']:.1f}s"
+    )
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,55 @@
+from datetime import date, datetime, timedelta, timezone
+from typing import Optional
+from fastapi import APIRouter, HTTPException, Query
+from app.models.schemas import MetricTrend, TrendBucket
+from app.services.analytics import get_metrics_store, METRIC_NAMES, PERIODS
+
+router = APIRouter()
+
+EPOCH = date(1970, 1, 1)
+
+
+@router.get("/trends", response_model=MetricTrend)
+def get_trend(
+    metric: str = Query(...),
+    period: str = Query("week"),
+    surferId: Optional[str] = Query(None),
+    start: Optional[date] = Query(None),
+    end: Optional[date] = Query(None)
+):
+    """
+    Aggregate a metric over completed jobs per day, week or month (UTC).
+    
+    Served from rollups kept up to date as jobs complete, so the cost depends
+    on the number of periods returned, not the number of jobs. Without
+    surferId every job counts, including those uploaded without one. start
+    and end are inclusive dates; the periods containing them are returned whole.
+    """
+    if metric not in METRIC_NAMES:
+        raise HTTPException(status_code=400, detail=f"Unknown metric. Use one of: {', '.join(METRIC_NAMES)}")
+    if period not in PERIODS:
+        raise HTTPException(status_code=400, detail=f"Unknown period. Use one of: {', '.join(PERIODS)}")
+    
+    buckets = get_metrics_store().trend(
+        metric,
+        period,
+        surfer_id=surferId,
+        start=_timestamp(start),
+        end=_timestamp(end)
+    )
+    return MetricTrend(
+        metric=metric,
+        period=period,
+        surferId=surferId,
+        buckets=[
+            TrendBucket(**{**bucket, "periodStart": (EPOCH + timedelta(days=bucket["periodStart"])).isoformat()})
+            for bucket in buckets
+        ]
+    )
+
+
+def _timestamp(day: Optional[date]) -> Optional[float]:
+    """Unix time of midnight UTC on a date."""
+    if day is None:
+        return None
+    return datetime(day.year, day.month, day.day, tzinfo=timezone.utc).timestamp()
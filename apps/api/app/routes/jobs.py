@@ -1,8 +1,26 @@
-from fastapi import APIRouter, HTTPException
-from fastapi.responses import FileResponse
-from app.models.schemas import JobStatus, JobResults, JobTracks
+from fastapi import APIRouter, HTTPException, Header, Query
+from fastapi.concurrency import run_in_threadpool
+from fastapi.responses import FileResponse, Response
+from app.models.schemas import JobStatus, JobResults, JobTracks, ThumbnailIndex
+from app.services.video_processor import extract_clip
+from app.services.storage import touch_job
+from app.services.json_codec import read_json, dumps, write_atomic
+from app.config import CLIP_PRE_ROLL, CLIP_POST_ROLL
+from app.services.track_encoding import (
+    TRACKS_BINARY_MEDIA_TYPE,
+    encode_tracks_binary,
+    encode_track_columns,
+    open_track_columns,
+    window_track_columns,
+    filter_track_columns,
+    columns_to_tracks,
+    wants_binary,
+    compress_response
+)
 from pathlib import Path
-import json
+from typing import Optional, Tuple
+import math
+import re
 
 router = APIRouter()
 
@@ -10,9 +28,36 @@ router = APIRouter()
 DATA_DIR = Path(__file__).parent.parent.parent.parent.parent / "data"
 JOBS_DIR = DATA_DIR / "jobs"
 
+# Handlers are plain functions unless they await something: FastAPI runs them
+# in its threadpool, so file reads and compression never block the event loop.
+
+# Artifacts that never change once written
+IMMUTABLE_CACHE_CONTROL = "public, max-age=31536000, immutable"
+# Artifacts whose URL outlives their contents (e.g. across re-analysis); served
+# with an ETag, so a revalidation costs a 304
+REVALIDATE_CACHE_CONTROL = "no-cache"
+
+# Segments are named segment_<version>_<n>.ts; unversioned names are from
+# packagings before segment names carried a version
+HLS_FILENAME_PATTERN = re.compile(r"^(index\.m3u8|segment_([0-9a-f]{8}_)?\d+\.ts)$")
+HLS_VERSIONED_SEGMENT_PATTERN = re.compile(r"^segment_[0-9a-f]{8}_\d+\.ts$")
+HLS_MEDIA_TYPES = {
+    ".m3u8": "application/vnd.apple.mpegurl",
+    ".ts": "video/mp2t"
+}
+
+
+def _missing_artifact(job_dir: Path, detail: str) -> HTTPException:
+    """404 for an artifact not written yet; 410 once the retention policy removed it."""
+    meta_path = job_dir / "meta.json"
+    if meta_path.exists():
+        if read_json(meta_path).get("evicted"):
+            return HTTPException(status_code=410, detail="Removed by the storage retention policy. Results are still available.")
+    return HTTPException(status_code=404, detail=detail)
+
 
 @router.get("/{job_id}", response_model=JobStatus)
-async def get_job_status(job_id: str):
+def get_job_status(job_id: str):
     """Get job status and progress."""
     job_dir = JOBS_DIR / job_id
     
@@ -23,18 +68,19 @@ async def get_job_status(job_id: str):
     if not meta_path.exists():
         raise HTTPException(status_code=404, detail="Job metadata not found")
     
-    with open(meta_path, "r") as f:
-        meta = json.load(f)
+    meta = read_json(meta_path)
     
     return JobStatus(
         status=meta.get("status", "pending"),
         progress=meta.get("progress", 0),
-        error=meta.get("error")
+        error=meta.get("error"),
+        evicted=meta.get("evicted", False),
+        provisional=meta.get("provisional", False)
     )
 
 
 @router.get("/{job_id}/results", response_model=JobResults)
-async def get_job_results(job_id: str):
+def get_job_results(job_id: str):
     """Get analysis results for a job."""
     job_dir = JOBS_DIR / job_id
     
@@ -45,15 +91,35 @@ async def get_job_results(job_id: str):
     if not results_path.exists():
         raise HTTPException(status_code=404, detail="Results not yet available. Job may still be processing.")
     
-    with open(results_path, "r") as f:
-        results = json.load(f)
+    results = read_json(results_path)
     
+    touch_job(job_dir)
     return JobResults(**results)
 
 
-@router.get("/{job_id}/tracks", response_model=JobTracks)
-async def get_job_tracks(job_id: str):
-    """Get tracking data for a job."""
+@router.get(
+    "/{job_id}/tracks",
+    response_model=JobTracks,
+    responses={200: {"content": {TRACKS_BINARY_MEDIA_TYPE: {}}}}
+)
+def get_job_tracks(
+    job_id: str,
+    start: Optional[float] = Query(None, ge=0),
+    end: Optional[float] = Query(None, ge=0),
+    unit: str = Query("seconds", pattern="^(seconds|frames)$"),
+    track_id: Optional[int] = Query(None, alias="trackId"),
+    accept: Optional[str] = Header(None),
+    accept_encoding: Optional[str] = Header(None)
+):
+    """
+    Get tracking data for a job.
+    
+    Send `Accept: application/vnd.surf-coach.tracks` for the columnar binary
+    layout; gzip/brotli compression follows Accept-Encoding. Pass `start`
+    and/or `end` (in `unit` of seconds or frames, inclusive) to fetch only a
+    window of the track, and `trackId` for one surfer's samples (see the
+    results' `surfers`).
+    """
     job_dir = JOBS_DIR / job_id
     
     if not job_dir.exists():
@@ -61,16 +127,102 @@ async def get_job_tracks(job_id: str):
     
     tracks_path = job_dir / "tracks.json"
     if not tracks_path.exists():
-        raise HTTPException(status_code=404, detail="Tracks not yet available. Job may still be processing.")
+        raise _missing_artifact(job_dir, "Tracks not yet available. Job may still be processing.")
+    
+    binary_path = job_dir / "tracks.bin"
+    if not binary_path.exists():
+        # Jobs processed before the binary artifact existed; build it once, atomically,
+        # since a concurrent request may map it as soon as it exists
+        write_atomic(binary_path, encode_tracks_binary(read_json(tracks_path)["frames"]))
+    
+    windowed = start is not None or end is not None
+    filtered = windowed or track_id is not None
+    if filtered:
+        columns = open_track_columns(binary_path)
+        if windowed:
+            start_frame, end_frame = _window_to_frames(job_dir, start, end, unit)
+            columns = window_track_columns(columns, start_frame, end_frame)
+        if track_id is not None:
+            columns = filter_track_columns(columns, track_id)
+    
+    if wants_binary(accept):
+        media_type = TRACKS_BINARY_MEDIA_TYPE
+        body = encode_track_columns(columns) if filtered else binary_path.read_bytes()
+    else:
+        media_type = "application/json"
+        if filtered:
+            body = dumps({"frames": columns_to_tracks(columns)})
+        else:
+            body = tracks_path.read_bytes()
+    
+    body, headers = compress_response(body, accept_encoding)
+    return Response(content=body, media_type=media_type, headers=headers)
+
+
+def _window_to_frames(
+    job_dir: Path,
+    start: Optional[float],
+    end: Optional[float],
+    unit: str
+) -> Tuple[Optional[int], Optional[int]]:
+    """Convert a track window query into an inclusive frame range."""
+    if unit == "frames":
+        start_frame = None if start is None else math.floor(start)
+        end_frame = None if end is None else math.floor(end)
+        return start_frame, end_frame
+    
+    fps = read_json(job_dir / "meta.json").get("fps") or 0
+    if fps <= 0:
+        raise HTTPException(status_code=400, detail="Video frame rate unknown; query the window in frames.")
+    
+    start_frame = None if start is None else math.floor(start * fps)
+    end_frame = None if end is None else math.ceil(end * fps)
+    return start_frame, end_frame
+
+
+@router.get("/{job_id}/thumbnails", response_model=ThumbnailIndex)
+def get_job_thumbnails(job_id: str):
+    """Get the thumbnail sprite index (timestamp -> tile) for timeline scrubbing."""
+    job_dir = JOBS_DIR / job_id
     
-    with open(tracks_path, "r") as f:
-        tracks = json.load(f)
+    if not job_dir.exists():
+        raise HTTPException(status_code=404, detail="Job not found")
+    
+    index_path = job_dir / "thumbnails.json"
+    if not index_path.exists():
+        raise _missing_artifact(job_dir, "Thumbnails not yet available. Job may still be processing.")
+    
+    index = read_json(index_path)
+    
+    index["sprite"] = f"/api/jobs/{job_id}/thumbnails/sprite.jpg"
+    return Response(
+        content=dumps(ThumbnailIndex(**index).model_dump()),
+        media_type="application/json",
+        headers={"Cache-Control": IMMUTABLE_CACHE_CONTROL}
+    )
+
+
+@router.get("/{job_id}/thumbnails/sprite.jpg")
+def get_job_thumbnail_sprite(job_id: str):
+    """Serve the thumbnail sprite sheet."""
+    job_dir = JOBS_DIR / job_id
     
-    return JobTracks(**tracks)
+    if not job_dir.exists():
+        raise HTTPException(status_code=404, detail="Job not found")
+    
+    sprite_path = job_dir / "sprite.jpg"
+    if not sprite_path.exists():
+        raise _missing_artifact(job_dir, "Thumbnails not found")
+    
+    return FileResponse(
+        sprite_path,
+        media_type="image/jpeg",
+        headers={"Cache-Control": IMMUTABLE_CACHE_CONTROL}
+    )
 
 
 @router.get("/{job_id}/video")
-async def get_job_video(job_id: str):
+def get_job_video(job_id: str):
     """Stream the processed video file."""
     job_dir = JOBS_DIR / job_id
     
@@ -79,8 +231,9 @@ async def get_job_video(job_id: str):
     
     video_path = job_dir / "input.mp4"
     if not video_path.exists():
-        raise HTTPException(status_code=404, detail="Video not found")
+        raise _missing_artifact(job_dir, "Video not found")
     
+    touch_job(job_dir)
     return FileResponse(
         video_path,
         media_type="video/mp4",
@@ -89,7 +242,7 @@ async def get_job_video(job_id: str):
 
 
 @router.get("/{job_id}/overlay")
-async def get_job_overlay(job_id: str):
+def get_job_overlay(job_id: str):
     """Stream overlay video if available."""
     job_dir = JOBS_DIR / job_id
     
@@ -98,7 +251,7 @@ async def get_job_overlay(job_id: str):
     
     overlay_path = job_dir / "overlay.mp4"
     if not overlay_path.exists():
-        raise HTTPException(status_code=404, detail="Overlay not found")
+        raise _missing_artifact(job_dir, "Overlay not found")
     
     return FileResponse(
         overlay_path,
@@ -106,3 +259,100 @@ async def get_job_overlay(job_id: str):
         headers={"Accept-Ranges": "bytes"}
     )
 
+
+
+@router.get("/{job_id}/video/hls/{filename}")
+def get_job_video_hls(job_id: str, filename: str):
+    """Serve the HLS playlist and segments for the job video."""
+    return _hls_file_response(job_id, "video", filename)
+
+
+@router.get("/{job_id}/overlay/hls/{filename}")
+def get_job_overlay_hls(job_id: str, filename: str):
+    """Serve the HLS playlist and segments for the overlay video."""
+    return _hls_file_response(job_id, "overlay", filename)
+
+
+def _hls_file_response(job_id: str, source: str, filename: str) -> FileResponse:
+    job_dir = JOBS_DIR / job_id
+    
+    if not job_dir.exists():
+        raise HTTPException(status_code=404, detail="Job not found")
+    
+    if not HLS_FILENAME_PATTERN.match(filename):
+        raise HTTPException(status_code=404, detail="HLS file not found")
+    
+    hls_path = job_dir / "hls" / source / filename
+    if not hls_path.exists():
+        raise _missing_artifact(job_dir, "HLS stream not available")
+    
+    # Versioned segments are immutable (repackaging writes new names); the
+    # playlist is revalidated in case the job is repackaged
+    if HLS_VERSIONED_SEGMENT_PATTERN.match(filename):
+        cache_control = IMMUTABLE_CACHE_CONTROL
+    else:
+        cache_control = "public, max-age=60"
+    
+    return FileResponse(
+        hls_path,
+        media_type=HLS_MEDIA_TYPES[hls_path.suffix],
+        headers={"Cache-Control": cache_control}
+    )
+
+
+@router.get("/{job_id}/clips/{event_index}")
+async def get_event_clip(job_id: str, event_index: int, if_none_match: Optional[str] = Header(None)):
+    """
+    Get a short clip around a detected event.
+    
+    Clips are cut by stream copy and cached in the job directory, so only the
+    first request for an event pays for the remux. The event at an index
+    changes when the job is refined or re-analysed, so browsers revalidate
+    against an ETag of the event's timestamp instead of caching the URL.
+    """
+    job_dir = JOBS_DIR / job_id
+    
+    if not job_dir.exists():
+        raise HTTPException(status_code=404, detail="Job not found")
+    
+    results_path = job_dir / "results.json"
+    if not results_path.exists():
+        raise HTTPException(status_code=404, detail="Results not yet available. Job may still be processing.")
+    
+    events = (await run_in_threadpool(read_json, results_path)).get("events", [])
+    
+    if event_index < 0 or event_index >= len(events):
+        raise HTTPException(status_code=404, detail="Event not found")
+    
+    video_path = job_dir / "input.mp4"
+    if not video_path.exists():
+        raise await run_in_threadpool(_missing_artifact, job_dir, "Video not found")
+    
+    # Key the cache on the timestamp too, so re-analysed jobs never serve stale clips
+    timestamp = events[event_index]["timestamp"]
+    clip_key = f"{event_index}-{int(round(timestamp * 1000))}"
+    clip_path = job_dir / "clips" / f"{clip_key}.mp4"
+    cache_headers = {"ETag": f'"{clip_key}"', "Cache-Control": REVALIDATE_CACHE_CONTROL}
+    
+    if if_none_match and cache_headers["ETag"] in [tag.strip() for tag in if_none_match.split(",")]:
+        return Response(status_code=304, headers=cache_headers)
+    
+    if not clip_path.exists():
+        try:
+            await run_in_threadpool(
+                extract_clip,
+                video_path,
+                clip_path,
+                timestamp - CLIP_PRE_ROLL,
+                CLIP_PRE_ROLL + CLIP_POST_ROLL
+            )
+        except RuntimeError as e:
+            raise HTTPException(status_code=500, detail=str(e))
+    
+    return FileResponse(
+        clip_path,
+        media_type="video/mp4",
+        filename=f"{job_id}-event-{event_index}.mp4",
+        content_disposition_type="inline",
+        headers={"Accept-Ranges": "bytes", **cache_headers}
+    )
@@ -0,0 +1,14 @@
+from fastapi import APIRouter
+from fastapi.responses import PlainTextResponse
+from app.services.profiling import METRICS
+
+router = APIRouter()
+
+
+@router.get("/metrics", response_class=PlainTextResponse)
+async def get_metrics():
+    """Expose pipeline metrics in the Prometheus text format."""
+    return PlainTextResponse(
+        METRICS.render(),
+        media_type="text/plain; version=0.0.4"
+    )
@@ -1,8 +1,20 @@
-from fastapi import APIRouter, UploadFile, File, HTTPException, BackgroundTasks
-from app.models.schemas import VideoUploadResponse
-from app.services.worker import run_job_sync
+from fastapi import APIRouter, UploadFile, File, Form, HTTPException, BackgroundTasks, Request, Query
+from fastapi.concurrency import run_in_threadpool
+from app.models.schemas import VideoUploadResponse, UploadInitRequest, UploadSession
+from app.services.worker import run_job_sync, process_owner
+from app.services.storage import store_input_stream, ingest_input_file
+from app.services.uploads import create_upload, load_upload, upload_data_path, delete_upload, complete_upload
+from app.services.video_processor import save_metadata
+from app.services.json_codec import write_json
+from app.services.probe import probe_video, sniff_container, ProbeError, HEADER_PROBE_BYTES
+from app.services.analytics import SURFER_ID_PATTERN
+from app.config import MAX_FILE_SIZE_MB, UPLOAD_CHUNK_SIZE
+from typing import BinaryIO, Dict, Any, Optional
+import asyncio
+import shutil
 import uuid
 import os
+import weakref
 from pathlib import Path
 
 router = APIRouter()
@@ -12,57 +24,279 @@ DATA_DIR = Path(__file__).parent.parent.parent.parent.parent / "data"
 JOBS_DIR = DATA_DIR / "jobs"
 JOBS_DIR.mkdir(parents=True, exist_ok=True)
 
+SUPPORTED_EXTENSIONS = [".mp4", ".mov"]
+
+# Blocking file work (writes, hashing, probing) runs in the threadpool so a large
+# upload never stalls other requests; handlers that await nothing are plain
+# functions, which FastAPI runs there too.
+
+# Streamed request bodies arrive in small pieces; they are written to disk in
+# batches of this size so each threadpool hop does a useful amount of work
+UPLOAD_WRITE_BUFFER_SIZE = 1024 * 1024
+
+# One chunk in flight per upload; a second concurrent PUT would interleave writes
+# (weakly held: a lock lives only while a request for the upload holds it, so
+# abandoned or expired uploads don't leave one behind)
+_upload_locks: "weakref.WeakValueDictionary[str, asyncio.Lock]" = weakref.WeakValueDictionary()
+
 
 @router.post("/videos", response_model=VideoUploadResponse)
 async def upload_video(
     background_tasks: BackgroundTasks,
-    file: UploadFile = File(...)
+    file: UploadFile = File(...),
+    surferId: Optional[str] = Form(None)
 ):
-    """Upload a video file and create a job."""
+    """Upload a video file and create a job, optionally for a surfer (see /analytics/trends)."""
     # Validate file format
     if not file.filename:
         raise HTTPException(status_code=400, detail="No file provided")
     
-    ext = Path(file.filename).suffix.lower()
-    if ext not in [".mp4", ".mov"]:
-        raise HTTPException(
-            status_code=400,
-            detail="Unsupported format. Please upload MP4 or MOV."
-        )
+    _validate_extension(file.filename)
+    _validate_surfer_id(surferId)
     
-    # Validate file size (500MB limit)
-    file_content = await file.read()
-    file_size_mb = len(file_content) / (1024 * 1024)
-    if file_size_mb > 500:
-        raise HTTPException(
-            status_code=400,
-            detail="Video exceeds 500MB limit. Please compress or trim your video."
-        )
+    # Reject non-video content from its first bytes before reading the rest
+    _check_header(await file.read(HEADER_PROBE_BYTES))
+    
+    # Validate file size (500MB limit); the spooled upload is never read into memory
+    _validate_size(await run_in_threadpool(_stream_size, file.file))
     
     # Create job directory
     job_id = str(uuid.uuid4())
     job_dir = JOBS_DIR / job_id
     job_dir.mkdir(parents=True, exist_ok=True)
     
-    # Save video file
+    # Save video file (content-addressed; identical uploads share one copy),
+    # streamed from the spooled upload in the threadpool
     video_path = job_dir / "input.mp4"
-    with open(video_path, "wb") as f:
-        f.write(file_content)
+    await file.seek(0)
+    input_sha256 = await run_in_threadpool(store_input_stream, file.file, video_path)
     
-    # Create initial job metadata
-    import json
-    job_meta = {
-        "jobId": job_id,
-        "status": "pending",
-        "progress": 0,
-        "createdAt": str(Path(video_path).stat().st_mtime)
-    }
-    meta_path = job_dir / "meta.json"
-    with open(meta_path, "w") as f:
-        json.dump(job_meta, f)
+    # Probe before queueing, so bad files never reach a worker
+    try:
+        metadata = await run_in_threadpool(probe_video, video_path)
+    except ProbeError as e:
+        await run_in_threadpool(shutil.rmtree, job_dir, ignore_errors=True)
+        raise HTTPException(status_code=422, detail=str(e))
+    
+    await run_in_threadpool(_write_job_meta, job_dir, job_id, input_sha256, metadata, surferId)
     
     # Start background processing
     background_tasks.add_task(run_job_sync, job_id)
     
-    return VideoUploadResponse(jobId=job_id)
+    return VideoUploadResponse(jobId=job_id, metadata=metadata)
+
+
+@router.post("/uploads", response_model=UploadSession)
+def init_upload(request: UploadInitRequest):
+    """
+    Start a resumable upload.
+    
+    Send the file in order with `PUT /uploads/{uploadId}?offset=N`, then call
+    `POST /uploads/{uploadId}/finalize`. After a dropped connection,
+    `GET /uploads/{uploadId}` returns the offset to continue from.
+    """
+    _validate_extension(request.filename)
+    _validate_size(request.size)
+    _validate_surfer_id(request.surferId)
+    
+    session = create_upload(request.filename, request.size, request.surferId)
+    return UploadSession(**session, offset=0, chunkSize=UPLOAD_CHUNK_SIZE)
+
+
+@router.get("/uploads/{upload_id}", response_model=UploadSession)
+def get_upload(upload_id: str):
+    """Get the current offset of a resumable upload."""
+    session = _require_upload(upload_id)
+    return UploadSession(**session, chunkSize=UPLOAD_CHUNK_SIZE)
+
+
+@router.put("/uploads/{upload_id}", response_model=UploadSession)
+async def put_upload_chunk(upload_id: str, request: Request, offset: int = Query(..., ge=0)):
+    """
+    Append a chunk (raw request body) at the given offset.
+    
+    The offset must equal the bytes received so far; otherwise 409 is returned
+    with the current offset. The body is streamed to disk, so bytes received
+    before a dropped connection are kept and the client resumes from there.
+    The container header is checked as soon as the first bytes arrive.
+    """
+    session = await run_in_threadpool(_require_upload, upload_id)
+    
+    lock = _upload_locks.setdefault(upload_id, asyncio.Lock())
+    if lock.locked():
+        raise HTTPException(status_code=409, detail="Another chunk is being uploaded")
+    
+    async with lock:
+        # Re-read under the lock: the offset is the data file's current size
+        session = await run_in_threadpool(_require_upload, upload_id)
+        if "jobId" in session:
+            raise HTTPException(status_code=409, detail="Upload already finalized")
+        current = session["offset"]
+        if offset != current:
+            raise HTTPException(
+                status_code=409,
+                detail=f"Offset mismatch; upload is at byte {current}",
+                headers={"Upload-Offset": str(current)}
+            )
+        
+        head = b"" if offset == 0 else None
+        received = offset
+        pending = bytearray()
+        f = await run_in_threadpool(_open_at, upload_data_path(upload_id), offset)
+        try:
+            try:
+                async for chunk in request.stream():
+                    # Validate as bytes arrive, not after the whole chunk is buffered
+                    if received + len(chunk) > session["size"]:
+                        pending.clear()
+                        await run_in_threadpool(f.truncate, offset)
+                        raise HTTPException(status_code=413, detail="Chunk runs past the declared upload size")
+                    if head is not None:
+                        head += chunk[:HEADER_PROBE_BYTES - len(head)]
+                        if len(head) >= HEADER_PROBE_BYTES or len(head) >= session["size"]:
+                            await run_in_threadpool(_check_header, head, upload_id)
+                            head = None
+                    pending += chunk
+                    received += len(chunk)
+                    if len(pending) >= UPLOAD_WRITE_BUFFER_SIZE:
+                        await run_in_threadpool(f.write, pending)
+                        pending.clear()
+            finally:
+                # Keep what arrived before a dropped connection
+                if pending:
+                    await run_in_threadpool(f.write, pending)
+            session["offset"] = await run_in_threadpool(f.tell)
+        finally:
+            await run_in_threadpool(f.close)
+    
+    return UploadSession(**session, chunkSize=UPLOAD_CHUNK_SIZE)
+
+
+@router.post("/uploads/{upload_id}/finalize", response_model=VideoUploadResponse)
+async def finalize_upload(upload_id: str, background_tasks: BackgroundTasks):
+    """
+    Complete a resumable upload and create the job.
+    
+    The video is probed here, so an unreadable or over-long file is rejected
+    before a job is queued and the response already carries duration and
+    resolution. Calling it again for a finalized upload returns the same
+    response, so a client whose response was lost can learn its job id.
+    """
+    session = await run_in_threadpool(_require_upload, upload_id)
+    if "jobId" in session:
+        return VideoUploadResponse(jobId=session["jobId"], metadata=session.get("metadata"))
+    if session["offset"] != session["size"]:
+        raise HTTPException(
+            status_code=409,
+            detail=f"Upload incomplete: {session['offset']} of {session['size']} bytes received",
+            headers={"Upload-Offset": str(session["offset"])}
+        )
+    
+    lock = _upload_locks.setdefault(upload_id, asyncio.Lock())
+    async with lock:
+        # A finalize that held the lock before us may have completed it already
+        session = await run_in_threadpool(_require_upload, upload_id)
+        if "jobId" in session:
+            return VideoUploadResponse(jobId=session["jobId"], metadata=session.get("metadata"))
+        
+        data_path = upload_data_path(upload_id)
+        try:
+            metadata = await run_in_threadpool(probe_video, data_path)
+        except ProbeError as e:
+            await run_in_threadpool(delete_upload, upload_id)
+            raise HTTPException(status_code=422, detail=str(e))
+        
+        job_id = str(uuid.uuid4())
+        job_dir = JOBS_DIR / job_id
+        job_dir.mkdir(parents=True, exist_ok=True)
+        
+        # Moves the data into the blob store (a rename; no copy)
+        input_sha256 = await run_in_threadpool(ingest_input_file, data_path, job_dir / "input.mp4")
+        await run_in_threadpool(
+            _write_job_meta, job_dir, job_id, input_sha256, metadata, session.get("surferId")
+        )
+        
+        # Kept so a retried finalize returns this job instead of a 404
+        await run_in_threadpool(complete_upload, upload_id, job_id, metadata)
+    
+    background_tasks.add_task(run_job_sync, job_id)
+    
+    return VideoUploadResponse(jobId=job_id, metadata=metadata)
+
+
+def _validate_extension(filename: str) -> None:
+    ext = Path(filename).suffix.lower()
+    if ext not in SUPPORTED_EXTENSIONS:
+        raise HTTPException(
+            status_code=400,
+            detail="Unsupported format. Please upload MP4 or MOV."
+        )
+
 
+def _validate_size(size: int) -> None:
+    file_size_mb = size / (1024 * 1024)
+    if file_size_mb > MAX_FILE_SIZE_MB:
+        raise HTTPException(
+            status_code=400,
+            detail=f"Video exceeds {MAX_FILE_SIZE_MB}MB limit. Please compress or trim your video."
+        )
+
+
+def _validate_surfer_id(surfer_id: Optional[str]) -> None:
+    if surfer_id is not None and not SURFER_ID_PATTERN.match(surfer_id):
+        raise HTTPException(
+            status_code=400,
+            detail="Surfer ID must be 1-64 letters, digits, '.', '_' or '-'."
+        )
+
+
+def _check_header(head: bytes, upload_id: str = None) -> None:
+    """Reject a file whose first bytes aren't an MP4/MOV container header."""
+    try:
+        sniff_container(head)
+    except ProbeError as e:
+        if upload_id:
+            delete_upload(upload_id)
+        raise HTTPException(status_code=422, detail=str(e))
+
+
+def _stream_size(f: BinaryIO) -> int:
+    """Length of a seekable file object; leaves it positioned at the end."""
+    return f.seek(0, os.SEEK_END)
+
+
+def _open_at(path: Path, offset: int) -> BinaryIO:
+    """Open an upload's data file for writing at offset."""
+    f = open(path, "r+b")
+    f.seek(offset)
+    return f
+
+
+def _require_upload(upload_id: str) -> Dict:
+    session = load_upload(upload_id)
+    if session is None:
+        raise HTTPException(status_code=404, detail="Upload not found")
+    return session
+
+
+def _write_job_meta(
+    job_dir: Path,
+    job_id: str,
+    input_sha256: str,
+    metadata: Dict[str, Any],
+    surfer_id: Optional[str] = None
+) -> None:
+    """Create the initial job metadata, including the probed video metadata."""
+    job_meta = {
+        "jobId": job_id,
+        "status": "pending",
+        "progress": 0,
+        "createdAt": str((job_dir / "input.mp4").stat().st_mtime),
+        "inputSha256": input_sha256,
+        # This process runs the job as a background task
+        "owner": process_owner()
+    }
+    if surfer_id is not None:
+        job_meta["surferId"] = surfer_id
+    write_json(job_dir / "meta.json", job_meta)
+    save_metadata(job_dir, metadata)
@@ -0,0 +1,454 @@
+"""
+Append-only columnar store of per-job metrics, with trend rollups.
+
+Every completed job adds one row: its id, the surfer it was uploaded for,
+when it completed and the primary surfer's metrics. Each column is a raw
+little-endian array in its own file under ANALYTICS_DIR, so appending a row
+is a few small writes and loading tens of thousands of rows is one
+`np.fromfile` per column:
+
+    job_id.bin        S36      job id (ASCII, at most 36 bytes: a UUID)
+    surfer.bin        int32    index into surfers.json, -1 if none was given
+    completed_at.bin  float64  Unix time
+    <metric>.bin      float64  one per METRIC_NAMES; NaN where undefined
+
+A crash between column writes leaves some columns a row longer than the
+others; rows are only read up to the shortest column, and the next append
+cuts the others back first. Appends hold an exclusive flock on `.lock` in
+the same directory and loads a shared one, so the API and the backfill CLI
+can write the store at the same time.
+
+Per-surfer and all-surfer count/sum/min/max per metric are kept for every
+day, week (starting Monday) and month, in UTC. They are built from the
+columns on load and updated on each append, so a trend query only visits
+the buckets in its range.
+"""
+import argparse
+import logging
+import math
+import re
+import threading
+import time
+from contextlib import contextmanager
+from pathlib import Path
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+import numpy as np
+
+from app.services.json_codec import read_json, write_json
+from app.config import ANALYTICS_DIR, JOBS_DIR
+
+try:
+    import fcntl
+except ImportError:  # Not available on Windows; only one process may write there
+    fcntl = None
+
+logger = logging.getLogger(__name__)
+
+METRIC_NAMES = ("popUpTime", "turnCount", "averageSpeed", "speedRetention", "smoothness")
+PERIODS = ("day", "week", "month")
+SURFER_ID_PATTERN = re.compile(r"^[A-Za-z0-9_.-]{1,64}$")
+SURFERS_NAME = "surfers.json"
+LOCK_NAME = ".lock"
+NO_SURFER = -1
+
+# Longer or non-ASCII ids would be truncated or fail to encode, so they are rejected
+JOB_ID_DTYPE = np.dtype("S36")
+COLUMNS: Dict[str, np.dtype] = {
+    "job_id": JOB_ID_DTYPE,
+    "surfer": np.dtype("<i4"),
+    "completed_at": np.dtype("<f8"),
+    **{name: np.dtype("<f8") for name in METRIC_NAMES}
+}
+
+# Rollup statistics, in this order along the first axis of a bucket's array
+STAT_COUNT, STAT_SUM, STAT_MIN, STAT_MAX = range(4)
+
+SECONDS_PER_DAY = 86400
+
+
+def period_starts(days: np.ndarray, period: str) -> np.ndarray:
+    """
+    First day of each day's bucket, in days since the Unix epoch.
+
+    Returns:
+        int64 array; weeks start on Monday
+    """
+    days = np.asarray(days, dtype=np.int64)
+    if period == "day":
+        return days
+    if period == "week":
+        # 1970-01-01 was a Thursday
+        return days - (days + 3) % 7
+    if period == "month":
+        return days.astype("datetime64[D]").astype("datetime64[M]").astype("datetime64[D]").astype(np.int64)
+    raise ValueError(f"Unknown period: {period}")
+
+
+class MetricsStore:
+    """
+    The metrics of every completed job, for trend queries.
+
+    Safe to use from several threads and processes. Rows appended by
+    another process (the backfill CLI) are picked up by the next query.
+    """
+
+    def __init__(self, root: Path = ANALYTICS_DIR):
+        self.root = Path(root)
+        self._lock = threading.RLock()
+        self._rows = 0
+        self._surfers: List[str] = []
+        self._surfer_codes: Dict[str, int] = {}
+        self._job_ids: set = set()
+        # (surfer id or None for everyone, period) -> {bucket start day: stats}
+        self._rollups: Dict[Tuple[Optional[str], str], Dict[int, np.ndarray]] = {}
+        with self._lock, self._file_lock(exclusive=False):
+            self._load()
+
+    @contextmanager
+    def _file_lock(self, exclusive: bool):
+        """Hold the store's lock file against other processes."""
+        if fcntl is None or (not exclusive and not self.root.exists()):
+            yield
+            return
+        self.root.mkdir(parents=True, exist_ok=True)
+        with open(self.root / LOCK_NAME, "a") as f:
+            fcntl.flock(f, fcntl.LOCK_EX if exclusive else fcntl.LOCK_SH)
+            try:
+                yield
+            finally:
+                fcntl.flock(f, fcntl.LOCK_UN)
+
+    def _column_path(self, name: str) -> Path:
+        return self.root / f"{name}.bin"
+
+    def _stored_rows(self) -> int:
+        """Complete rows on disk: the length of the shortest column."""
+        rows = []
+        for name, dtype in COLUMNS.items():
+            try:
+                rows.append(self._column_path(name).stat().st_size // dtype.itemsize)
+            except FileNotFoundError:
+                return 0
+        return min(rows)
+
+    def read_columns(self) -> Dict[str, np.ndarray]:
+        """
+        Every stored row, column by column.
+
+        Returns:
+            Dict of column name -> array, all of the same length
+        """
+        with self._lock:
+            rows = self._stored_rows()
+            if not rows:
+                return {name: np.empty(0, dtype=dtype) for name, dtype in COLUMNS.items()}
+            return {
+                name: np.fromfile(self._column_path(name), dtype=dtype, count=rows)
+                for name, dtype in COLUMNS.items()
+            }
+
+    def _stored_surfers(self) -> List[str]:
+        try:
+            return list(read_json(self.root / SURFERS_NAME))
+        except FileNotFoundError:
+            return []
+
+    def _load(self, surfers: Optional[List[str]] = None) -> None:
+        """Rebuild everything from disk. Callers hold both locks."""
+        self._surfers = self._stored_surfers() if surfers is None else surfers
+        self._surfer_codes = {surfer: code for code, surfer in enumerate(self._surfers)}
+
+        columns = self.read_columns()
+        self._rows = len(columns["job_id"])
+        self._job_ids = set(columns["job_id"].astype(str).tolist())
+        self._rollups = {}
+        self._add_to_rollups(columns)
+
+    def _sync(self) -> None:
+        """
+        Reload if another process has changed the store since we last looked.
+
+        Callers hold both locks. surfers.json is re-read too: another
+        process may have added surfers without (yet) adding rows, and an
+        append must extend its list, not ours.
+        """
+        surfers = self._stored_surfers()
+        if surfers != self._surfers or self._stored_rows() != self._rows:
+            self._load(surfers)
+
+    def _add_to_rollups(self, columns: Dict[str, np.ndarray]) -> None:
+        """Fold rows into the rollups, grouping them with numpy."""
+        if not len(columns["job_id"]):
+            return
+        values = np.column_stack([columns[name] for name in METRIC_NAMES])
+        present = ~np.isnan(values)
+        days = np.floor(columns["completed_at"] / SECONDS_PER_DAY).astype(np.int64)
+
+        surfer_codes = columns["surfer"].astype(np.int64)
+        everyone = np.full_like(surfer_codes, NO_SURFER - 1)
+        for period in PERIODS:
+            starts = period_starts(days, period)
+            for codes in (surfer_codes, everyone):
+                keys = np.stack([codes, starts], axis=1)
+                groups, inverse = np.unique(keys, axis=0, return_inverse=True)
+                inverse = inverse.reshape(-1)
+
+                stats = np.empty((len(groups), 4, len(METRIC_NAMES)))
+                for m in range(len(METRIC_NAMES)):
+                    stats[:, STAT_COUNT, m] = np.bincount(inverse, weights=present[:, m], minlength=len(groups))
+                    stats[:, STAT_SUM, m] = np.bincount(
+                        inverse, weights=np.where(present[:, m], values[:, m], 0.0), minlength=len(groups)
+                    )
+                stats[:, STAT_MIN] = np.inf
+                stats[:, STAT_MAX] = -np.inf
+                # fmin/fmax skip NaN, so undefined metrics don't poison a bucket
+                np.fmin.at(stats[:, STAT_MIN], inverse, values)
+                np.fmax.at(stats[:, STAT_MAX], inverse, values)
+
+                for (code, start), group_stats in zip(groups.tolist(), stats):
+                    if code == NO_SURFER:
+                        # Jobs without a surfer only count towards everyone's trends
+                        continue
+                    surfer = None if code == NO_SURFER - 1 else self._surfers[code]
+                    buckets = self._rollups.setdefault((surfer, period), {})
+                    existing = buckets.get(start)
+                    if existing is None:
+                        buckets[start] = group_stats.copy()
+                    else:
+                        _merge_stats(existing, group_stats)
+
+    def __len__(self) -> int:
+        with self._lock, self._file_lock(exclusive=False):
+            self._sync()
+            return self._rows
+
+    def __contains__(self, job_id: str) -> bool:
+        with self._lock, self._file_lock(exclusive=False):
+            self._sync()
+            return job_id in self._job_ids
+
+    def append(
+        self,
+        job_id: str,
+        metrics: Dict[str, Any],
+        surfer_id: Optional[str] = None,
+        completed_at: Optional[float] = None
+    ) -> bool:
+        """
+        Record a completed job's metrics.
+
+        Args:
+            metrics: The job's top-level `metrics` from results.json
+            surfer_id: Who the clip was uploaded for, if anyone
+            completed_at: Unix time; defaults to now
+
+        Returns:
+            False if the job was already recorded (nothing is written)
+        """
+        return self.extend([(job_id, metrics, surfer_id, completed_at)]) == 1
+
+    def extend(self, records: Iterable[Tuple[str, Dict[str, Any], Optional[str], Optional[float]]]) -> int:
+        """
+        Record many jobs at once, as (job_id, metrics, surfer_id, completed_at).
+
+        Jobs whose id doesn't fit the job_id column (see storable_job_id)
+        are skipped with a warning rather than stored truncated.
+
+        Returns:
+            Number of rows written; jobs already recorded are skipped
+        """
+        with self._lock, self._file_lock(exclusive=True):
+            self._sync()
+
+            rows: Dict[str, list] = {name: [] for name in COLUMNS}
+            new_surfers = False
+            for job_id, metrics, surfer_id, completed_at in records:
+                if job_id in self._job_ids:
+                    continue
+                if not storable_job_id(job_id):
+                    logger.warning("not recording job %r: id must be ASCII, at most %d bytes", job_id, JOB_ID_DTYPE.itemsize)
+                    continue
+                self._job_ids.add(job_id)
+                if surfer_id is not None and surfer_id not in self._surfer_codes:
+                    self._surfer_codes[surfer_id] = len(self._surfers)
+                    self._surfers.append(surfer_id)
+                    new_surfers = True
+                rows["job_id"].append(job_id)
+                rows["surfer"].append(NO_SURFER if surfer_id is None else self._surfer_codes[surfer_id])
+                rows["completed_at"].append(time.time() if completed_at is None else completed_at)
+                for name in METRIC_NAMES:
+                    rows[name].append(_metric_value(metrics.get(name)))
+
+            count = len(rows["job_id"])
+            if not count:
+                return 0
+
+            # The dictionary is written first, so every stored code resolves
+            if new_surfers:
+                write_json(self.root / SURFERS_NAME, self._surfers)
+
+            columns = {name: np.array(values, dtype=COLUMNS[name]) for name, values in rows.items()}
+            for name, column in columns.items():
+                with open(self._column_path(name), "ab") as f:
+                    # Drop any partial row left by a crash mid-append
+                    f.truncate(self._rows * COLUMNS[name].itemsize)
+                    f.write(column.tobytes())
+
+            self._rows += count
+            self._add_to_rollups(columns)
+            return count
+
+    def trend(
+        self,
+        metric: str,
+        period: str,
+        surfer_id: Optional[str] = None,
+        start: Optional[float] = None,
+        end: Optional[float] = None
+    ) -> List[Dict[str, Any]]:
+        """
+        Aggregate one metric per period, from the rollups.
+
+        Args:
+            metric: One of METRIC_NAMES
+            period: One of PERIODS
+            surfer_id: Only this surfer's jobs; None for everyone's
+            start, end: Unix times; buckets starting before start's bucket or
+                after end are left out
+
+        Returns:
+            Buckets in time order: [{"periodStart": day number, "count",
+            "mean", "min", "max"}, ...]; buckets where the metric was never
+            defined are omitted
+        """
+        if metric not in METRIC_NAMES:
+            raise ValueError(f"Unknown metric: {metric}")
+        if period not in PERIODS:
+            raise ValueError(f"Unknown period: {period}")
+        m = METRIC_NAMES.index(metric)
+
+        first = None if start is None else int(period_starts(np.array([start // SECONDS_PER_DAY]), period)[0])
+        last = None if end is None else int(end // SECONDS_PER_DAY)
+
+        with self._lock, self._file_lock(exclusive=False):
+            self._sync()
+            buckets = self._rollups.get((surfer_id, period), {})
+            selected = [
+                (day, stats[:, m].tolist()) for day, stats in buckets.items()
+                if (first is None or day >= first) and (last is None or day <= last)
+            ]
+
+        trend = []
+        for day, (count, total, low, high) in sorted(selected):
+            if not count:
+                continue
+            trend.append({
+                "periodStart": day,
+                "count": int(count),
+                "mean": total / count,
+                "min": low,
+                "max": high
+            })
+        return trend
+
+
+def storable_job_id(job_id: str) -> bool:
+    """Whether a job id fits the job_id column exactly."""
+    return job_id.isascii() and len(job_id) <= JOB_ID_DTYPE.itemsize
+
+
+def _metric_value(value: Any) -> float:
+    if value is None:
+        return math.nan
+    return float(value)
+
+
+def _merge_stats(into: np.ndarray, other: np.ndarray) -> None:
+    into[STAT_COUNT] += other[STAT_COUNT]
+    into[STAT_SUM] += other[STAT_SUM]
+    np.fmin(into[STAT_MIN], other[STAT_MIN], out=into[STAT_MIN])
+    np.fmax(into[STAT_MAX], other[STAT_MAX], out=into[STAT_MAX])
+
+
+def job_record(job_dir: Path) -> Optional[Tuple[str, Dict[str, Any], Optional[str], Optional[float]]]:
+    """
+    The store record of a completed job directory, as taken by `extend`.
+
+    The completion time is results.json's modification time.
+
+    Returns:
+        (job_id, metrics, surfer_id, completed_at), or None if the job
+        hasn't completed
+    """
+    try:
+        meta = read_json(job_dir / "meta.json")
+        results_path = job_dir / "results.json"
+        results = read_json(results_path)
+        completed_at = results_path.stat().st_mtime
+    except FileNotFoundError:
+        return None
+    if meta.get("status") != "completed" or meta.get("provisional"):
+        return None
+    return meta.get("jobId", job_dir.name), results.get("metrics", {}), meta.get("surferId"), completed_at
+
+
+def record_job(job_dir: Path, store: Optional["MetricsStore"] = None) -> bool:
+    """
+    Add a completed job to the store. Never raises: analytics must not fail a job.
+
+    Returns:
+        True if a row was written
+    """
+    try:
+        record = job_record(job_dir)
+        if record is None:
+            return False
+        if store is None:
+            store = get_metrics_store()
+        return store.append(*record)
+    except Exception:
+        logger.exception("could not record metrics of %s", job_dir.name)
+        return False
+
+
+_store: Optional[MetricsStore] = None
+_store_lock = threading.Lock()
+
+
+def get_metrics_store() -> MetricsStore:
+    """The process-wide store over ANALYTICS_DIR, loaded on first use."""
+    global _store
+    with _store_lock:
+        if _store is None:
+            _store = MetricsStore()
+        return _store
+
+
+def backfill(jobs_dir: Path = JOBS_DIR, store: Optional[MetricsStore] = None) -> int:
+    """
+    Record every completed job under jobs_dir that the store doesn't have yet.
+
+    Returns:
+        Number of rows written
+    """
+    if store is None:
+        store = get_metrics_store()
+    records = (job_record(job_dir) for job_dir in sorted(jobs_dir.iterdir()) if job_dir.is_dir())
+    return store.extend(record for record in records if record is not None)
+
+
+def main(argv: Optional[List[str]] = None) -> None:
+    """Backfill the store from existing jobs: python -m app.services.analytics"""
+    parser = argparse.ArgumentParser(description="Add completed jobs to the metrics store.")
+    parser.add_argument("--jobs-dir", type=Path, default=JOBS_DIR)
+    parser.add_argument("--store", type=Path, default=ANALYTICS_DIR)
+    args = parser.parse_args(argv)
+
+    store = MetricsStore(args.store)
+    written = backfill(args.jobs_dir, store)
+    print(f"Recorded {written} jobs; the store holds {len(store)}")
+
+
+if __name__ == "__main__":
+    main()
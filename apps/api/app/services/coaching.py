@@ -1,11 +1,50 @@
-from typing import List, Dict
+"""
+Confidence scoring and coaching tips.
+
+Tips come from rules kept as data (COACHING_RULES_PATH), a JSON list of:
+
+    {
+      "id": "speed-loss",
+      "when": [["speedRetention", "<", 0.8]],  # all must hold
+      "timestamp": "firstTurnTime",            # input to point the tip at, or null
+      "impact": "high",                        # 'high' | 'medium' | 'low'
+      "message": "..."
+    }
+
+Conditions compare a metric, or an input derived from the events
+(EVENT_INPUTS), with a constant; an undefined input never satisfies one.
+The rules are compiled once into a CoachingRules, which evaluates them over
+many results at a time as array comparisons: one result per job in the
+pipeline, thousands when stored results are re-scored (app/rescore.py).
+"""
+import hashlib
+from pathlib import Path
+from typing import List, Dict, Optional, Tuple
 import numpy as np
+from app.services.json_codec import dumps, read_json
 from app.config import (
+    COACHING_RULES_PATH,
+    MAX_TIPS,
     MIN_TIP_CONFIDENCE,
     DETECTION_QUALITY_WEIGHT,
     METRIC_RELIABILITY_WEIGHT
 )
 
+IMPACT_ORDER = {"high": 3, "medium": 2, "low": 1}
+COMPARISONS = {
+    "<": np.less,
+    "<=": np.less_equal,
+    ">": np.greater,
+    ">=": np.greater_equal,
+    "==": np.equal,
+    "!=": np.not_equal
+}
+# Rule inputs derived from events: the timestamp of the first event of a type
+EVENT_INPUTS = {"firstTurnTime": "turn", "firstPopUpTime": "pop-up"}
+
+# (metrics, events, overall confidence) of one result
+CoachingRecord = Tuple[Dict, List[Dict], float]
+
 
 def calculate_confidence(
     tracks: List[Dict],
@@ -54,10 +93,122 @@ def calculate_confidence(
     return min(1.0, max(0.0, combined_confidence))
 
 
+class CoachingRules:
+    """
+    Coaching rules compiled for evaluation over arrays of results.
+    
+    Args:
+        rules: Rule dicts (see the module docstring)
+        min_confidence: Results less confident than this get no tips
+        max_tips: Tips kept per result, highest impact first
+    """
+    
+    def __init__(self, rules: List[Dict], min_confidence: float = MIN_TIP_CONFIDENCE, max_tips: int = MAX_TIPS):
+        ids = [rule["id"] for rule in rules]
+        if len(set(ids)) != len(ids):
+            raise ValueError("Coaching rule ids must be unique")
+        for rule in rules:
+            if rule["impact"] not in IMPACT_ORDER:
+                raise ValueError(f"Rule {rule['id']}: unknown impact {rule['impact']!r}")
+            for name, op, value in rule["when"]:
+                if op not in COMPARISONS:
+                    raise ValueError(f"Rule {rule['id']}: unknown comparison {op!r}")
+        
+        self.min_confidence = min_confidence
+        self.max_tips = max_tips
+        # Any edit to the rules or the tip settings changes the version
+        definition = dumps({"rules": rules, "minConfidence": min_confidence, "maxTips": max_tips})
+        self.version = hashlib.sha256(definition).hexdigest()[:12]
+        
+        # Highest impact first; ties keep file order
+        self.rules = sorted(rules, key=lambda rule: -IMPACT_ORDER[rule["impact"]])
+        names = {name for rule in self.rules for name, _, _ in rule["when"]}
+        names.update(rule["timestamp"] for rule in self.rules if rule.get("timestamp"))
+        self.inputs = sorted(names)
+        column = {name: i for i, name in enumerate(self.inputs)}
+        
+        self._conditions = [
+            (k, column[name], COMPARISONS[op], float(value))
+            for k, rule in enumerate(self.rules)
+            for name, op, value in rule["when"]
+        ]
+        self._timestamps = [column.get(rule.get("timestamp")) for rule in self.rules]
+    
+    def input_matrix(self, records: List[CoachingRecord]) -> np.ndarray:
+        """
+        Rule inputs of each record, NaN where undefined.
+        
+        Returns:
+            (records, inputs) float64 array, columns in `self.inputs` order
+        """
+        matrix = np.full((len(records), len(self.inputs)), np.nan)
+        for row, (metrics, events, _) in enumerate(records):
+            for col, name in enumerate(self.inputs):
+                if name in EVENT_INPUTS:
+                    event_type = EVENT_INPUTS[name]
+                    value = next((e["timestamp"] for e in events if e["type"] == event_type), None)
+                else:
+                    value = metrics.get(name)
+                if isinstance(value, (int, float)) and not isinstance(value, bool):
+                    matrix[row, col] = value
+        return matrix
+    
+    def evaluate(self, inputs: np.ndarray, confidence: np.ndarray) -> np.ndarray:
+        """
+        Which rules fire for each record, after the confidence gate and tip limit.
+        
+        Returns:
+            (records, rules) bool array, rules in `self.rules` order
+        """
+        fired = np.ones((len(inputs), len(self.rules)), dtype=bool)
+        for k, col, compare, value in self._conditions:
+            # NaN compares false, so undefined inputs never fire a rule
+            fired[:, k] &= compare(inputs[:, col], value)
+        fired &= (np.asarray(confidence) >= self.min_confidence)[:, None]
+        fired &= np.cumsum(fired, axis=1) <= self.max_tips
+        return fired
+    
+    def tips(self, records: List[CoachingRecord]) -> List[List[Dict]]:
+        """
+        Tips for many results in one evaluation.
+        
+        Returns:
+            Per record, tips with id, message, confidence, timestamp, impact,
+            highest impact first
+        """
+        inputs = self.input_matrix(records)
+        confidence = np.array([record[2] for record in records], dtype=np.float64)
+        fired = self.evaluate(inputs, confidence)
+        
+        tips: List[List[Dict]] = [[] for _ in records]
+        # Row-major, so each record's tips come out in rule (impact) order
+        for row, k in zip(*np.nonzero(fired)):
+            rule = self.rules[k]
+            col = self._timestamps[k]
+            timestamp = None if col is None or np.isnan(inputs[row, col]) else float(inputs[row, col])
+            tips[row].append({
+                "id": rule["id"],
+                "message": rule["message"],
+                "confidence": float(confidence[row]),
+                "timestamp": timestamp,
+                "impact": rule["impact"]
+            })
+        return tips
+
+
+def load_rules(path: Path = COACHING_RULES_PATH) -> CoachingRules:
+    """Compile the coaching rules in a JSON file."""
+    return CoachingRules(read_json(path))
+
+
+RULES = load_rules()
+
+
 def generate_tips(
     metrics: Dict,
     events: List[Dict],
-    overall_confidence: float
+    overall_confidence: float,
+    rules: Optional[CoachingRules] = None
 ) -> List[Dict]:
     """
     Generate coaching tips based on metrics and events.
@@ -65,73 +216,4 @@ def generate_tips(
     Returns:
         List of tips with id, message, confidence, timestamp, impact
     """
-    tips = []
-    
-    # Only generate tips if confidence is acceptable
-    if overall_confidence < MIN_TIP_CONFIDENCE:
-        return tips
-    
-    # Tip 1: Late pop-up
-    if metrics.get("popUpTime") is not None and metrics["popUpTime"] > 2.0:
-        tips.append({
-            "id": "late-popup",
-            "message": "Your pop-up is happening late. Try to pop up earlier to catch more of the wave.",
-            "confidence": overall_confidence,
-            "timestamp": metrics["popUpTime"],
-            "impact": "medium"
-        })
-    
-    # Tip 2: Speed loss in turns
-    speed_retention = metrics.get("speedRetention", 1.0)
-    if speed_retention < 0.8:  # Lost more than 20% speed
-        # Find turn with worst speed retention
-        worst_turn_timestamp = None
-        if events:
-            turn_events = [e for e in events if e["type"] == "turn"]
-            if turn_events:
-                worst_turn_timestamp = turn_events[0]["timestamp"]
-        
-        tips.append({
-            "id": "speed-loss",
-            "message": "You're losing speed in your turns. Try to maintain momentum by keeping your weight centered.",
-            "confidence": overall_confidence,
-            "timestamp": worst_turn_timestamp,
-            "impact": "high"
-        })
-    
-    # Tip 3: Too many turns
-    turn_count = metrics.get("turnCount", 0)
-    clip_duration = 30.0  # Default, should come from metadata
-    turns_per_second = turn_count / clip_duration if clip_duration > 0 else 0
-    if turns_per_second > 0.15:  # More than 0.15 turns per second
-        tips.append({
-            "id": "too-many-turns",
-            "message": "You're making too many turns. Focus on fewer, more powerful turns.",
-            "confidence": overall_confidence,
-            "timestamp": None,
-            "impact": "medium"
-        })
-    
-    # Tip 4: Inconsistent speed
-    if "averageSpeed" in metrics:
-        # This would need speed variance - simplified for now
-        smoothness = metrics.get("smoothness", 1.0)
-        if smoothness < 0.6:
-            tips.append({
-                "id": "inconsistent-speed",
-                "message": "Your speed is inconsistent. Try to maintain a steady pace throughout your ride.",
-                "confidence": overall_confidence,
-                "timestamp": None,
-                "impact": "medium"
-            })
-    
-    # Tip 5: Poor turn execution
-    # This would need turn rate analysis - simplified for now
-    
-    # Rank tips by impact (high > medium > low)
-    impact_order = {"high": 3, "medium": 2, "low": 1}
-    tips.sort(key=lambda t: impact_order.get(t["impact"], 0), reverse=True)
-    
-    # Limit to top 3 tips
-    return tips[:3]
-
+    return (rules or RULES).tips([(metrics, events, overall_confidence)])[0]
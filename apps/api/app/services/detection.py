@@ -1,48 +1,119 @@
-from ultralytics import YOLO
 import cv2
+import threading
 import numpy as np
 from pathlib import Path
-from typing import List, Tuple
-from app.config import YOLO_MODEL, FRAME_PROCESSING_INTERVAL
+from typing import List, Tuple, Callable, Optional
+from app.config import YOLO_MODEL, FRAME_PROCESSING_INTERVAL, PREVIEW_MODEL, PREVIEW_INPUT_SIZE
+from app.services.detectors import Detection, load_detector
+from app.services.inference_pool import InferencePool
+from app.services.profiling import JobProfiler
 
-# Global model instance (lazy loaded)
-_model = None
+# Global detector instances (lazy loaded; backend chosen by the model's suffix)
+_detector = None
+_preview_detector = None
 
+# Seeking decodes forward from the previous keyframe, so shorter gaps are
+# cheaper to skip by grabbing frames without converting them
+SEEK_MIN_GAP_FRAMES = 120
 
-def get_model():
-    """Get or load YOLO model (singleton)."""
-    global _model
-    if _model is None:
-        _model = YOLO(YOLO_MODEL)
-    return _model
 
+def get_detector() -> Callable[[np.ndarray], List[Detection]]:
+    """Get or load the person detector (singleton)."""
+    global _detector
+    if _detector is None:
+        _detector = load_detector(YOLO_MODEL)
+    return _detector
 
-def detect_persons_in_frame(frame: np.ndarray) -> List[Tuple[float, float, float, float, float]]:
+
+def get_preview_detector() -> Callable[[np.ndarray], List[Detection]]:
+    """Get or load the preview-pass detector: PREVIEW_MODEL at PREVIEW_INPUT_SIZE (singleton)."""
+    global _preview_detector
+    if _preview_detector is None:
+        _preview_detector = load_detector(PREVIEW_MODEL or YOLO_MODEL, PREVIEW_INPUT_SIZE)
+    return _preview_detector
+
+
+def set_detector(detector: Optional[Callable[[np.ndarray], List[Detection]]], preview: bool = False):
     """
-    Detect persons in a frame using YOLOv8.
+    Replace the process-wide detector (None reloads from config on next use).
     
-    Returns list of detections: [(x1, y1, x2, y2, confidence), ...]
+    Args:
+        preview: Replace the preview-pass detector instead of the full-quality one
+    
+    Returns:
+        The previous detector, so callers can restore it
+    """
+    global _detector, _preview_detector
+    if preview:
+        previous, _preview_detector = _preview_detector, detector
+    else:
+        previous, _detector = _detector, detector
+    return previous
+
+
+def shareable_detector(
+    detector: Callable[[np.ndarray], List[Detection]]
+) -> Callable[[np.ndarray], List[Detection]]:
+    """
+    Make a detector safe to call from several threads.
+    
+    Backends that declare `thread_safe` are returned as is; calls to any
+    other detector are serialized, so threads still overlap decoding.
     """
-    model = get_model()
-    results = model(frame, verbose=False)
+    if getattr(detector, "thread_safe", False):
+        return detector
     
-    detections = []
-    for result in results:
-        boxes = result.boxes
-        for box in boxes:
-            # Filter for person class (class 0)
-            if int(box.cls) == 0:
-                x1, y1, x2, y2 = box.xyxy[0].cpu().numpy()
-                confidence = float(box.conf[0].cpu().numpy())
-                detections.append((x1, y1, x2, y2, confidence))
+    lock = threading.Lock()
     
-    return detections
+    def detect(frame: np.ndarray) -> List[Detection]:
+        with lock:
+            return detector(frame)
+    
+    return detect
+
+
+def detect_persons_in_frame(frame: np.ndarray) -> List[Detection]:
+    """
+    Detect persons in a frame.
+    
+    Returns list of detections: [(x1, y1, x2, y2, confidence), ...]
+    """
+    return get_detector()(frame)
 
 
-def process_video_detections(video_path: Path) -> List[dict]:
+def process_video_detections(
+    video_path: Path,
+    frame_consumers: Optional[List[Callable[[int, np.ndarray], None]]] = None,
+    profiler: Optional[JobProfiler] = None,
+    frame_interval: int = FRAME_PROCESSING_INTERVAL,
+    frame_ranges: Optional[List[Tuple[int, int]]] = None,
+    detector: Optional[Callable[[np.ndarray], List[Detection]]] = None,
+    reuse: Optional[Callable[[int, np.ndarray], Optional[List[Detection]]]] = None,
+    inference_pool: Optional[InferencePool] = None
+) -> List[dict]:
     """
     Process video and detect persons in frames.
     
+    Args:
+        video_path: Path to the video file
+        frame_consumers: Callables invoked with (frame_number, frame) for every
+            decoded frame, so other stages can reuse frames without decoding again.
+            A consumer with a `wants(frame_number)` method only receives the
+            frames it wants; the rest are grabbed without conversion when
+            detection doesn't need them either.
+        profiler: Receives decode/inference timings and frame counters
+        frame_interval: Detect on frames that are a multiple of this
+        frame_ranges: Only detect within these [start, end) frame ranges and
+            stop after the last one; long gaps between ranges are seeked over
+        detector: Detector to use instead of the process-wide one
+        reuse: Detections taken from another job (see fingerprints.DetectionReuse).
+            Where `reuse.covers(frame_number)`, the frames it `wants` are
+            detected instead of every Nth one, and it is called with each
+            of them; it returns the detections or None to run the detector.
+        inference_pool: Run the detector in these worker processes instead
+            (detector is then unused). Frames are decoded into the pool's
+            shared memory, and decoding continues while workers detect.
+    
     Returns list of detections per frame: [{frame: int, detections: [...]}, ...]
     """
     cap = cv2.VideoCapture(str(video_path))
@@ -50,33 +121,124 @@ def process_video_detections(video_path: Path) -> List[dict]:
     if not cap.isOpened():
         raise ValueError("Could not open video file")
     
-    fps = cap.get(cv2.CAP_PROP_FPS)
-    frame_interval = FRAME_PROCESSING_INTERVAL
+    profiler = profiler or JobProfiler()
+    detect = detector or detect_persons_in_frame
+    consumers = frame_consumers or []
+    ranges = merge_frame_ranges(frame_ranges) if frame_ranges is not None else None
+    range_index = 0
+    # With a pool, frames to detect are decoded straight into shared memory
+    ring = None
     
     all_detections = []
     frame_number = 0
     
-    while True:
-        ret, frame = cap.read()
-        if not ret:
-            break
+    try:
+        while True:
+            in_range = True
+            if ranges is not None:
+                while range_index < len(ranges) and frame_number >= ranges[range_index][1]:
+                    range_index += 1
+                if range_index == len(ranges):
+                    break
+                start = ranges[range_index][0]
+                if start - frame_number >= SEEK_MIN_GAP_FRAMES:
+                    with profiler.stage("decode"):
+                        if cap.set(cv2.CAP_PROP_POS_FRAMES, start):
+                            frame_number = start
+                    profiler.count("seeks")
+                in_range = frame_number >= start
+            
+            # Process every Nth frame; frames shared with another job follow its cadence
+            reusing = reuse is not None and reuse.covers(frame_number)
+            if reusing:
+                infer = in_range and reuse.wants(frame_number)
+            else:
+                infer = in_range and frame_number % frame_interval == 0
+            wanted = [c for c in consumers if not hasattr(c, "wants") or c.wants(frame_number)]
+            
+            slot = None
+            if infer and ring is not None:
+                # Waits while every slot is with a worker (backpressure)
+                with profiler.stage("inferenceWait"):
+                    slot = ring.acquire()
+            with profiler.stage("decode"):
+                if slot is not None:
+                    ret, frame = cap.read(ring.views[slot])
+                elif infer or wanted:
+                    ret, frame = cap.read()
+                else:
+                    ret, frame = cap.grab(), None
+            if not ret:
+                if slot is not None:
+                    ring.release(slot)
+                break
+            profiler.count("framesDecoded")
+            
+            if wanted:
+                with profiler.stage("frameConsumers"):
+                    for consumer in wanted:
+                        consumer(frame_number, frame)
+            
+            if infer:
+                detections = None
+                if reusing:
+                    with profiler.stage("reuse"):
+                        detections = reuse(frame_number, frame)
+                if detections is not None:
+                    profiler.count("framesReused")
+                    if slot is not None:
+                        ring.release(slot)
+                elif inference_pool is not None and (ring is None or frame.shape == ring.shape):
+                    if ring is None:
+                        ring = inference_pool.ring(frame.shape)
+                        slot = ring.acquire()
+                    if not np.shares_memory(frame, ring.views[slot]):
+                        np.copyto(ring.views[slot], frame)
+                    ring.submit(slot, frame_number)
+                    profiler.count("inferenceCalls")
+                else:
+                    if slot is not None:
+                        ring.release(slot)
+                    with profiler.stage("inference"):
+                        detections = detect(frame)
+                    profiler.count("inferenceCalls")
+                all_detections.append({"frame": frame_number, "detections": detections})
+            frame = None
+            
+            frame_number += 1
         
-        # Process every Nth frame
-        if frame_number % frame_interval == 0:
-            detections = detect_persons_in_frame(frame)
-            all_detections.append({
-                "frame": frame_number,
-                "detections": [
-                    {
-                        "bbox": [float(x1), float(y1), float(x2), float(y2)],
-                        "confidence": float(conf)
-                    }
-                    for x1, y1, x2, y2, conf in detections
-                ]
-            })
-        
-        frame_number += 1
+        if ring is not None:
+            with profiler.stage("inferenceWait"):
+                pooled = ring.drain()
+            profiler.add("inference", ring.wall_seconds, ring.cpu_seconds, calls=len(pooled))
+    finally:
+        cap.release()
+        if ring is not None:
+            ring.close()
     
-    cap.release()
+    for record in all_detections:
+        detections = record["detections"]
+        if detections is None:
+            detections = pooled[record["frame"]]
+        profiler.count("detections", len(detections))
+        record["detections"] = [
+            {
+                "bbox": [float(x1), float(y1), float(x2), float(y2)],
+                "confidence": float(conf)
+            }
+            for x1, y1, x2, y2, conf in detections
+        ]
     return all_detections
 
+
+def merge_frame_ranges(ranges: List[Tuple[int, int]]) -> List[Tuple[int, int]]:
+    """Sort [start, end) frame ranges and merge overlapping or touching ones."""
+    merged = []
+    for start, end in sorted((max(0, int(s)), int(e)) for s, e in ranges):
+        if end <= start:
+            continue
+        if merged and start <= merged[-1][1]:
+            merged[-1] = (merged[-1][0], max(merged[-1][1], end))
+        else:
+            merged.append((start, end))
+    return merged
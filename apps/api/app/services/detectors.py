@@ -0,0 +1,283 @@
+from pathlib import Path
+from typing import List, Tuple, Optional
+import cv2
+import numpy as np
+
+from app.config import (
+    DETECTION_CONFIDENCE_THRESHOLD,
+    DETECTION_IOU_THRESHOLD,
+    DETECTION_MAX_DETECTIONS,
+    DETECTION_THREADS
+)
+
+# (x1, y1, x2, y2, confidence) in frame pixels
+Detection = Tuple[float, float, float, float, float]
+
+PERSON_CLASS = 0
+LETTERBOX_FILL = 114  # ultralytics' padding colour; exported models were trained with it
+
+
+def letterbox(frame: np.ndarray, size: Tuple[int, int]) -> Tuple[np.ndarray, float, Tuple[float, float]]:
+    """
+    Resize a BGR frame into a padded model input, keeping the aspect ratio.
+
+    Matches ultralytics' LetterBox so exported models see the same input as
+    the PyTorch path.
+
+    Returns:
+        Tuple of (NCHW float32 RGB blob in [0, 1], scale, (pad_x, pad_y))
+    """
+    height, width = frame.shape[:2]
+    target_h, target_w = size
+    scale = min(target_h / height, target_w / width)
+    resized_w, resized_h = int(round(width * scale)), int(round(height * scale))
+
+    pad_x = (target_w - resized_w) / 2
+    pad_y = (target_h - resized_h) / 2
+    top, bottom = int(round(pad_y - 0.1)), int(round(pad_y + 0.1))
+    left, right = int(round(pad_x - 0.1)), int(round(pad_x + 0.1))
+
+    if (resized_w, resized_h) != (width, height):
+        frame = cv2.resize(frame, (resized_w, resized_h), interpolation=cv2.INTER_LINEAR)
+    padded = cv2.copyMakeBorder(
+        frame, top, bottom, left, right, cv2.BORDER_CONSTANT, value=(LETTERBOX_FILL,) * 3
+    )
+
+    # BGR HWC uint8 -> RGB NCHW float32
+    blob = padded[:, :, ::-1].transpose(2, 0, 1)[np.newaxis].astype(np.float32) / 255.0
+    return np.ascontiguousarray(blob), scale, (left, top)
+
+
+def nms(boxes: np.ndarray, scores: np.ndarray, iou_threshold: float) -> np.ndarray:
+    """
+    Greedy non-maximum suppression over xyxy boxes.
+
+    IoU is computed once as a matrix; the loop only visits boxes that
+    survive, so it runs a handful of times for a typical frame.
+
+    Returns:
+        Indices of kept boxes, highest score first
+    """
+    order = np.argsort(-scores, kind="stable")
+    boxes = boxes[order]
+
+    x1, y1, x2, y2 = boxes.T
+    areas = (x2 - x1).clip(0) * (y2 - y1).clip(0)
+    inter_w = (np.minimum(x2[:, None], x2) - np.maximum(x1[:, None], x1)).clip(0)
+    inter_h = (np.minimum(y2[:, None], y2) - np.maximum(y1[:, None], y1)).clip(0)
+    inter = inter_w * inter_h
+    iou = inter / np.maximum(areas[:, None] + areas - inter, 1e-9)
+
+    suppressed = np.zeros(len(boxes), dtype=bool)
+    keep = []
+    for i in range(len(boxes)):
+        if suppressed[i]:
+            continue
+        keep.append(i)
+        suppressed |= iou[i] > iou_threshold
+    return order[np.array(keep, dtype=np.int64)]
+
+
+def postprocess_yolo(
+    output: np.ndarray,
+    scale: float,
+    pad: Tuple[float, float],
+    frame_shape: Tuple[int, ...],
+    conf_threshold: float = DETECTION_CONFIDENCE_THRESHOLD,
+    iou_threshold: float = DETECTION_IOU_THRESHOLD,
+    max_detections: int = DETECTION_MAX_DETECTIONS
+) -> List[Detection]:
+    """
+    Turn a raw YOLOv8 output into person detections in frame coordinates.
+
+    Args:
+        output: (4 + classes, anchors) array of cx, cy, w, h and class scores
+            for one image, as exported by ultralytics
+    """
+    predictions = output.T
+    class_scores = predictions[:, 4:]
+
+    # Like ultralytics, each anchor votes for its best class only
+    person_scores = class_scores[:, PERSON_CLASS]
+    mask = (person_scores >= conf_threshold) & (class_scores.argmax(axis=1) == PERSON_CLASS)
+    if not mask.any():
+        return []
+
+    cx, cy, w, h = predictions[mask, :4].T
+    scores = person_scores[mask]
+    boxes = np.stack([cx - w / 2, cy - h / 2, cx + w / 2, cy + h / 2], axis=1)
+
+    # Undo the letterbox and clip to the frame
+    boxes -= np.array([pad[0], pad[1], pad[0], pad[1]], dtype=boxes.dtype)
+    boxes /= scale
+    frame_h, frame_w = frame_shape[:2]
+    boxes[:, [0, 2]] = boxes[:, [0, 2]].clip(0, frame_w)
+    boxes[:, [1, 3]] = boxes[:, [1, 3]].clip(0, frame_h)
+
+    keep = nms(boxes, scores, iou_threshold)[:max_detections]
+    return [tuple(row) for row in np.column_stack([boxes[keep], scores[keep]]).astype(np.float64).tolist()]
+
+
+class UltralyticsDetector:
+    """PyTorch YOLOv8 through ultralytics (.pt weights)."""
+
+    name = "ultralytics"
+    thread_safe = False  # the predictor keeps per-call state
+
+    def __init__(
+        self,
+        model_path: str,
+        input_size: Optional[int] = None,
+        threads: Optional[int] = DETECTION_THREADS
+    ):
+        from ultralytics import YOLO
+        if threads:
+            import torch
+            torch.set_num_threads(threads)
+        self.model = YOLO(model_path)
+        self.imgsz = input_size or 640
+
+    def __call__(self, frame: np.ndarray) -> List[Detection]:
+        results = self.model(
+            frame,
+            verbose=False,
+            imgsz=self.imgsz,
+            classes=[PERSON_CLASS],
+            conf=DETECTION_CONFIDENCE_THRESHOLD,
+            iou=DETECTION_IOU_THRESHOLD,
+            max_det=DETECTION_MAX_DETECTIONS
+        )
+
+        detections = []
+        for result in results:
+            # One device->host copy per frame: rows of x1, y1, x2, y2, conf, cls
+            data = result.boxes.data.cpu().numpy()
+            data = data[data[:, 5] == PERSON_CLASS]
+            detections.extend(tuple(row) for row in data[:, :5].astype(np.float64).tolist())
+        return detections
+
+
+class _ExportedYoloDetector:
+    """Shared pre/postprocessing for YOLOv8 models exported from ultralytics."""
+
+    input_size: Tuple[int, int] = (640, 640)
+    thread_safe = False
+
+    def _infer(self, blob: np.ndarray) -> np.ndarray:
+        raise NotImplementedError
+
+    def __call__(self, frame: np.ndarray) -> List[Detection]:
+        blob, scale, pad = letterbox(frame, self.input_size)
+        output = self._infer(blob)
+        return postprocess_yolo(output[0], scale, pad, frame.shape)
+
+
+def static_input_size(shape, default: Tuple[int, int] = (640, 640)) -> Tuple[int, int]:
+    """Height and width from an NCHW input shape; dynamic dimensions fall back to default."""
+    height, width = shape[2], shape[3]
+    if isinstance(height, int) and isinstance(width, int) and height > 0 and width > 0:
+        return height, width
+    return default
+
+
+def _square(input_size: Optional[int]) -> Tuple[int, int]:
+    return (input_size, input_size) if input_size else (640, 640)
+
+
+class OnnxDetector(_ExportedYoloDetector):
+    """YOLOv8 exported to ONNX (FP32 or INT8-quantized), run with ONNX Runtime on CPU."""
+
+    name = "onnxruntime"
+    thread_safe = True  # InferenceSession.run may be called concurrently
+
+    def __init__(
+        self,
+        model_path: str,
+        input_size: Optional[int] = None,
+        threads: Optional[int] = DETECTION_THREADS
+    ):
+        import onnxruntime as ort
+
+        options = ort.SessionOptions()
+        options.graph_optimization_level = ort.GraphOptimizationLevel.ORT_ENABLE_ALL
+        if threads:
+            options.intra_op_num_threads = threads
+        self.session = ort.InferenceSession(str(model_path), options, providers=["CPUExecutionProvider"])
+
+        model_input = self.session.get_inputs()[0]
+        self.input_name = model_input.name
+        self.input_size = static_input_size(model_input.shape, _square(input_size))
+
+    def _infer(self, blob: np.ndarray) -> np.ndarray:
+        return self.session.run(None, {self.input_name: blob})[0]
+
+
+class OpenVinoDetector(_ExportedYoloDetector):
+    """
+    YOLOv8 exported to OpenVINO IR (.xml, or the *_openvino_model directory).
+
+    Needs the optional `openvino` package, which requirements.txt leaves out.
+    """
+
+    name = "openvino"
+
+    def __init__(
+        self,
+        model_path: str,
+        input_size: Optional[int] = None,
+        threads: Optional[int] = DETECTION_THREADS
+    ):
+        try:
+            import openvino as ov
+        except ImportError as e:
+            raise ImportError(
+                f"{model_path} is an OpenVINO model, but the optional openvino package "
+                "is not installed (pip install openvino)"
+            ) from e
+
+        path = Path(model_path)
+        if path.is_dir():
+            path = next(path.glob("*.xml"))
+        config = {"INFERENCE_NUM_THREADS": threads} if threads else {}
+        self.model = ov.Core().compile_model(str(path), "CPU", config)
+
+        shape = self.model.input(0).get_partial_shape()
+        dims = [d.get_length() if d.is_static else None for d in shape]
+        self.input_size = static_input_size(dims, _square(input_size))
+
+    def _infer(self, blob: np.ndarray) -> np.ndarray:
+        return self.model(blob)[self.model.output(0)]
+
+
+def detector_backend(model_path: str) -> str:
+    """Backend name for a model path, chosen by its suffix."""
+    path = Path(model_path)
+    if path.suffix == ".onnx":
+        return OnnxDetector.name
+    if path.suffix == ".xml" or path.name.endswith("_openvino_model"):
+        return OpenVinoDetector.name
+    return UltralyticsDetector.name
+
+
+def load_detector(model_path: str, input_size: Optional[int] = None, threads: Optional[int] = DETECTION_THREADS):
+    """
+    Load a person detector for the model path.
+
+    '.onnx' runs on ONNX Runtime, '.xml' or '*_openvino_model' on OpenVINO,
+    anything else (e.g. 'yolov8n.pt') on ultralytics/PyTorch. OpenVINO is an
+    optional extra (`pip install openvino`); the other backends are in
+    requirements.txt.
+
+    input_size sets the square inference resolution (default 640). Exported
+    models with static input shapes always run at their exported size.
+    threads caps the backend's intra-op threads (None = all cores).
+
+    Returns:
+        Callable taking a BGR frame and returning [(x1, y1, x2, y2, confidence), ...]
+    """
+    backends = {
+        OnnxDetector.name: OnnxDetector,
+        OpenVinoDetector.name: OpenVinoDetector,
+        UltralyticsDetector.name: UltralyticsDetector
+    }
+    return backends[detector_backend(model_path)](model_path, input_size, threads)
@@ -1,4 +1,4 @@
-from typing import List, Dict
+from typing import List, Dict, Tuple, Optional
 import numpy as np
 from app.config import (
     POPUP_HEIGHT_INCREASE_THRESHOLD,
@@ -9,14 +9,63 @@ from app.config import (
 )
 
 
+def _centered_moving_average(values: np.ndarray, window_size: int) -> np.ndarray:
+    """
+    Centered moving average with windows truncated at the edges.
+    
+    The shifted views are summed in window order, so each value is
+    bit-identical to `np.mean` over the corresponding window slice.
+    """
+    n = len(values)
+    half = window_size // 2
+    padded = np.concatenate([np.zeros(half), values, np.zeros(half)])
+    
+    sums = np.zeros(n)
+    for offset in range(window_size):
+        sums += padded[offset:offset + n]
+    
+    indices = np.arange(n)
+    counts = np.minimum(n, indices + half + 1) - np.maximum(0, indices - half)
+    return sums / counts
+
+
+def _find_runs(mask: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Run-length segmentation of a boolean mask.
+    
+    Returns:
+        (starts, ends) of each run of True values, with ends exclusive
+    """
+    edges = np.diff(np.concatenate([[0], mask.astype(np.int8), [0]]))
+    starts = np.flatnonzero(edges == 1)
+    ends = np.flatnonzero(edges == -1)
+    return starts, ends
+
+
+def _track_frames(tracks: List[Dict]) -> np.ndarray:
+    """Frame numbers of track samples (sample index when 'frame' is absent)."""
+    return np.array([t.get("frame", i) for i, t in enumerate(tracks)], dtype=np.int64)
+
+
 def detect_popup(
     tracks: List[Dict],
     vertical_velocities: List[float],
-    fps: float
+    fps: float,
+    peak_picking: bool = True
 ) -> List[Dict]:
     """
     Detect pop-up events based on bbox height increase and vertical motion.
     
+    Windows and timestamps use each sample's 'frame' number, so timing is
+    correct when detection only runs every Nth frame.
+    
+    Args:
+        tracks: Track samples with 'bbox' and 'frame', sorted by frame
+        vertical_velocities: Per-sample vertical velocities
+        fps: Frames per second
+        peak_picking: Emit one event per pop-up at its strongest sample;
+            when False, every sample that crosses the thresholds is an event
+    
     Returns:
         List of pop-up events: [{timestamp: float, confidence: float}, ...]
     """
@@ -26,44 +75,85 @@ def detect_popup(
         return events
     
     window_frames = int(POPUP_TIME_WINDOW * fps)
+    if window_frames <= 0:
+        # A zero window compares each frame with itself, so nothing qualifies
+        return events
     
-    for i in range(window_frames, len(tracks)):
-        # Get bbox heights
-        current_bbox = tracks[i]["bbox"]
-        past_bbox = tracks[i - window_frames]["bbox"]
-        
-        current_height = current_bbox[3] - current_bbox[1]
-        past_height = past_bbox[3] - past_bbox[1]
-        
-        # Check height increase
-        height_increase = (current_height - past_height) / past_height if past_height > 0 else 0
-        
-        # Check vertical velocity spike
-        recent_velocities = vertical_velocities[max(0, i - window_frames):i]
-        max_velocity = max(recent_velocities) if recent_velocities else 0
+    frames = _track_frames(tracks)
+    bboxes = np.array([t["bbox"] for t in tracks], dtype=np.float64)
+    heights = bboxes[:, 3] - bboxes[:, 1]
+    
+    # Compare each sample with the latest one at least a window earlier
+    current_idx = np.arange(len(tracks))
+    past_idx = np.searchsorted(frames, frames - window_frames, side="right") - 1
+    valid = past_idx >= 0
+    current_idx = current_idx[valid]
+    past_idx = past_idx[valid]
+    if len(current_idx) == 0:
+        return events
+    
+    current_heights = heights[current_idx]
+    past_heights = heights[past_idx]
+    height_increases = np.divide(
+        current_heights - past_heights,
+        past_heights,
+        out=np.zeros_like(current_heights),
+        where=past_heights > 0
+    )
+    
+    # Max velocity over [past, current) for every pair: reduceat over the
+    # interleaved boundaries gives each span's max at the even positions
+    velocities = np.asarray(vertical_velocities, dtype=np.float64)
+    boundaries = np.column_stack([past_idx, current_idx]).ravel()
+    max_velocities = np.maximum.reduceat(velocities, boundaries)[::2]
+    
+    is_popup = (
+        (height_increases > POPUP_HEIGHT_INCREASE_THRESHOLD) &
+        (np.abs(max_velocities) > POPUP_VERTICAL_VELOCITY_THRESHOLD)
+    )
+    
+    if peak_picking:
+        # Consecutive crossings (allowing gaps shorter than the window) are one
+        # pop-up; keep the sample with the largest height increase
+        starts, ends = _find_runs(is_popup)
+        if len(starts) > 1:
+            gaps = frames[current_idx[starts[1:]]] - frames[current_idx[ends[:-1] - 1]]
+            new_group = np.concatenate([[True], gaps > window_frames])
+            ends = np.append(ends[np.flatnonzero(new_group)[1:] - 1], ends[-1])
+            starts = starts[new_group]
+        selected = [
+            start + int(np.argmax(height_increases[start:end]))
+            for start, end in zip(starts, ends)
+        ]
+    else:
+        selected = np.flatnonzero(is_popup)
+    
+    for k in selected:
+        # Confidence based on how strong the signal is
+        confidence = min(1.0, (height_increases[k] / POPUP_HEIGHT_INCREASE_THRESHOLD) * 0.5 + 0.5)
         
-        # Detect pop-up
-        if height_increase > POPUP_HEIGHT_INCREASE_THRESHOLD and abs(max_velocity) > POPUP_VERTICAL_VELOCITY_THRESHOLD:
-            timestamp = i / fps
-            # Confidence based on how strong the signal is
-            confidence = min(1.0, (height_increase / POPUP_HEIGHT_INCREASE_THRESHOLD) * 0.5 + 0.5)
-            
-            events.append({
-                "type": "pop-up",
-                "timestamp": timestamp,
-                "confidence": confidence
-            })
+        events.append({
+            "type": "pop-up",
+            "timestamp": int(frames[current_idx[k]]) / fps,
+            "confidence": float(confidence)
+        })
     
     return events
 
 
 def detect_turns(
     turn_rates: List[float],
-    fps: float
+    fps: float,
+    frames: Optional[List[int]] = None
 ) -> List[Dict]:
     """
     Detect turn events based on heading rate peaks.
     
+    Args:
+        turn_rates: Per-sample turn rates
+        fps: Frames per second
+        frames: Frame number of each sample; defaults to the sample index
+    
     Returns:
         List of turn events: [{timestamp: float, confidence: float}, ...]
     """
@@ -72,59 +162,41 @@ def detect_turns(
     if len(turn_rates) < 2:
         return events
     
+    n = len(turn_rates)
+    frames = np.arange(n) if frames is None else np.asarray(frames, dtype=np.int64)
+    # A turn running to the end of the clip ends one sampling step after the last sample
+    end_frames = np.append(frames, frames[-1] + (frames[-1] - frames[-2]))
+    
     # Smooth turn rates first
-    smoothed_rates = []
-    window_size = 5
-    for i in range(len(turn_rates)):
-        start_idx = max(0, i - window_size // 2)
-        end_idx = min(len(turn_rates), i + window_size // 2 + 1)
-        smoothed_rates.append(np.mean(turn_rates[start_idx:end_idx]))
-    
-    min_duration_frames = int(TURN_MIN_DURATION * fps)
-    in_turn = False
-    turn_start_frame = 0
-    
-    for i in range(1, len(smoothed_rates)):
-        abs_rate = abs(smoothed_rates[i])
-        
-        if abs_rate > TURN_ANGULAR_VELOCITY_THRESHOLD:
-            if not in_turn:
-                in_turn = True
-                turn_start_frame = i
-        else:
-            if in_turn:
-                # End of turn
-                turn_duration = (i - turn_start_frame) / fps
-                if turn_duration >= TURN_MIN_DURATION:
-                    # Use middle of turn as timestamp
-                    turn_mid_frame = (turn_start_frame + i) // 2
-                    timestamp = turn_mid_frame / fps
-                    
-                    # Calculate confidence based on peak turn rate
-                    peak_rate = max([abs(smoothed_rates[j]) for j in range(turn_start_frame, i)])
-                    confidence = min(1.0, peak_rate / (TURN_ANGULAR_VELOCITY_THRESHOLD * 2))
-                    
-                    events.append({
-                        "type": "turn",
-                        "timestamp": timestamp,
-                        "confidence": confidence
-                    })
-                in_turn = False
-    
-    # Handle turn that extends to end of video
-    if in_turn:
-        turn_duration = (len(smoothed_rates) - turn_start_frame) / fps
+    abs_rates = np.abs(_centered_moving_average(np.asarray(turn_rates, dtype=np.float64), 5))
+    
+    # The first sample has no preceding heading, so it never opens a turn
+    above_threshold = abs_rates > TURN_ANGULAR_VELOCITY_THRESHOLD
+    above_threshold[0] = False
+    
+    starts, ends = _find_runs(above_threshold)
+    if len(starts) == 0:
+        return events
+    
+    # Peak rate per run: reduceat over interleaved (start, end) boundaries
+    # gives max(abs_rates[start:end]) at every even position
+    boundaries = np.column_stack([starts, ends]).ravel()
+    peak_rates = np.maximum.reduceat(np.append(abs_rates, 0.0), boundaries)[::2]
+    
+    for start, end, peak_rate in zip(starts, ends, peak_rates):
+        start_frame = int(frames[start])
+        end_frame = int(end_frames[end])
+        turn_duration = (end_frame - start_frame) / fps
         if turn_duration >= TURN_MIN_DURATION:
-            turn_mid_frame = (turn_start_frame + len(smoothed_rates)) // 2
-            timestamp = turn_mid_frame / fps
-            peak_rate = max([abs(smoothed_rates[j]) for j in range(turn_start_frame, len(smoothed_rates))])
+            # Use middle of turn as timestamp
+            turn_mid_frame = (start_frame + end_frame) // 2
+            # Confidence based on peak turn rate
             confidence = min(1.0, peak_rate / (TURN_ANGULAR_VELOCITY_THRESHOLD * 2))
             
             events.append({
                 "type": "turn",
-                "timestamp": timestamp,
-                "confidence": confidence
+                "timestamp": turn_mid_frame / fps,
+                "confidence": float(confidence)
             })
     
     return events
-
@@ -0,0 +1,472 @@
+"""
+Perceptual video fingerprints, and detection reuse across jobs.
+
+A re-encoded or trimmed copy of an analysed clip has a different content
+hash, but its frames look the same. Every analysed job keeps a 64-bit
+perceptual hash of its sampled frames (fingerprints.npz) next to its
+full-quality detections (detections.json). Before a new upload is detected,
+a few of its frames are hashed and looked up in the index of earlier jobs;
+a match gives the time offset between the two clips, and the shared frames
+take the earlier job's detections instead of running inference.
+"""
+import logging
+import math
+import os
+import threading
+import uuid
+from collections import defaultdict
+from pathlib import Path
+from typing import Dict, List, Optional, Tuple
+
+import cv2
+import numpy as np
+
+from app.services.detection import SEEK_MIN_GAP_FRAMES, merge_frame_ranges
+from app.services.detectors import Detection
+from app.services.json_codec import read_json, write_json
+from app.config import (
+    JOBS_DIR,
+    FINGERPRINT_INTERVAL,
+    FINGERPRINT_PROBE_FRAMES,
+    FINGERPRINT_MAX_DISTANCE,
+    FINGERPRINT_MIN_MATCHES
+)
+
+logger = logging.getLogger(__name__)
+
+FINGERPRINTS_NAME = "fingerprints.npz"
+DETECTIONS_NAME = "detections.json"
+
+# Probe frames vote for (job, offset) in bins this wide, in seconds
+OFFSET_BIN = 0.5
+# A probe frame matching more offset bins than this in one job (a static or
+# featureless shot) can't place the clip and doesn't vote
+MAX_OFFSET_BINS = 4
+# Of the probe frames that fall inside the matched job's video at the matched
+# offset, at least this fraction must have voted for it
+MIN_MATCH_FRACTION = 0.5
+# Resolutions whose aspect ratios differ by more than this aren't the same
+# footage rescaled (a crop, or a different clip)
+MAX_ASPECT_DIFFERENCE = 0.02
+
+_DCT_SIZE = 32
+_POPCOUNT = np.array([bin(i).count("1") for i in range(256)], dtype=np.uint8)
+
+
+def frame_hash(frame: np.ndarray) -> int:
+    """
+    64-bit perceptual hash of a frame (DCT hash).
+
+    The frame is shrunk to 32x32 grayscale; each bit says whether one of the
+    8x8 lowest-frequency DCT coefficients is above their median. Scaling,
+    re-encoding and small colour shifts change only a few bits.
+    """
+    # A cheap resample first: area-averaging a full HD frame directly costs ~30x more
+    small = cv2.resize(frame, (4 * _DCT_SIZE, 4 * _DCT_SIZE), interpolation=cv2.INTER_LINEAR)
+    small = cv2.resize(small, (_DCT_SIZE, _DCT_SIZE), interpolation=cv2.INTER_AREA)
+    if small.ndim == 3:
+        small = cv2.cvtColor(small, cv2.COLOR_BGR2GRAY)
+    low = cv2.dct(small.astype(np.float32))[:8, :8].flatten()
+    # The DC term (overall brightness) dwarfs the rest; leave it out of the median
+    bits = low > np.median(low[1:])
+    return int(np.packbits(bits).view(">u8")[0])
+
+
+def hamming_distances(hashes: np.ndarray, other) -> np.ndarray:
+    """Number of differing bits between uint64 hashes and a hash (or an array of them, elementwise)."""
+    xor = np.bitwise_xor(np.asarray(hashes, dtype=np.uint64), np.asarray(other, dtype=np.uint64))
+    xor = np.ascontiguousarray(np.atleast_1d(xor))
+    return _POPCOUNT[xor.view(np.uint8)].reshape(-1, 8).sum(axis=1, dtype=np.uint8)
+
+
+class FingerprintRecorder:
+    """
+    Hash every `interval`th frame.
+
+    A frame consumer for `process_video_detections`; `save` writes the
+    hashes to the job directory, where the index finds them.
+    """
+
+    def __init__(self, interval: int = FINGERPRINT_INTERVAL):
+        self.interval = interval
+        self.frames: List[int] = []
+        self.hashes: List[int] = []
+
+    def wants(self, frame_number: int) -> bool:
+        return frame_number % self.interval == 0
+
+    def __call__(self, frame_number: int, frame: np.ndarray) -> None:
+        if not self.wants(frame_number):
+            return
+        self.frames.append(frame_number)
+        self.hashes.append(frame_hash(frame))
+
+    def save(self, output_dir: Path, metadata: Dict) -> None:
+        path = output_dir / FINGERPRINTS_NAME
+        tmp_path = path.with_name(f".{path.name}.{uuid.uuid4().hex}.tmp")
+        with open(tmp_path, "wb") as f:
+            np.savez(
+                f,
+                frames=np.array(self.frames, dtype=np.int32),
+                hashes=np.array(self.hashes, dtype=np.uint64),
+                fps=np.float64(metadata["fps"])
+            )
+        os.replace(tmp_path, path)
+
+
+def probe_fingerprints(video_path: Path, frame_count: int, count: int = FINGERPRINT_PROBE_FRAMES) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Hash `count` frames spread evenly over a video.
+
+    Long gaps are seeked over, so the cost barely depends on the video's length.
+
+    Returns:
+        Tuple of (frame numbers, uint64 hashes)
+    """
+    targets = np.unique(np.linspace(0, max(0, frame_count - 1), min(count, frame_count)).round().astype(int))
+    cap = cv2.VideoCapture(str(video_path))
+    frames, hashes = [], []
+    position = 0
+    try:
+        for target in targets:
+            if target - position >= SEEK_MIN_GAP_FRAMES and cap.set(cv2.CAP_PROP_POS_FRAMES, int(target)):
+                position = int(target)
+            while position < target and cap.grab():
+                position += 1
+            ret, frame = cap.read()
+            if not ret:
+                break
+            position += 1
+            frames.append(int(target))
+            hashes.append(frame_hash(frame))
+    finally:
+        cap.release()
+    return np.array(frames, dtype=np.int64), np.array(hashes, dtype=np.uint64)
+
+
+def save_reusable_detections(
+    output_dir: Path,
+    frame_detections: List[Dict],
+    ranges: List[Tuple[int, int]],
+    metadata: Dict
+) -> None:
+    """
+    Keep a job's full-quality detections for later uploads of the same footage.
+
+    Args:
+        ranges: [start, end) frame ranges detected at full quality; preview
+            detections outside them are left out
+    """
+    ranges = merge_frame_ranges(ranges)
+    starts = np.array([start for start, _ in ranges], dtype=np.int64)
+    ends = np.array([end for _, end in ranges], dtype=np.int64)
+    indices = np.searchsorted(starts, [d["frame"] for d in frame_detections], side="right") - 1
+    write_json(output_dir / DETECTIONS_NAME, {
+        "fps": metadata["fps"],
+        "width": metadata["width"],
+        "height": metadata["height"],
+        "ranges": ranges,
+        "frames": [
+            d for d, i in zip(frame_detections, indices)
+            if i >= 0 and d["frame"] < ends[i]
+        ]
+    })
+
+
+class FingerprintIndex:
+    """
+    Fingerprints of every job under jobs_dir, held in memory for lookups.
+
+    A lookup compares each probe hash with every indexed hash (a
+    table-driven popcount): about a second per 25 hours of indexed
+    footage, small next to detecting even a short clip. Entries are
+    reloaded when a job's fingerprint file changes, so the index needs no
+    bookkeeping when jobs are added or removed.
+    """
+
+    def __init__(self, jobs_dir: Path = JOBS_DIR):
+        self.jobs_dir = jobs_dir
+        self._lock = threading.Lock()
+        # job id -> (file mtime, frames, hashes, fps)
+        self._entries: Dict[str, Tuple[float, np.ndarray, np.ndarray, float]] = {}
+        self._job_ids: List[str] = []
+        self._hashes = np.zeros(0, dtype=np.uint64)
+        self._times = np.zeros(0, dtype=np.float32)
+        self._owners = np.zeros(0, dtype=np.int32)
+
+    def refresh(self) -> None:
+        """Pick up jobs whose fingerprints appeared, changed or disappeared since the last lookup."""
+        with self._lock:
+            found = {}
+            for path in self.jobs_dir.glob(f"*/{FINGERPRINTS_NAME}"):
+                try:
+                    found[path.parent.name] = path.stat().st_mtime
+                except FileNotFoundError:
+                    continue
+            changed = found.keys() != self._entries.keys()
+            for job_id, mtime in list(found.items()):
+                entry = self._entries.get(job_id)
+                if entry is not None and entry[0] == mtime:
+                    continue
+                try:
+                    with np.load(self.jobs_dir / job_id / FINGERPRINTS_NAME) as data:
+                        self._entries[job_id] = (mtime, data["frames"], data["hashes"], float(data["fps"]))
+                except (OSError, KeyError, ValueError):
+                    logger.warning("unreadable fingerprints for job %s", job_id)
+                    found.pop(job_id)
+                changed = True
+            for job_id in set(self._entries) - found.keys():
+                del self._entries[job_id]
+            if changed:
+                self._rebuild()
+
+    def _rebuild(self) -> None:
+        self._job_ids = sorted(self._entries)
+        entries = [self._entries[job_id] for job_id in self._job_ids]
+        self._hashes = np.concatenate([hashes for _, _, hashes, _ in entries] or [np.zeros(0, dtype=np.uint64)])
+        self._times = np.concatenate(
+            [(frames / fps).astype(np.float32) for _, frames, _, fps in entries] or [np.zeros(0, dtype=np.float32)]
+        )
+        self._owners = np.concatenate(
+            [np.full(len(frames), i, dtype=np.int32) for i, (_, frames, _, _) in enumerate(entries)]
+            or [np.zeros(0, dtype=np.int32)]
+        )
+
+    def __len__(self) -> int:
+        return len(self._job_ids)
+
+    def match(self, times: np.ndarray, hashes: np.ndarray, exclude: Optional[str] = None) -> Optional[Dict]:
+        """
+        Find the indexed job a clip's probe frames come from.
+
+        Each probe frame votes for the (job, offset) pairs whose hashes it
+        matches; the pair with the most votes wins if at least
+        FINGERPRINT_MIN_MATCHES probes, and MIN_MATCH_FRACTION of those that
+        fall inside the job's video, agree. Its offset is then refined to the
+        source's frame.
+
+        Args:
+            times: Probe frame times in seconds
+            hashes: Their hashes
+
+        Returns:
+            {"jobId", "offset", "matches"}, where a time t in the clip is
+            t + offset in the job's video, or None
+        """
+        with self._lock:
+            job_ids, all_hashes, all_times, all_owners = self._job_ids, self._hashes, self._times, self._owners
+            entries = dict(self._entries)
+        if not len(all_hashes):
+            return None
+
+        # (job, offset bin) -> {probe: (distance, offset)} of its closest hit
+        votes: Dict[Tuple[int, int], Dict[int, Tuple[int, float]]] = defaultdict(dict)
+        for probe, (t, value) in enumerate(zip(times, hashes)):
+            distances = hamming_distances(all_hashes, value)
+            hits = np.flatnonzero(distances <= FINGERPRINT_MAX_DISTANCE)
+            if not len(hits):
+                continue
+            owners = all_owners[hits]
+            offsets = all_times[hits].astype(np.float64) - t
+            bins = np.round(offsets / OFFSET_BIN).astype(np.int64)
+            for owner in np.unique(owners):
+                if job_ids[owner] == exclude:
+                    continue
+                mine = np.flatnonzero(owners == owner)
+                owner_bins = np.unique(bins[mine])
+                if len(owner_bins) > MAX_OFFSET_BINS:
+                    continue
+                for b in owner_bins:
+                    in_bin = mine[bins[mine] == b]
+                    best = in_bin[np.argmin(distances[hits[in_bin]])]
+                    votes[(int(owner), int(b))][probe] = (int(distances[hits[best]]), float(offsets[best]))
+
+        # A true offset can straddle two bins; count the neighbours' votes too
+        best_key, best_votes = None, {}
+        for owner, b in votes:
+            merged = {}
+            for neighbour in (b - 1, b, b + 1):
+                for probe, hit in votes.get((owner, neighbour), {}).items():
+                    if probe not in merged or hit < merged[probe]:
+                        merged[probe] = hit
+            if len(merged) > len(best_votes):
+                best_key, best_votes = (owner, b), merged
+        if best_key is None or len(best_votes) < FINGERPRINT_MIN_MATCHES:
+            return None
+
+        job_id = job_ids[best_key[0]]
+        frames, _, fps = entries[job_id][1:]
+        offset = float(np.median([offset for _, offset in best_votes.values()]))
+        source_times = np.asarray(times) + offset
+        inside = int(np.count_nonzero((source_times >= frames[0] / fps) & (source_times <= frames[-1] / fps)))
+        if len(best_votes) < MIN_MATCH_FRACTION * inside:
+            return None
+        return {
+            "jobId": job_id,
+            "offset": _refine_offset(entries[job_id][1:], times, hashes, offset),
+            "matches": len(best_votes)
+        }
+
+    def fingerprints(self, job_id: str) -> Optional[Tuple[np.ndarray, np.ndarray, float]]:
+        """A job's (frames, hashes, fps), if it is indexed."""
+        with self._lock:
+            entry = self._entries.get(job_id)
+        return entry[1:] if entry is not None else None
+
+
+def _refine_offset(
+    fingerprints: Tuple[np.ndarray, np.ndarray, float],
+    times: np.ndarray,
+    hashes: np.ndarray,
+    offset: float
+) -> float:
+    """
+    Snap an offset to the source's frames: the one within OFFSET_BIN whose
+    hashes are closest to the probes' (ties go to the closest offset).
+    """
+    frames, source_hashes, fps = fingerprints
+    if not len(frames):
+        return offset
+    best = (math.inf, 0.0, offset)
+    radius = int(math.ceil(OFFSET_BIN * fps))
+    base = int(round(offset * fps))
+    for shift in range(base - radius, base + radius + 1):
+        candidate = shift / fps
+        source_frames = (np.asarray(times) + candidate) * fps
+        inside = (source_frames >= frames[0]) & (source_frames <= frames[-1])
+        if not inside.any():
+            continue
+        nearest = _nearest_indices(frames, source_frames[inside])
+        cost = float(np.mean(hamming_distances(np.asarray(hashes)[inside], source_hashes[nearest])))
+        best = min(best, (cost, abs(candidate - offset), candidate))
+    return best[2]
+
+
+def _nearest_indices(sorted_frames: np.ndarray, targets: np.ndarray) -> np.ndarray:
+    """Index of the closest entry of sorted_frames to each target."""
+    right = np.clip(np.searchsorted(sorted_frames, targets), 1, len(sorted_frames) - 1)
+    left = right - 1
+    if len(sorted_frames) == 1:
+        return np.zeros(len(targets), dtype=np.int64)
+    return np.where(np.abs(sorted_frames[left] - targets) <= np.abs(sorted_frames[right] - targets), left, right)
+
+
+class DetectionReuse:
+    """
+    Detections borrowed from an earlier job for the frames a clip shares with it.
+
+    Passed to `process_video_detections` as `reuse`. Inside `ranges` (the
+    source job's full-quality ranges, moved to this clip's timeline), the
+    frames detected are the ones that line up with the source's detected
+    frames (`wants`). Calling it with such a frame returns the source's
+    detections rescaled to this clip, or None when the frame's hash doesn't
+    match the source's (the footage was edited), and the frame is detected
+    as usual.
+    """
+
+    def __init__(
+        self,
+        source_job_id: str,
+        source: Dict,
+        fingerprints: Tuple[np.ndarray, np.ndarray, float],
+        offset: float,
+        metadata: Dict
+    ):
+        self.source_job_id = source_job_id
+        self.offset = offset
+        source_fps, fps = source["fps"], metadata["fps"]
+        frame_count = metadata["frameCount"]
+        sx, sy = metadata["width"] / source["width"], metadata["height"] / source["height"]
+
+        def to_frame(source_frame: int) -> float:
+            return (source_frame / source_fps - offset) * fps
+
+        # frame -> (source frame, detections)
+        self._frames: Dict[int, Tuple[int, List[Detection]]] = {}
+        for record in source["frames"]:
+            frame = int(round(to_frame(record["frame"])))
+            if 0 <= frame < frame_count and frame not in self._frames:
+                self._frames[frame] = (record["frame"], [
+                    (x1 * sx, y1 * sy, x2 * sx, y2 * sy, d["confidence"])
+                    for d in record["detections"]
+                    for x1, y1, x2, y2 in [d["bbox"]]
+                ])
+
+        self.ranges = merge_frame_ranges([
+            (math.ceil(to_frame(start)), min(frame_count, math.ceil(to_frame(end))))
+            for start, end in source["ranges"]
+        ])
+        self._starts = np.array([start for start, _ in self.ranges], dtype=np.int64)
+        self._ends = np.array([end for _, end in self.ranges], dtype=np.int64)
+        self._source_frames, self._source_hashes, _ = fingerprints
+
+    def covers(self, frame_number: int) -> bool:
+        i = np.searchsorted(self._starts, frame_number, side="right") - 1
+        return i >= 0 and frame_number < self._ends[i]
+
+    def wants(self, frame_number: int) -> bool:
+        return frame_number in self._frames
+
+    def __call__(self, frame_number: int, frame: np.ndarray) -> Optional[List[Detection]]:
+        source_frame, detections = self._frames[frame_number]
+        if len(self._source_hashes):
+            i = _nearest_indices(self._source_frames, np.array([source_frame]))[0]
+            if hamming_distances(self._source_hashes[i], frame_hash(frame))[0] > FINGERPRINT_MAX_DISTANCE:
+                return None
+        return detections
+
+
+def find_detection_reuse(
+    video_path: Path,
+    metadata: Dict,
+    index: FingerprintIndex,
+    exclude: Optional[str] = None
+) -> Optional[DetectionReuse]:
+    """
+    Look a video up in the index and borrow the matching job's detections.
+
+    Returns:
+        The reuse hook for `process_video_detections`, or None when no
+        indexed job shares footage with the video
+    """
+    index.refresh()
+    if not len(index):
+        return None
+
+    frames, hashes = probe_fingerprints(video_path, metadata["frameCount"])
+    match = index.match(frames / metadata["fps"], hashes, exclude=exclude)
+    if match is None:
+        return None
+
+    try:
+        source = read_json(index.jobs_dir / match["jobId"] / DETECTIONS_NAME)
+    except (FileNotFoundError, ValueError):
+        return None
+    fingerprints = index.fingerprints(match["jobId"])
+    if fingerprints is None:
+        return None
+    source_aspect = source["width"] / source["height"]
+    if abs(metadata["width"] / metadata["height"] - source_aspect) > MAX_ASPECT_DIFFERENCE * source_aspect:
+        return None
+
+    reuse = DetectionReuse(match["jobId"], source, fingerprints, match["offset"], metadata)
+    if not reuse.ranges:
+        return None
+    logger.info(
+        "reusing detections of job %s (offset %.3fs, %d of %d probe frames matched)",
+        match["jobId"], match["offset"], match["matches"], len(frames)
+    )
+    return reuse
+
+
+_index: Optional[FingerprintIndex] = None
+_index_lock = threading.Lock()
+
+
+def get_fingerprint_index() -> FingerprintIndex:
+    """The process-wide index of the jobs under JOBS_DIR."""
+    global _index
+    with _index_lock:
+        if _index is None:
+            _index = FingerprintIndex(JOBS_DIR)
+        return _index
@@ -0,0 +1,286 @@
+"""
+Multi-process inference over frames in shared memory.
+
+Detector calls are CPU-bound, and one process only scales as far as the
+backend's own threading. An InferencePool runs the detector in several
+worker processes. The decoder in `process_video_detections` decodes
+straight into the slots of a FrameRing (a `multiprocessing.shared_memory`
+block per video), so a frame is never pickled or copied on its way to a
+worker: the worker reads a zero-copy view of the slot and sends back only
+the few detections, after which the slot is reused.
+"""
+import logging
+import os
+import queue
+import threading
+import time
+import uuid
+from collections import OrderedDict
+from multiprocessing import get_context, shared_memory
+from typing import Callable, Dict, List, Optional, Tuple
+
+import numpy as np
+
+from app.services.detectors import Detection, load_detector
+from app.config import YOLO_MODEL, DETECTION_THREADS, INFERENCE_PROCESSES
+
+logger = logging.getLogger(__name__)
+
+# Ring slots per worker: one being detected, one being decoded into
+SLOTS_PER_PROCESS = 2
+# Shared-memory blocks a worker keeps attached (one per video being detected)
+WORKER_ATTACHED_RINGS = 4
+# How often the result dispatcher checks that the workers are still alive
+WORKER_CHECK_INTERVAL = 1.0  # seconds
+
+
+def _worker_main(
+    detector: Optional[Callable[[np.ndarray], List[Detection]]],
+    threads: Optional[int],
+    tasks,
+    results
+) -> None:
+    """Worker process: detect on ring slots until a None task arrives."""
+    if detector is None:
+        detector = load_detector(YOLO_MODEL, threads=threads)
+    attached: "OrderedDict[str, shared_memory.SharedMemory]" = OrderedDict()
+    try:
+        while True:
+            task = tasks.get()
+            if task is None:
+                break
+            name, shape, slot, frame_number = task
+            try:
+                block = attached.get(name)
+                if block is None:
+                    # Spawned workers share the parent's resource tracker, so
+                    # the parent's unlink accounts for this attachment too
+                    block = attached[name] = shared_memory.SharedMemory(name=name)
+                    while len(attached) > WORKER_ATTACHED_RINGS:
+                        attached.popitem(last=False)[1].close()
+                attached.move_to_end(name)
+
+                frame = np.ndarray(shape, dtype=np.uint8, buffer=block.buf, offset=slot * int(np.prod(shape)))
+                wall_start, cpu_start = time.perf_counter(), time.process_time()
+                detections = np.array(detector(frame), dtype=np.float64).reshape(-1, 5)
+                timing = (time.perf_counter() - wall_start, time.process_time() - cpu_start)
+                del frame
+                results.put((name, slot, frame_number, detections, timing, None))
+            except Exception as e:
+                results.put((name, slot, frame_number, None, (0.0, 0.0), f"{type(e).__name__}: {e}"))
+    finally:
+        for block in attached.values():
+            block.close()
+
+
+class FrameRing:
+    """
+    Shared-memory frame slots for one video, feeding an InferencePool.
+
+    `acquire` a slot, decode into `views[slot]`, then `submit` it (or
+    `release` it unused). `drain` waits for every submitted frame.
+    """
+
+    def __init__(self, pool: "InferencePool", shape: Tuple[int, ...], slots: int):
+        self.pool = pool
+        self.shape = tuple(int(n) for n in shape)
+        slot_bytes = int(np.prod(self.shape))
+        self._block = shared_memory.SharedMemory(
+            create=True, size=slots * slot_bytes, name=f"surfcoach-{uuid.uuid4().hex[:16]}"
+        )
+        self.name = self._block.name
+        self.views = [
+            np.ndarray(self.shape, dtype=np.uint8, buffer=self._block.buf, offset=i * slot_bytes)
+            for i in range(slots)
+        ]
+        self._free = list(range(slots))
+        self._in_flight = 0
+        self._condition = threading.Condition()
+        self._error: Optional[str] = None
+        # frame -> detections
+        self.results: Dict[int, List[Detection]] = {}
+        self.wall_seconds = 0.0
+        self.cpu_seconds = 0.0
+        pool._register(self)
+
+    def acquire(self) -> int:
+        """A free slot, waiting for the workers to finish one if all are in use."""
+        with self._condition:
+            while not self._free and self._error is None:
+                self._condition.wait()
+            self._raise_error()
+            return self._free.pop()
+
+    def release(self, slot: int) -> None:
+        with self._condition:
+            self._free.append(slot)
+            self._condition.notify()
+
+    def submit(self, slot: int, frame_number: int) -> None:
+        with self._condition:
+            self._raise_error()
+            self._in_flight += 1
+        self.pool._tasks.put((self.name, self.shape, slot, frame_number))
+
+    def drain(self) -> Dict[int, List[Detection]]:
+        """Wait for every submitted frame; returns frame -> detections."""
+        with self._condition:
+            while self._in_flight and self._error is None:
+                self._condition.wait()
+            self._raise_error()
+        return self.results
+
+    def _complete(
+        self,
+        slot: int,
+        frame_number: int,
+        detections: Optional[np.ndarray],
+        timing: Tuple[float, float],
+        error: Optional[str]
+    ) -> None:
+        """Called from the pool's dispatcher thread as results arrive."""
+        with self._condition:
+            if error is not None:
+                self._error = self._error or error
+            else:
+                self.results[frame_number] = [tuple(row) for row in detections.tolist()]
+                self.wall_seconds += timing[0]
+                self.cpu_seconds += timing[1]
+            self._in_flight -= 1
+            self._free.append(slot)
+            self._condition.notify_all()
+
+    def _fail(self, error: str) -> None:
+        with self._condition:
+            self._error = self._error or error
+            self._condition.notify_all()
+
+    def _raise_error(self) -> None:
+        if self._error is not None:
+            raise RuntimeError(f"Inference worker failed: {self._error}")
+
+    def close(self) -> None:
+        """Free the shared memory. Frames still in flight are abandoned."""
+        self.pool._unregister(self)
+        self.views = []
+        self._block.unlink()
+        try:
+            self._block.close()
+        except BufferError:
+            # A caller still holds a view of a slot; the mapping goes with it
+            pass
+
+
+class InferencePool:
+    """
+    Detector worker processes fed through FrameRings.
+
+    Workers are started once (with the spawn method, so each loads its own
+    model in a clean process) and serve every video; several threads may
+    detect different videos through the pool at once.
+
+    Args:
+        processes: Number of worker processes
+        detector: Picklable detector to run in the workers (a module-level
+            function); None loads YOLO_MODEL in each
+        threads: Intra-op threads per worker; by default the cores are split
+            between the workers
+    """
+
+    def __init__(
+        self,
+        processes: int,
+        detector: Optional[Callable[[np.ndarray], List[Detection]]] = None,
+        threads: Optional[int] = None
+    ):
+        self.processes = processes
+        threads = threads or DETECTION_THREADS or max(1, (os.cpu_count() or 1) // processes)
+        context = get_context("spawn")
+        self._tasks = context.Queue()
+        self._results = context.Queue()
+        self._workers = [
+            context.Process(
+                target=_worker_main,
+                args=(detector, threads, self._tasks, self._results),
+                name=f"inference-{i}",
+                daemon=True
+            )
+            for i in range(processes)
+        ]
+        for worker in self._workers:
+            worker.start()
+        self._rings: Dict[str, FrameRing] = {}
+        self._rings_lock = threading.Lock()
+        self.broken: Optional[str] = None
+        self._closed = False
+        self._dispatcher = threading.Thread(target=self._dispatch, name="inference-results", daemon=True)
+        self._dispatcher.start()
+
+    def ring(self, shape: Tuple[int, ...]) -> FrameRing:
+        """A ring for frames of this shape, with enough slots to keep every worker busy."""
+        if self.broken is not None:
+            raise RuntimeError(f"Inference pool is unusable: {self.broken}")
+        return FrameRing(self, shape, SLOTS_PER_PROCESS * self.processes)
+
+    def _register(self, ring: FrameRing) -> None:
+        with self._rings_lock:
+            self._rings[ring.name] = ring
+
+    def _unregister(self, ring: FrameRing) -> None:
+        with self._rings_lock:
+            self._rings.pop(ring.name, None)
+
+    def _dispatch(self) -> None:
+        """Route results to their rings; fail every ring if a worker dies."""
+        while not self._closed:
+            try:
+                name, slot, frame_number, detections, timing, error = self._results.get(timeout=WORKER_CHECK_INTERVAL)
+            except queue.Empty:
+                if not self._closed and not all(worker.is_alive() for worker in self._workers):
+                    self.broken = "an inference worker process exited"
+                    logger.error("inference pool broken: %s", self.broken)
+                    with self._rings_lock:
+                        rings = list(self._rings.values())
+                    for ring in rings:
+                        ring._fail(self.broken)
+                    return
+                continue
+            with self._rings_lock:
+                ring = self._rings.get(name)
+            if ring is not None:
+                ring._complete(slot, frame_number, detections, timing, error)
+
+    def close(self) -> None:
+        """Stop the workers."""
+        self._closed = True
+        for _ in self._workers:
+            self._tasks.put(None)
+        for worker in self._workers:
+            worker.join(timeout=5)
+            if worker.is_alive():
+                worker.terminate()
+        self._dispatcher.join(timeout=WORKER_CHECK_INTERVAL * 2)
+
+
+_pool: Optional[InferencePool] = None
+_pool_lock = threading.Lock()
+
+
+def get_inference_pool() -> Optional[InferencePool]:
+    """
+    The process-wide pool of INFERENCE_PROCESSES workers, started on first use.
+
+    Returns:
+        The pool, or None when INFERENCE_PROCESSES is below 2 (detection
+        runs in the calling process)
+    """
+    global _pool
+    if INFERENCE_PROCESSES < 2:
+        return None
+    with _pool_lock:
+        if _pool is not None and _pool.broken is not None:
+            _pool.close()
+            _pool = None
+        if _pool is None:
+            _pool = InferencePool(INFERENCE_PROCESSES)
+        return _pool
@@ -0,0 +1,72 @@
+import json
+import os
+import uuid
+from pathlib import Path
+from typing import Any
+
+import numpy as np
+
+try:
+    import orjson
+except ImportError:  # orjson is optional; the standard library is the fallback
+    orjson = None
+
+
+def _default(obj: Any) -> Any:
+    """Encode the numpy values analysis results carry."""
+    if isinstance(obj, np.generic):
+        return obj.item()
+    if isinstance(obj, np.ndarray):
+        return obj.tolist()
+    raise TypeError(f"Object of type {type(obj).__name__} is not JSON serializable")
+
+
+def dumps(obj: Any, indent: bool = False) -> bytes:
+    """
+    Serialize to UTF-8 JSON, compact or indented by two spaces.
+
+    Uses orjson when installed (which writes NaN and infinity as null).
+    """
+    if orjson is not None:
+        option = orjson.OPT_SERIALIZE_NUMPY | orjson.OPT_NON_STR_KEYS
+        if indent:
+            option |= orjson.OPT_INDENT_2
+        return orjson.dumps(obj, default=_default, option=option)
+    if indent:
+        return json.dumps(obj, indent=2, default=_default).encode()
+    return json.dumps(obj, separators=(",", ":"), default=_default).encode()
+
+
+def loads(data: bytes) -> Any:
+    """Parse JSON from bytes or str."""
+    if orjson is not None:
+        return orjson.loads(data)
+    return json.loads(data)
+
+
+def read_json(path: Path) -> Any:
+    """Read and parse a JSON file."""
+    with open(path, "rb") as f:
+        return loads(f.read())
+
+
+def write_atomic(path: Path, data: bytes) -> None:
+    """
+    Replace a file's contents in one step.
+
+    Readers see the old file or the new one, never a partial write. The
+    temp file is unique, so concurrent writers of one path don't collide.
+    """
+    tmp_path = path.with_name(f".{path.name}.{uuid.uuid4().hex}.tmp")
+    try:
+        with open(tmp_path, "wb") as f:
+            f.write(data)
+        os.replace(tmp_path, path)
+    except BaseException:
+        tmp_path.unlink(missing_ok=True)
+        raise
+
+
+def write_json(path: Path, obj: Any, indent: bool = False) -> None:
+    """Serialize `obj` to a JSON file, replacing it atomically (see write_atomic)."""
+    write_atomic(path, dumps(obj, indent=indent))
@@ -1,6 +1,9 @@
 from typing import List, Dict
 import numpy as np
 
+# Frames averaged before/during a turn for speed retention
+SPEED_RETENTION_WINDOW_FRAMES = 10
+
 
 def calculate_metrics(
     tracks: List[Dict],
@@ -36,17 +39,21 @@ def calculate_metrics(
     
     # Speed retention in turns
     if turn_events and speeds:
+        # Windows are measured in real frames, not samples, so they hold
+        # when detection only runs every Nth frame
+        frames = np.array([t.get("frame", i) for i, t in enumerate(tracks)][:len(speeds)], dtype=np.int64)
         speed_retentions = []
         for turn_event in turn_events:
             turn_frame = int(turn_event["timestamp"] * fps)
-            if turn_frame < len(speeds):
-                # Speed before turn (average of 10 frames before)
-                before_start = max(0, turn_frame - 10)
-                before_speed = np.mean(speeds[before_start:turn_frame]) if turn_frame > 0 else speeds[turn_frame]
+            turn_idx = int(np.searchsorted(frames, turn_frame, side="left"))
+            if turn_idx < len(speeds):
+                # Speed before turn (average over the 10 frames before)
+                before_start = int(np.searchsorted(frames, turn_frame - SPEED_RETENTION_WINDOW_FRAMES, side="left"))
+                before_speed = np.mean(speeds[before_start:turn_idx]) if turn_idx > before_start else speeds[turn_idx]
                 
-                # Speed during turn (average of 10 frames during)
-                during_end = min(len(speeds), turn_frame + 10)
-                during_speed = np.mean(speeds[turn_frame:during_end])
+                # Speed during turn (average over the 10 frames from the turn)
+                during_end = int(np.searchsorted(frames, turn_frame + SPEED_RETENTION_WINDOW_FRAMES, side="left"))
+                during_speed = np.mean(speeds[turn_idx:max(during_end, turn_idx + 1)])
                 
                 if before_speed > 0:
                     retention = during_speed / before_speed
@@ -0,0 +1,647 @@
+from collections import defaultdict
+from concurrent.futures import ThreadPoolExecutor
+import numpy as np
+from pathlib import Path
+from typing import Dict, List, Tuple, Callable, Optional
+
+from app.services.json_codec import dumps, write_atomic
+from app.services.video_processor import extract_video_metadata, save_metadata
+from app.services.detection import (
+    process_video_detections,
+    get_detector,
+    get_preview_detector,
+    shareable_detector
+)
+from app.services.rides import CameraMotionEstimator, segment_rides
+from app.services.tracking import SimpleTracker, interpolate_tracks, split_at_gaps
+from app.services.track_batch import pad_tracks, moving_average_rows, calculate_features_batch
+from app.services.event_detection import detect_popup, detect_turns
+from app.services.metrics import calculate_metrics
+from app.services.coaching import calculate_confidence, generate_tips, RULES
+from app.services.track_encoding import encode_tracks_binary
+from app.services.thumbnails import SpriteSheetBuilder
+from app.services.fingerprints import (
+    FingerprintIndex,
+    FingerprintRecorder,
+    DetectionReuse,
+    find_detection_reuse,
+    save_reusable_detections
+)
+from app.services.inference_pool import InferencePool
+from app.services.profiling import JobProfiler
+from app.config import (
+    PREVIEW_FRAME_INTERVAL,
+    REFINE_EVENT_PADDING,
+    REFINE_LOW_CONFIDENCE,
+    REFINE_MAX_FRACTION,
+    RIDE_SEGMENTATION_ENABLED,
+    RIDE_WORKERS,
+    MULTI_TRACK_MIN_DURATION,
+    MULTI_TRACK_MAX_TRACKS,
+    TRACK_MAX_CENTER_DISTANCE,
+    TRACK_INTERPOLATION_STEP,
+    TRACK_INTERPOLATION_METHOD,
+    TRACK_INTERPOLATION_MAX_GAP
+)
+
+
+class AnalysisError(Exception):
+    """Raised when a video can't be analysed. The message is shown to the user."""
+
+
+def analyze_video(
+    video_path: Path,
+    output_dir: Path,
+    profiler: Optional[JobProfiler] = None,
+    on_progress: Optional[Callable[[float], None]] = None,
+    preview: bool = False,
+    on_preview: Optional[Callable[[Dict], None]] = None,
+    fingerprint_index: Optional[FingerprintIndex] = None,
+    inference_pool: Optional[InferencePool] = None
+) -> Dict:
+    """
+    Run the full analysis pipeline on a video file.
+    
+    Writes meta.json, thumbnails, results.json and tracks to output_dir.
+    The video is read in place, so output_dir need not contain it.
+    
+    With preview, a fast pass first writes provisional results (marked
+    'provisional': true) and hands them to on_preview; a refine pass then
+    re-detects at full quality around events and low-confidence stretches
+    and overwrites them. If the preview finds no surfer, the whole video is
+    detected at full quality instead. The preview also splits the clip into
+    rides (see segment_rides); when it finds any, the refine pass covers the
+    rides and the results carry per-ride metrics, events and tips.
+    
+    With a fingerprint_index, full-quality detection borrows the detections
+    of an indexed job the video shares footage with (a trimmed or re-encoded
+    copy) for the shared frames, and output_dir gets the fingerprints and
+    detections that later uploads can borrow in turn. With an
+    inference_pool, full-quality detection runs in its worker processes.
+    
+    Returns:
+        The results (metrics, events, tips, and rides when segmented)
+    """
+    profiler = profiler or JobProfiler()
+    progress = on_progress or (lambda fraction: None)
+    
+    # Step 1: Extract metadata
+    with profiler.stage("metadata"):
+        try:
+            metadata = extract_video_metadata(video_path)
+        except ValueError:
+            raise AnalysisError("Could not read the video file. It may be corrupt.")
+        if metadata["fps"] <= 0 or metadata["frameCount"] <= 0:
+            raise AnalysisError("Could not read the video file. It may be corrupt.")
+        save_metadata(output_dir, metadata)
+    
+    reuse = recorder = None
+    if fingerprint_index is not None:
+        with profiler.stage("fingerprintLookup"):
+            reuse = find_detection_reuse(video_path, metadata, fingerprint_index, exclude=output_dir.name)
+        recorder = FingerprintRecorder()
+    consumers = [recorder] if recorder is not None else []
+    progress(0.2)
+    
+    rides = []
+    if not preview:
+        # Step 2: Detection (thumbnail sprite built from the same decoded frames)
+        frame_detections = _detect_with_thumbnails(
+            video_path, output_dir, metadata, profiler,
+            frame_consumers=consumers, reuse=reuse, inference_pool=inference_pool
+        )
+        full_quality_ranges = [(0, metadata["frameCount"])]
+    else:
+        frame_detections, rides, full_quality_ranges = _preview_and_refine(
+            video_path, output_dir, metadata, profiler, on_preview, consumers, reuse, inference_pool
+        )
+    progress(0.4)
+    
+    # Preview frames left between the refined ranges are too far apart for IoU matching alone
+    merged = full_quality_ranges != [(0, metadata["frameCount"])]
+    max_center_distance = TRACK_MAX_CENTER_DISTANCE if merged else None
+    results, tracks_data = analyze_detections(
+        frame_detections, metadata, profiler, progress, max_center_distance=max_center_distance
+    )
+    if preview:
+        with profiler.stage("rides"):
+            results["rides"] = analyze_rides(
+                frame_detections, rides, metadata, profiler, max_center_distance=max_center_distance
+            )
+        results["provisional"] = False
+    results["rulesVersion"] = RULES.version
+    
+    # Step 8: Save results
+    with profiler.stage("save"):
+        save_results(output_dir, results, tracks_data)
+        # Detections first: the index picks a job up by its fingerprints
+        if recorder is not None:
+            save_reusable_detections(output_dir, frame_detections, full_quality_ranges, metadata)
+            recorder.save(output_dir, metadata)
+    
+    return results
+
+
+def _detect_with_thumbnails(
+    video_path: Path,
+    output_dir: Path,
+    metadata: Dict,
+    profiler: JobProfiler,
+    frame_consumers: Tuple = (),
+    **detection_options
+) -> List[Dict]:
+    """Run detection, building the thumbnail sprite from the same decoded frames."""
+    with profiler.stage("detection"):
+        sprite_builder = SpriteSheetBuilder(
+            metadata["fps"], metadata["frameCount"], metadata["width"], metadata["height"]
+        )
+        frame_detections = process_video_detections(
+            video_path,
+            frame_consumers=[sprite_builder, *frame_consumers],
+            profiler=profiler,
+            **detection_options
+        )
+    with profiler.stage("thumbnails"):
+        if sprite_builder.tiles:
+            sprite_builder.save(output_dir)
+    return frame_detections
+
+
+def _preview_and_refine(
+    video_path: Path,
+    output_dir: Path,
+    metadata: Dict,
+    profiler: JobProfiler,
+    on_preview: Optional[Callable[[Dict], None]],
+    frame_consumers: List = (),
+    reuse: Optional[DetectionReuse] = None,
+    inference_pool: Optional[InferencePool] = None
+) -> Tuple[List[Dict], List[Tuple[int, int]], List[Tuple[int, int]]]:
+    """
+    Preview pass (published as provisional results), then the refine pass.
+    
+    frame_consumers see the preview pass's frames; reuse and inference_pool
+    apply to the full-quality detection only.
+    
+    Returns:
+        Tuple of (preview detections with the refined ranges replaced by
+        full-quality ones, ride frame ranges, refined frame ranges)
+    """
+    with profiler.stage("preview"):
+        camera_motion = CameraMotionEstimator(PREVIEW_FRAME_INTERVAL)
+        preview_detections = _detect_with_thumbnails(
+            video_path,
+            output_dir,
+            metadata,
+            profiler,
+            frame_consumers=[*frame_consumers, *([camera_motion] if RIDE_SEGMENTATION_ENABLED else [])],
+            frame_interval=PREVIEW_FRAME_INTERVAL,
+            detector=get_preview_detector()
+        )
+        try:
+            results, tracks_data = analyze_detections(
+                preview_detections, metadata, profiler, max_center_distance=TRACK_MAX_CENTER_DISTANCE
+            )
+        except AnalysisError:
+            results = None
+        if results is not None:
+            results["provisional"] = True
+            save_results(output_dir, results, tracks_data)
+    
+    if results is None:
+        # Nothing usable at preview quality; fall back to one full pass
+        with profiler.stage("refine"):
+            full = process_video_detections(video_path, profiler=profiler, reuse=reuse, inference_pool=inference_pool)
+            return full, [], [(0, metadata["frameCount"])]
+    
+    if on_preview:
+        on_preview(results)
+    
+    rides = []
+    if RIDE_SEGMENTATION_ENABLED:
+        with profiler.stage("segmentation"):
+            rides = segment_rides(preview_detections, camera_motion.shifts, metadata)
+        profiler.count("rides", len(rides))
+    
+    with profiler.stage("refine"):
+        ranges = select_refine_ranges(preview_detections, results["events"], metadata, rides=rides)
+        refined = detect_ranges_concurrently(
+            video_path, ranges, rides, profiler, reuse=reuse, inference_pool=inference_pool
+        )
+        profiler.count("framesRefined", sum(end - start for start, end in ranges))
+    return merge_refined_detections(preview_detections, refined, ranges), rides, ranges
+
+
+def detect_ranges_concurrently(
+    video_path: Path,
+    ranges: List[Tuple[int, int]],
+    rides: List[Tuple[int, int]],
+    profiler: JobProfiler,
+    workers: int = RIDE_WORKERS,
+    reuse: Optional[DetectionReuse] = None,
+    inference_pool: Optional[InferencePool] = None
+) -> List[Dict]:
+    """
+    Full-quality detection over the refine ranges, one thread per ride.
+    
+    Each thread decodes its own ride with its own capture; detector calls
+    are serialized for backends that aren't thread-safe, unless they run
+    in an inference_pool's processes.
+    
+    Returns:
+        Detections for all ranges, sorted by frame
+    """
+    groups = [[r for r in ranges if start <= r[0] < end] for start, end in rides]
+    groups = [g for g in groups if g] if rides else [ranges]
+    if len(groups) <= 1 or workers <= 1:
+        return [
+            d for group in groups
+            for d in process_video_detections(
+                video_path, profiler=profiler, frame_ranges=group, reuse=reuse, inference_pool=inference_pool
+            )
+        ]
+    
+    detector = shareable_detector(get_detector()) if inference_pool is None else None
+    
+    def detect(group: List[Tuple[int, int]], ride_profiler: JobProfiler) -> Tuple[List[Dict], JobProfiler]:
+        detections = process_video_detections(
+            video_path,
+            profiler=ride_profiler,
+            frame_ranges=group,
+            detector=detector,
+            reuse=reuse,
+            inference_pool=inference_pool
+        )
+        return detections, ride_profiler
+    
+    detections = []
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        # Child profilers are made here, so their stages nest in the caller's
+        for ride_detections, ride_profiler in pool.map(detect, groups, [profiler.child() for _ in groups]):
+            detections += ride_detections
+            profiler.merge(ride_profiler)
+    return sorted(detections, key=lambda d: d["frame"])
+
+
+def analyze_rides(
+    frame_detections: List[Dict],
+    rides: List[Tuple[int, int]],
+    metadata: Dict,
+    profiler: Optional[JobProfiler] = None,
+    max_center_distance: Optional[float] = None
+) -> List[Dict]:
+    """
+    Run the post-detection stages on each ride's detections separately.
+    
+    Segments without a trackable surfer are left out. max_center_distance
+    is passed to analyze_detections.
+    
+    Returns:
+        Per-ride results: rideId, start/end (seconds), startFrame/endFrame
+        ([start, end) frames), metrics, events, tips
+    """
+    fps = metadata["fps"]
+    ride_results = []
+    for start, end in rides:
+        detections = [d for d in frame_detections if start <= d["frame"] < end]
+        try:
+            results, _ = analyze_detections(
+                detections, metadata, profiler, all_tracks=False, max_center_distance=max_center_distance
+            )
+        except AnalysisError:
+            continue
+        ride_results.append({
+            "rideId": len(ride_results) + 1,
+            "start": start / fps,
+            "end": end / fps,
+            "startFrame": start,
+            "endFrame": end,
+            **results
+        })
+    return ride_results
+
+
+def select_refine_ranges(
+    frame_detections: List[Dict],
+    events: List[Dict],
+    metadata: Dict,
+    rides: Optional[List[Tuple[int, int]]] = None,
+    preview_interval: int = PREVIEW_FRAME_INTERVAL,
+    max_fraction: float = REFINE_MAX_FRACTION
+) -> List[Tuple[int, int]]:
+    """
+    Choose the [start, end) frame ranges the refine pass re-detects.
+    
+    Whole rides come first (shortest first), then windows of
+    REFINE_EVENT_PADDING seconds around each provisional event, then the
+    stretches around preview frames whose best detection is below
+    REFINE_LOW_CONFIDENCE (missed frames first), until max_fraction of the
+    video's frames is covered. A ride that no longer fits is refined from
+    its start up to the remaining budget. When rides are given, nothing
+    outside them is refined.
+    
+    Returns:
+        Sorted, non-overlapping frame ranges
+    """
+    fps = metadata["fps"]
+    frame_count = metadata["frameCount"]
+    padding = int(round(REFINE_EVENT_PADDING * fps))
+    
+    bounds = rides or [(0, frame_count)]
+    
+    def window(priority: float, frame: int, before: int, after: int) -> List[Tuple[float, int, int]]:
+        # Windows stay inside the ride they start in, so ranges never straddle rides
+        for start, end in bounds:
+            if start <= frame < end:
+                return [(priority, max(start, frame - before), min(end, frame + after))]
+        return []
+    
+    # (priority, start, end); lower priority is refined first
+    candidates = [(-2.0 - 1.0 / (end - start), start, end) for start, end in rides or []]
+    for event in events:
+        frame = int(round(event["timestamp"] * fps))
+        candidates += window(-1.0, frame, padding, padding + 1)
+    for frame_data in frame_detections:
+        best = max((d["confidence"] for d in frame_data["detections"]), default=0.0)
+        if best < REFINE_LOW_CONFIDENCE:
+            candidates += window(best, frame_data["frame"], preview_interval - 1, preview_interval)
+    candidates.sort(key=lambda c: c[0])
+    
+    covered = np.zeros(frame_count, dtype=bool)
+    budget = int(max_fraction * frame_count)
+    for priority, start, end in candidates:
+        start, end = max(0, start), min(frame_count, end)
+        added = end - start - int(covered[start:end].sum())
+        if added <= 0 or budget <= 0:
+            continue
+        if added > budget:
+            if priority >= -2.0:
+                continue
+            # A ride longer than the remaining budget is refined from its
+            # start (take-off and pop-up) rather than skipped outright
+            uncovered = start + np.flatnonzero(~covered[start:end])
+            covered[uncovered[:budget]] = True
+            budget = 0
+            continue
+        covered[start:end] = True
+        budget -= added
+    
+    # Runs of covered frames back to ranges
+    edges = np.flatnonzero(np.diff(np.concatenate([[0], covered.astype(np.int8), [0]])))
+    return [(int(start), int(end)) for start, end in zip(edges[::2], edges[1::2])]
+
+
+def merge_refined_detections(
+    preview_detections: List[Dict],
+    refined_detections: List[Dict],
+    ranges: List[Tuple[int, int]]
+) -> List[Dict]:
+    """Replace preview detections inside the refined ranges with the refined ones."""
+    starts = np.array([start for start, _ in ranges], dtype=np.int64)
+    ends = np.array([end for _, end in ranges], dtype=np.int64)
+    
+    def refined(frame: int) -> bool:
+        i = np.searchsorted(starts, frame, side="right") - 1
+        return i >= 0 and frame < ends[i]
+    
+    kept = [d for d in preview_detections if not refined(d["frame"])]
+    return sorted(kept + refined_detections, key=lambda d: d["frame"])
+
+
+def analyze_detections(
+    frame_detections: List[Dict],
+    metadata: Dict,
+    profiler: Optional[JobProfiler] = None,
+    on_progress: Optional[Callable[[float], None]] = None,
+    all_tracks: bool = True,
+    max_center_distance: Optional[float] = None
+) -> Tuple[Dict, Dict]:
+    """
+    Run the post-detection stages: tracking, features, events, metrics, tips.
+    
+    The primary surfer's results are at the top level. With `all_tracks`,
+    every other track spanning MULTI_TRACK_MIN_DURATION is analysed too:
+    smoothing and features run over all tracks at once as padded arrays,
+    and results['surfers'] lists each track's metrics, events and tips.
+    
+    Args:
+        frame_detections: Output of process_video_detections
+        metadata: Video metadata with 'fps', 'width', 'height'
+        all_tracks: Analyse secondary tracks as well as the primary one
+        max_center_distance: Let detections that overlap no track continue
+            the nearest one within this many box diagonals (for sparsely
+            sampled streams); None matches by IoU only
+    
+    Returns:
+        Tuple of (results, tracks_data)
+    """
+    profiler = profiler or JobProfiler()
+    progress = on_progress or (lambda fraction: None)
+    
+    fps = metadata["fps"]
+    frame_width = metadata["width"]
+    frame_height = metadata["height"]
+    
+    if not frame_detections or not any(d["detections"] for d in frame_detections):
+        raise AnalysisError("Could not detect a surfer in this video. Please ensure the surfer is clearly visible.")
+    
+    # Step 3: Tracking
+    with profiler.stage("tracking"):
+        tracker = SimpleTracker(max_center_distance=max_center_distance)
+        tracks_by_id = defaultdict(list)
+        
+        for frame_data in frame_detections:
+            frame_num = frame_data["frame"]
+            detections = frame_data["detections"]
+            
+            tracked = tracker.update(detections)
+            
+            for track in tracked:
+                tracks_by_id[track["trackId"]].append({
+                    "frame": frame_num,
+                    **track
+                })
+        
+        # Select primary surfer (largest track)
+        primary_track_id = tracker.get_primary_track_id()
+    
+    if primary_track_id is None:
+        raise AnalysisError("Could not identify primary surfer track.")
+    
+    with profiler.stage("smoothing"):
+        track_ids = select_analysis_tracks(tracks_by_id, primary_track_id, fps) if all_tracks else [primary_track_id]
+        
+        # Sort by frame number
+        raw_tracks = [sorted(tracks_by_id[track_id], key=lambda x: x["frame"]) for track_id in track_ids]
+        
+        # Smooth tracks
+        smoothed_tracks = smooth_track_rows(raw_tracks, window_size=5)
+        
+        # Resample onto a uniform timebase so per-sample features see real time
+        # steps; gaps longer than TRACK_INTERPOLATION_MAX_GAP stay unfilled
+        resampled_tracks = [
+            interpolate_tracks(
+                track,
+                step=TRACK_INTERPOLATION_STEP,
+                method=TRACK_INTERPOLATION_METHOD,
+                max_gap=TRACK_INTERPOLATION_MAX_GAP
+            )
+            for track in smoothed_tracks
+        ]
+    
+    progress(0.6)
+    
+    # Step 4: Feature extraction (samples are TRACK_INTERPOLATION_STEP frames apart).
+    # Each run between unfilled gaps is its own row, so no speed, heading or
+    # turn is ever measured across a gap.
+    with profiler.stage("features"):
+        track_runs = [split_at_gaps(track, TRACK_INTERPOLATION_STEP) for track in resampled_tracks]
+        columns, lengths = pad_tracks([run for runs in track_runs for run in runs])
+        features = calculate_features_batch(
+            columns["centroid"],
+            columns["bbox"][:, :, 3],
+            fps / TRACK_INTERPOLATION_STEP,
+            frame_width,
+            frame_height
+        )
+        features["verticalVelocities"] /= TRACK_INTERPOLATION_STEP  # pixels per frame
+        
+        # Smooth signals
+        features["speeds"] = moving_average_rows(features["speeds"], lengths)
+        features["turnRates"] = moving_average_rows(features["turnRates"], lengths)
+    
+    progress(0.7)
+    
+    # Steps 5-7: events, metrics and tips for each track's rows
+    surfers = []
+    first_row = 0
+    for track_id, track, runs in zip(track_ids, resampled_tracks, track_runs):
+        rows = range(first_row, first_row + len(runs))
+        first_row += len(runs)
+        speeds, headings, turn_rates, vertical_velocities = (
+            np.concatenate([features[name][row, :lengths[row]] for row in rows]).tolist()
+            for name in ("speeds", "headings", "turnRates", "verticalVelocities")
+        )
+        
+        with profiler.stage("events"):
+            popup_events = detect_popup(track, vertical_velocities, fps)
+            turn_events = detect_turns(turn_rates, fps, frames=[t["frame"] for t in track])
+            all_events = popup_events + turn_events
+        
+        with profiler.stage("metrics"):
+            metrics = calculate_metrics(track, speeds, turn_rates, all_events, fps)
+        
+        with profiler.stage("coaching"):
+            # Filled-in samples carry no detection evidence of their own
+            observed_tracks = [t for t in track if not t["interpolated"]]
+            overall_confidence = calculate_confidence(observed_tracks, speeds, headings)
+            tips = generate_tips(metrics, all_events, overall_confidence)
+        
+        surfers.append({
+            "trackId": track_id,
+            "primary": track_id == primary_track_id,
+            "start": track[0]["frame"] / fps,
+            "end": (track[-1]["frame"] + 1) / fps,
+            "startFrame": track[0]["frame"],
+            "endFrame": track[-1]["frame"] + 1,
+            "metrics": metrics,
+            "events": all_events,
+            "tips": tips,
+            # Kept so stored tips can be re-scored when the rules change
+            "confidence": overall_confidence
+        })
+    
+    progress(0.9)
+    
+    primary = surfers[0]
+    results = {
+        "metrics": primary["metrics"],
+        "events": primary["events"],
+        "tips": primary["tips"],
+        "confidence": primary["confidence"]
+    }
+    if all_tracks:
+        results["primaryTrackId"] = primary_track_id
+        results["surfers"] = surfers
+    
+    # Frame order, primary first within a frame, so the first sample found
+    # for a frame is the primary surfer's. Only observed (smoothed) samples
+    # are stored; the resampled grid is for feature extraction.
+    tracks_data = {
+        "frames": sorted(
+            (
+                {
+                    "frame": t["frame"],
+                    "bbox": t["bbox"],
+                    "centroid": t["centroid"],
+                    "trackId": t["trackId"],
+                    "interpolated": False
+                }
+                for track in smoothed_tracks
+                for t in track
+            ),
+            key=lambda t: (t["frame"], t["trackId"] != primary_track_id)
+        )
+    }
+    
+    return results, tracks_data
+
+
+def select_analysis_tracks(tracks_by_id: Dict[int, List[Dict]], primary_track_id: int, fps: float) -> List[int]:
+    """
+    Pick the tracks to analyse: the primary first, then the longest others.
+    
+    Tracks whose detections span less than MULTI_TRACK_MIN_DURATION are
+    fragments or people passing through and are left out.
+    
+    Returns:
+        Track IDs, at most MULTI_TRACK_MAX_TRACKS of them
+    """
+    spans = {
+        track_id: max(t["frame"] for t in samples) - min(t["frame"] for t in samples)
+        for track_id, samples in tracks_by_id.items()
+    }
+    others = sorted(
+        (track_id for track_id, span in spans.items()
+         if track_id != primary_track_id and span >= MULTI_TRACK_MIN_DURATION * fps),
+        key=lambda track_id: (-spans[track_id], track_id)
+    )
+    return [primary_track_id] + others[:MULTI_TRACK_MAX_TRACKS - 1]
+
+
+def smooth_track_rows(tracks: List[List[Dict]], window_size: int = 5) -> List[List[Dict]]:
+    """
+    `smooth_tracks` for several tracks at once, as one padded array operation.
+    
+    Returns:
+        Smoothed copies of the tracks; tracks shorter than the window are
+        returned unchanged
+    """
+    columns, lengths = pad_tracks(tracks)
+    bboxes = moving_average_rows(columns["bbox"], lengths, window_size)
+    centroids = moving_average_rows(columns["centroid"], lengths, window_size)
+    
+    smoothed = []
+    for row, track in enumerate(tracks):
+        if len(track) < window_size:
+            smoothed.append(track)
+            continue
+        smoothed.append([
+            {**sample, "bbox": bboxes[row, i].tolist(), "centroid": centroids[row, i].tolist()}
+            for i, sample in enumerate(track)
+        ])
+    return smoothed
+
+
+def save_results(output_dir: Path, results: Dict, tracks_data: Dict) -> None:
+    """
+    Write results.json, tracks.json and tracks.bin.
+    
+    Each file is replaced atomically, since the refine pass overwrites
+    provisional results that clients may be reading.
+    """
+    write_atomic(output_dir / "results.json", dumps(results, indent=True))
+    write_atomic(output_dir / "tracks.json", dumps(tracks_data))
+    
+    # Columnar binary copy for the canvas overlay
+    write_atomic(output_dir / "tracks.bin", encode_tracks_binary(tracks_data["frames"]))
@@ -0,0 +1,116 @@
+import json
+import struct
+import subprocess
+from pathlib import Path
+from typing import Dict, Any
+
+from app.services.video_processor import extract_video_metadata
+from app.config import MAX_VIDEO_DURATION, PROBE_TIMEOUT
+
+# Enough for the first box header and the ftyp brand
+HEADER_PROBE_BYTES = 64
+
+# Top-level boxes an MP4 (ISO base media) or QuickTime file can start with
+CONTAINER_BOX_TYPES = {b"ftyp", b"moov", b"mdat", b"free", b"skip", b"wide", b"pnot"}
+# ISO base media brands used for still images rather than video
+IMAGE_BRANDS = {"heic", "heix", "mif1", "msf1", "avif", "avis"}
+
+
+class ProbeError(ValueError):
+    """Raised when an upload isn't a usable video. The message is shown to the user."""
+
+
+def sniff_container(head: bytes) -> str:
+    """
+    Check the first bytes of a file for an MP4/MOV container header.
+
+    Returns:
+        The ftyp major brand (e.g. 'isom', 'qt  '), or the first box type for
+        QuickTime files without an ftyp box
+    """
+    if len(head) < 8:
+        raise ProbeError("File is too small to be a video.")
+
+    size, box_type = struct.unpack(">I4s", head[:8])
+    # size 0 means "to end of file" and 1 means a 64-bit size follows
+    if box_type not in CONTAINER_BOX_TYPES or (size > 1 and size < 8):
+        raise ProbeError("File is not an MP4 or MOV video.")
+
+    if box_type != b"ftyp":
+        return box_type.decode("latin-1")
+
+    brand = head[8:12].decode("latin-1")
+    if brand.strip() in IMAGE_BRANDS:
+        raise ProbeError("File is an image, not a video.")
+    return brand
+
+
+def _ffprobe(video_path: Path) -> Dict[str, Any]:
+    """Read stream and duration metadata with ffprobe."""
+    cmd = [
+        "ffprobe",
+        "-v", "error",
+        "-select_streams", "v:0",
+        "-show_entries", "stream=width,height,avg_frame_rate,nb_frames:format=duration",
+        "-of", "json",
+        str(video_path)
+    ]
+    try:
+        result = subprocess.run(cmd, capture_output=True, text=True, check=True, timeout=PROBE_TIMEOUT)
+    except subprocess.CalledProcessError:
+        raise ProbeError("Could not read the video. The file may be corrupt.")
+    except subprocess.TimeoutExpired:
+        raise ProbeError("Timed out reading the video. The file may be corrupt.")
+
+    info = json.loads(result.stdout or "{}")
+    streams = info.get("streams") or []
+    if not streams:
+        raise ProbeError("File contains no video stream.")
+    stream = streams[0]
+
+    numerator, _, denominator = stream.get("avg_frame_rate", "0/1").partition("/")
+    fps = float(numerator) / float(denominator) if denominator and float(denominator) else 0.0
+    duration = float(info.get("format", {}).get("duration") or 0.0)
+    frame_count = int(stream.get("nb_frames") or round(duration * fps))
+
+    return {
+        "fps": fps,
+        "width": int(stream.get("width") or 0),
+        "height": int(stream.get("height") or 0),
+        "frameCount": frame_count,
+        "duration": duration
+    }
+
+
+def probe_video(video_path: Path, max_duration: float = MAX_VIDEO_DURATION) -> Dict[str, Any]:
+    """
+    Validate a video before a job is queued for it.
+
+    Checks the container header, then reads stream metadata with ffprobe
+    (falling back to OpenCV when ffprobe isn't installed) and rejects files
+    without a decodable video stream or longer than max_duration seconds.
+
+    Returns:
+        Metadata with 'fps', 'width', 'height', 'frameCount', 'duration'
+    """
+    with open(video_path, "rb") as f:
+        sniff_container(f.read(HEADER_PROBE_BYTES))
+
+    try:
+        metadata = _ffprobe(video_path)
+    except FileNotFoundError:
+        try:
+            metadata = extract_video_metadata(video_path)
+        except ValueError:
+            raise ProbeError("Could not read the video. The file may be corrupt.")
+
+    if metadata["width"] <= 0 or metadata["height"] <= 0 or metadata["fps"] <= 0:
+        raise ProbeError("Could not read the video. The file may be corrupt.")
+    if metadata["duration"] <= 0:
+        raise ProbeError("Video is empty.")
+    if metadata["duration"] > max_duration:
+        raise ProbeError(
+            f"Video is longer than {max_duration / 60:g} minutes. Please trim it to the waves you want analysed."
+        )
+
+    return metadata
@@ -0,0 +1,236 @@
+import sys
+import threading
+import time
+from collections import defaultdict
+from contextlib import contextmanager
+from pathlib import Path
+from typing import Dict, Any, List, Optional, Set, Tuple
+
+from app.services.json_codec import write_json
+
+try:
+    import resource
+except ImportError:  # Not available on Windows
+    resource = None
+
+
+def peak_rss_bytes() -> Optional[int]:
+    """Peak resident set size of this process, in bytes."""
+    if resource is None:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # ru_maxrss is reported in bytes on macOS and kilobytes on Linux
+    return peak if sys.platform == "darwin" else peak * 1024
+
+
+class JobProfiler:
+    """
+    Lightweight per-job instrumentation.
+
+    Stages accumulate wall and CPU time across calls, so a stage entered once
+    per frame (decode, inference) reports its total. A stage's CPU time is
+    that of the thread running it; the job's total CPU time is process-wide,
+    so it includes other jobs running concurrently in the same process.
+
+    Stages nest (detection inside preview, decode inside detection). Stages
+    that enclosed another are listed as parent stages; the others (leaves)
+    never overlap within a thread, so their times can be summed.
+    """
+
+    def __init__(self):
+        self.stages: Dict[str, Dict[str, float]] = {}
+        self.counters: Dict[str, int] = defaultdict(int)
+        self.parent_stages: Set[str] = set()
+        self._wall_start = time.perf_counter()
+        self._cpu_start = time.process_time()
+        self._local = threading.local()
+        # Stage of the parent profiler that a child() profiler's stages run inside
+        self._enclosing: Optional[str] = None
+
+    def _stack(self) -> List[str]:
+        stack = getattr(self._local, "stack", None)
+        if stack is None:
+            stack = self._local.stack = []
+        return stack
+
+    @contextmanager
+    def stage(self, name: str):
+        """Time a block of work under the given stage name."""
+        stack = self._stack()
+        if stack:
+            self.parent_stages.add(stack[-1])
+        stack.append(name)
+        wall_start = time.perf_counter()
+        cpu_start = time.thread_time()
+        try:
+            yield
+        finally:
+            stack.pop()
+            stage = self.stages.setdefault(name, {"wallSeconds": 0.0, "cpuSeconds": 0.0, "calls": 0})
+            stage["wallSeconds"] += time.perf_counter() - wall_start
+            stage["cpuSeconds"] += time.thread_time() - cpu_start
+            stage["calls"] += 1
+
+    def child(self) -> "JobProfiler":
+        """
+        A profiler for work handed to another thread from the current stage.
+
+        Pass it back to `merge` when the work is done; its stages then count
+        as nested in the stage that was current here.
+        """
+        child = JobProfiler()
+        stack = self._stack()
+        child._enclosing = stack[-1] if stack else None
+        return child
+
+    def add(self, name: str, wall_seconds: float, cpu_seconds: float = 0.0, calls: int = 1) -> None:
+        """Record work timed elsewhere (e.g. in an inference worker process) under a stage."""
+        stage = self.stages.setdefault(name, {"wallSeconds": 0.0, "cpuSeconds": 0.0, "calls": 0})
+        stage["wallSeconds"] += wall_seconds
+        stage["cpuSeconds"] += cpu_seconds
+        stage["calls"] += calls
+
+    def count(self, name: str, amount: int = 1) -> None:
+        """Increment a counter (frames decoded, inference calls, ...)."""
+        self.counters[name] += amount
+
+    def merge(self, other: "JobProfiler") -> None:
+        """Fold in the stages and counters of a profiler used by a worker thread."""
+        if other._enclosing is not None and other.stages:
+            self.parent_stages.add(other._enclosing)
+        self.parent_stages |= other.parent_stages
+        for name, timing in other.stages.items():
+            stage = self.stages.setdefault(name, {"wallSeconds": 0.0, "cpuSeconds": 0.0, "calls": 0})
+            for key in stage:
+                stage[key] += timing[key]
+        for name, amount in other.counters.items():
+            self.counters[name] += amount
+
+    def _rate(self, counter: str, stage: str) -> Optional[float]:
+        wall = self.stages.get(stage, {}).get("wallSeconds", 0.0)
+        if wall <= 0 or counter not in self.counters:
+            return None
+        return self.counters[counter] / wall
+
+    def report(self) -> Dict[str, Any]:
+        """Summarize timings, counters and throughput."""
+        total_wall = time.perf_counter() - self._wall_start
+        return {
+            "stages": self.stages,
+            "parentStages": sorted(self.parent_stages),
+            "counters": dict(self.counters),
+            "rates": {
+                "decodeFps": self._rate("framesDecoded", "decode"),
+                "inferenceFps": self._rate("inferenceCalls", "inference"),
+                "pipelineFps": self.counters["framesDecoded"] / total_wall if total_wall > 0 else None
+            },
+            "totalWallSeconds": total_wall,
+            "totalCpuSeconds": time.process_time() - self._cpu_start,
+            "peakRssBytes": peak_rss_bytes()
+        }
+
+    def save(self, job_dir: Path) -> Dict[str, Any]:
+        """Write profile.json to the job directory."""
+        report = self.report()
+        write_json(job_dir / "profile.json", report, indent=True)
+        return report
+
+
+@contextmanager
+def code_profiler(mode: Optional[str], job_dir: Path):
+    """
+    Optionally run a code-level profiler around a block and dump its output.
+
+    mode is None (off), "cprofile" (writes profile.pstats) or "pyinstrument"
+    (writes profile.html; requires the pyinstrument package).
+    """
+    if mode is None:
+        yield
+        return
+
+    if mode == "cprofile":
+        import cProfile
+        profiler = cProfile.Profile()
+        profiler.enable()
+        try:
+            yield
+        finally:
+            profiler.disable()
+            profiler.dump_stats(str(job_dir / "profile.pstats"))
+    elif mode == "pyinstrument":
+        from pyinstrument import Profiler
+        profiler = Profiler()
+        profiler.start()
+        try:
+            yield
+        finally:
+            profiler.stop()
+            (job_dir / "profile.html").write_text(profiler.output_html())
+    else:
+        raise ValueError(f"Unknown profiler: {mode}")
+
+
+class MetricsRegistry:
+    """In-process counters and gauges rendered in Prometheus text format."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._values: Dict[Tuple[str, Tuple[Tuple[str, str], ...]], float] = defaultdict(float)
+        self._meta: Dict[str, Tuple[str, str]] = {}
+
+    def _key(self, name: str, labels: Optional[Dict[str, str]]):
+        return name, tuple(sorted((labels or {}).items()))
+
+    def describe(self, name: str, metric_type: str, help_text: str) -> None:
+        self._meta[name] = (metric_type, help_text)
+
+    def inc(self, name: str, amount: float = 1.0, labels: Optional[Dict[str, str]] = None) -> None:
+        with self._lock:
+            self._values[self._key(name, labels)] += amount
+
+    def set(self, name: str, value: float, labels: Optional[Dict[str, str]] = None) -> None:
+        with self._lock:
+            self._values[self._key(name, labels)] = value
+
+    def render(self) -> str:
+        """Render all metrics in the Prometheus text exposition format."""
+        with self._lock:
+            values = sorted(self._values.items())
+
+        lines = []
+        described = set()
+        for (name, labels), value in values:
+            if name not in described and name in self._meta:
+                metric_type, help_text = self._meta[name]
+                lines.append(f"# HELP {name} {help_text}")
+                lines.append(f"# TYPE {name} {metric_type}")
+                described.add(name)
+            label_str = ",".join(f'{k}="{v}"' for k, v in labels)
+            lines.append(f"{name}{{{label_str}}} {value}" if label_str else f"{name} {value}")
+        return "\n".join(lines) + "\n"
+
+
+METRICS = MetricsRegistry()
+METRICS.describe("surfcoach_jobs_total", "counter", "Jobs finished, by status.")
+METRICS.describe("surfcoach_stage_seconds_total", "counter", "Wall time spent per innermost pipeline stage.")
+METRICS.describe("surfcoach_stage_cpu_seconds_total", "counter", "Thread CPU time spent per innermost pipeline stage.")
+METRICS.describe("surfcoach_frames_decoded_total", "counter", "Video frames decoded.")
+METRICS.describe("surfcoach_inference_calls_total", "counter", "Detector inference calls.")
+METRICS.describe("surfcoach_peak_rss_bytes", "gauge", "Peak resident set size of the API process.")
+
+
+def record_job_metrics(report: Dict[str, Any], status: str) -> None:
+    """Fold a finished job's profile into the process-wide metrics."""
+    METRICS.inc("surfcoach_jobs_total", labels={"status": status})
+    # Only leaf stages: a parent's time is already in its children's, so
+    # summing over the stage label would count it twice
+    parents = set(report.get("parentStages", []))
+    for stage, timing in report["stages"].items():
+        if stage in parents:
+            continue
+        METRICS.inc("surfcoach_stage_seconds_total", timing["wallSeconds"], labels={"stage": stage})
+        METRICS.inc("surfcoach_stage_cpu_seconds_total", timing["cpuSeconds"], labels={"stage": stage})
+    METRICS.inc("surfcoach_frames_decoded_total", report["counters"].get("framesDecoded", 0))
+    METRICS.inc("surfcoach_inference_calls_total", report["counters"].get("inferenceCalls", 0))
+    if report["peakRssBytes"] is not None:
+        METRICS.set("surfcoach_peak_rss_bytes", report["peakRssBytes"])
@@ -0,0 +1,134 @@
+from collections import defaultdict
+from typing import Dict, List, Tuple, Optional
+
+import cv2
+import numpy as np
+
+from app.services.tracking import SimpleTracker
+from app.config import (
+    RIDE_MIN_SPEED,
+    RIDE_MIN_DURATION,
+    RIDE_MERGE_GAP,
+    RIDE_PADDING_BEFORE,
+    RIDE_PADDING_AFTER,
+    RIDE_TRACK_MAX_DISTANCE
+)
+
+# Frames are downscaled to this width (grayscale) before phase correlation
+MOTION_ESTIMATION_WIDTH = 160
+# Weaker correlation peaks (scene cuts, featureless water) are treated as no motion
+MOTION_MIN_RESPONSE = 0.05
+
+
+class CameraMotionEstimator:
+    """
+    Estimate camera motion between sampled frames by phase correlation.
+
+    A frame consumer for `process_video_detections`. Every `interval`th
+    frame is shrunk to a small grayscale image and correlated with the
+    previous one, which costs far less than a detector call.
+    """
+
+    def __init__(self, interval: int):
+        self.interval = interval
+        # frame -> (dx, dy) background displacement since the previous sample, in
+        # frame pixels; samples without a reliable estimate are left out
+        self.shifts: Dict[int, Tuple[float, float]] = {}
+        self._previous: Optional[np.ndarray] = None
+        self._window: Optional[np.ndarray] = None
+
+    def wants(self, frame_number: int) -> bool:
+        return frame_number % self.interval == 0
+
+    def __call__(self, frame_number: int, frame: np.ndarray) -> None:
+        if not self.wants(frame_number):
+            return
+
+        height, width = frame.shape[:2]
+        scale = min(1.0, MOTION_ESTIMATION_WIDTH / width)
+        size = (max(1, int(round(width * scale))), max(1, int(round(height * scale))))
+        gray = cv2.cvtColor(frame, cv2.COLOR_BGR2GRAY)
+        small = cv2.resize(gray, size, interpolation=cv2.INTER_AREA).astype(np.float32)
+
+        if self._window is None:
+            self._window = cv2.createHanningWindow(size, cv2.CV_32F)
+        if self._previous is not None:
+            (dx, dy), response = cv2.phaseCorrelate(self._previous, small, self._window)
+            if response >= MOTION_MIN_RESPONSE:
+                self.shifts[frame_number] = (dx / scale, dy / scale)
+        self._previous = small
+
+
+def segment_rides(
+    frame_detections: List[Dict],
+    camera_shifts: Dict[int, Tuple[float, float]],
+    metadata: Dict
+) -> List[Tuple[int, int]]:
+    """
+    Split a clip into candidate rides from sparse (preview) detections.
+
+    Marks the stretches where any tracked person moves faster than
+    RIDE_MIN_SPEED box diagonals per second relative to the scene. Camera
+    motion is subtracted, so a rider the camera pans with still counts, while
+    paddling and sitting in the line-up stay below the threshold. Stretches
+    closer than RIDE_MERGE_GAP are joined, ones shorter than
+    RIDE_MIN_DURATION dropped, and the rest padded to take in the take-off.
+
+    Args:
+        frame_detections: Output of process_video_detections
+        camera_shifts: CameraMotionEstimator.shifts for the same frames
+        metadata: Video metadata with 'fps' and 'frameCount'
+
+    Returns:
+        Sorted, non-overlapping [start, end) frame ranges
+    """
+    fps = metadata["fps"]
+    frame_count = metadata["frameCount"]
+
+    # Preview samples are far apart, so riders need a wider gate to stay on one track
+    tracker = SimpleTracker(max_center_distance=RIDE_TRACK_MAX_DISTANCE)
+    samples = defaultdict(list)  # trackId -> [(frame, cx, cy, diagonal)]
+    for frame_data in frame_detections:
+        for det in tracker.update(frame_data["detections"]):
+            x1, y1, x2, y2 = det["bbox"]
+            samples[det["trackId"]].append((frame_data["frame"], *det["centroid"], np.hypot(x2 - x1, y2 - y1)))
+
+    # Background displacement accumulated up to each sampled frame
+    shift_frames = np.array(sorted(camera_shifts), dtype=np.int64)
+    camera = np.zeros((len(shift_frames) + 1, 2))
+    camera[1:] = np.cumsum(np.array([camera_shifts[f] for f in shift_frames]).reshape(-1, 2), axis=0)
+
+    riding = np.zeros(frame_count, dtype=bool)
+    for track in samples.values():
+        if len(track) < 2:
+            continue
+        data = np.array(track, dtype=np.float64)
+        frames = data[:, 0].astype(np.int64)
+        camera_position = camera[np.searchsorted(shift_frames, frames, side="right")]
+        motion = np.diff(data[:, 1:3], axis=0) - np.diff(camera_position, axis=0)
+        seconds = np.diff(frames) / fps
+        diagonals = np.maximum((data[1:, 3] + data[:-1, 3]) / 2, 1e-6)
+        speeds = np.hypot(motion[:, 0], motion[:, 1]) / diagonals / np.maximum(seconds, 1e-6)
+        fast = speeds >= RIDE_MIN_SPEED
+        for start, end in zip(frames[:-1][fast], frames[1:][fast]):
+            riding[start:end + 1] = True
+
+    rides = []
+    edges = np.flatnonzero(np.diff(np.concatenate([[0], riding.astype(np.int8), [0]])))
+    for start, end in zip(edges[::2], edges[1::2]):
+        if rides and start - rides[-1][1] < RIDE_MERGE_GAP * fps:
+            rides[-1] = (rides[-1][0], int(end))
+        else:
+            rides.append((int(start), int(end)))
+
+    padded = []
+    for start, end in rides:
+        if end - start < RIDE_MIN_DURATION * fps:
+            continue
+        start = max(0, start - int(round(RIDE_PADDING_BEFORE * fps)))
+        end = min(frame_count, end + int(round(RIDE_PADDING_AFTER * fps)))
+        if padded and start <= padded[-1][1]:
+            padded[-1] = (padded[-1][0], end)
+        else:
+            padded.append((start, end))
+    return padded
@@ -0,0 +1,387 @@
+import asyncio
+import hashlib
+import json
+import logging
+import os
+import shutil
+import stat
+import time
+import uuid
+from pathlib import Path
+from typing import BinaryIO, Dict, List, Any, Optional, Set, Tuple
+
+from app.services.json_codec import read_json, write_json
+from app.services.profiling import METRICS
+from app.config import (
+    JOBS_DIR,
+    BLOBS_DIR,
+    UPLOADS_DIR,
+    UPLOAD_TTL_HOURS,
+    STORAGE_TTL_DAYS,
+    STORAGE_QUOTA_GB,
+    STORAGE_SWEEP_INTERVAL
+)
+
+logger = logging.getLogger(__name__)
+
+# Kept when a job is evicted, so its results stay viewable without the video
+# and later uploads of the same footage can still borrow its detections
+RETAINED_FILES = {"meta.json", "results.json", "profile.json", "detections.json", "fingerprints.npz"}
+# Jobs still being worked on are never evicted
+ACTIVE_STATUSES = {"pending", "processing"}
+
+ACCESS_MARKER = ".accessed"
+ACCESS_TOUCH_INTERVAL = 60  # seconds; limits marker writes to one per minute per job
+TMP_MAX_AGE = 24 * 3600  # seconds before an abandoned upload temp file is removed
+BLOB_GRACE_PERIOD = 3600  # seconds; a blob linked or created this recently is never collected
+
+_HASH_CHUNK_SIZE = 1024 * 1024
+
+METRICS.describe("surfcoach_storage_bytes", "gauge", "Bytes used by job inputs and artifacts after the last sweep.")
+METRICS.describe("surfcoach_storage_bytes_reclaimed_total", "counter", "Bytes freed by the storage sweeper, by kind.")
+METRICS.describe("surfcoach_storage_jobs_evicted_total", "counter", "Jobs whose video and derived artifacts were evicted, by reason.")
+METRICS.describe("surfcoach_storage_dedup_hits_total", "counter", "Uploads whose content was already stored.")
+METRICS.describe("surfcoach_storage_dedup_bytes_saved_total", "counter", "Bytes not stored again thanks to deduplication.")
+METRICS.describe("surfcoach_storage_sweeps_total", "counter", "Storage sweeps run.")
+
+
+def blob_path(digest: str) -> Path:
+    """Location of a content-addressed input in the blob store."""
+    return BLOBS_DIR / digest[:2] / f"{digest}.mp4"
+
+
+def _link_into_job(blob: Path, target: Path) -> None:
+    """
+    Hardlink a blob into a job, copying when the filesystem can't link.
+
+    Raises FileNotFoundError if the blob doesn't exist (or was just swept).
+    """
+    target.parent.mkdir(parents=True, exist_ok=True)
+    if target.exists():
+        target.unlink()
+    try:
+        os.link(blob, target)
+    except FileNotFoundError:
+        raise
+    except OSError:
+        # Different filesystem or no hardlink support: dedup is lost for this job only
+        shutil.copyfile(blob, target)
+
+
+def _link_existing(digest: str, size: int, target: Path) -> bool:
+    """Link already-stored content into a job. Returns False if it isn't stored."""
+    try:
+        _link_into_job(blob_path(digest), target)
+    except FileNotFoundError:
+        return False
+    METRICS.inc("surfcoach_storage_dedup_hits_total")
+    METRICS.inc("surfcoach_storage_dedup_bytes_saved_total", size)
+    return True
+
+
+def _commit_blob(tmp_path: Path, digest: str, target: Path) -> None:
+    """Move a fully written temp file into the store and link it into a job."""
+    blob = blob_path(digest)
+    blob.parent.mkdir(parents=True, exist_ok=True)
+    # Jobs share the inode, so a blob must never be modified in place
+    os.chmod(tmp_path, stat.S_IRUSR | stat.S_IRGRP | stat.S_IROTH)
+    os.replace(tmp_path, blob)
+    _link_into_job(blob, target)
+
+
+def _tmp_path() -> Path:
+    tmp_dir = BLOBS_DIR / "tmp"
+    tmp_dir.mkdir(parents=True, exist_ok=True)
+    return tmp_dir / uuid.uuid4().hex
+
+
+def store_input_stream(source: BinaryIO, target: Path) -> str:
+    """
+    Store an uploaded video content-addressed and link it to target.
+
+    The stream is hashed as it is copied into the blob store's temp
+    directory, so it is read once and never held in memory. Identical
+    uploads share one copy on disk.
+
+    Returns:
+        SHA-256 hex digest of the content
+    """
+    sha = hashlib.sha256()
+    size = 0
+    tmp_path = _tmp_path()
+    try:
+        with open(tmp_path, "wb") as f:
+            for chunk in iter(lambda: source.read(_HASH_CHUNK_SIZE), b""):
+                sha.update(chunk)
+                f.write(chunk)
+                size += len(chunk)
+        digest = sha.hexdigest()
+
+        if _link_existing(digest, size, target):
+            tmp_path.unlink()
+        else:
+            _commit_blob(tmp_path, digest, target)
+    except BaseException:
+        tmp_path.unlink(missing_ok=True)
+        raise
+    return digest
+
+
+def ingest_input_file(source: Path, target: Path) -> str:
+    """
+    Move a video file on disk into the blob store and link it to target.
+
+    source is consumed (moved or deleted). It should be on the same
+    filesystem as the data directory so the move is a rename.
+
+    Returns:
+        SHA-256 hex digest of the content
+    """
+    sha = hashlib.sha256()
+    size = 0
+    with open(source, "rb") as f:
+        for chunk in iter(lambda: f.read(_HASH_CHUNK_SIZE), b""):
+            sha.update(chunk)
+            size += len(chunk)
+    digest = sha.hexdigest()
+
+    if _link_existing(digest, size, target):
+        Path(source).unlink()
+    else:
+        _commit_blob(Path(source), digest, target)
+    return digest
+
+
+def touch_job(job_dir: Path) -> None:
+    """Record that a job was viewed, for least-recently-used eviction."""
+    marker = job_dir / ACCESS_MARKER
+    try:
+        if time.time() - marker.stat().st_mtime < ACCESS_TOUCH_INTERVAL:
+            return
+    except FileNotFoundError:
+        pass
+    try:
+        marker.touch()
+    except OSError:
+        pass  # Access tracking is best-effort
+
+
+def _last_access(job_dir: Path) -> float:
+    """Last view of the job, falling back to its last status update."""
+    for name in (ACCESS_MARKER, "meta.json"):
+        try:
+            return (job_dir / name).stat().st_mtime
+        except FileNotFoundError:
+            continue
+    return job_dir.stat().st_mtime
+
+
+def _load_meta(job_dir: Path) -> Dict[str, Any]:
+    try:
+        return read_json(job_dir / "meta.json")
+    except (FileNotFoundError, json.JSONDecodeError):
+        return {}
+
+
+def _evictable_paths(job_dir: Path) -> List[Path]:
+    return [p for p in job_dir.iterdir() if p.name not in RETAINED_FILES and p.name != ACCESS_MARKER]
+
+
+def _walk_files(path: Path):
+    if path.is_dir() and not path.is_symlink():
+        for root, _, files in os.walk(path):
+            for name in files:
+                yield Path(root) / name
+    elif path.exists():
+        yield path
+
+
+def _unlink_counting(path: Path) -> int:
+    """Delete a file; returns the bytes freed (zero while other links remain)."""
+    try:
+        st = path.lstat()
+        path.unlink()
+    except FileNotFoundError:
+        return 0
+    return st.st_size if st.st_nlink == 1 else 0
+
+
+def _job_freeable_bytes(job_dir: Path) -> int:
+    """Bytes evicting this job would free, counting its input if no other job shares it."""
+    total = 0
+    for path in _evictable_paths(job_dir):
+        for file_path in _walk_files(path):
+            st = file_path.lstat()
+            if st.st_nlink == 1:
+                total += st.st_size
+            elif file_path.name == "input.mp4" and st.st_nlink == 2:
+                # Only this job and the blob store hold it
+                total += st.st_size
+    return total
+
+
+def evict_job(job_dir: Path, reason: str) -> Dict[str, int]:
+    """
+    Remove a job's video and derived artifacts, keeping results and metadata.
+
+    Returns:
+        Bytes reclaimed by kind ('input', 'artifacts')
+    """
+    meta = _load_meta(job_dir)
+    reclaimed = {"input": 0, "artifacts": 0}
+
+    for path in _evictable_paths(job_dir):
+        if path.name == "input.mp4":
+            reclaimed["input"] += _unlink_counting(path)
+            digest = meta.get("inputSha256")
+            blob = blob_path(digest) if digest else None
+            if blob is not None and blob.exists() and blob.stat().st_nlink == 1:
+                reclaimed["input"] += _unlink_counting(blob)
+        elif path.is_dir() and not path.is_symlink():
+            reclaimed["artifacts"] += sum(_unlink_counting(p) for p in list(_walk_files(path)))
+            shutil.rmtree(path, ignore_errors=True)
+        else:
+            reclaimed["artifacts"] += _unlink_counting(path)
+
+    meta.update({"evicted": True, "evictedAt": time.time(), "evictionReason": reason})
+    write_json(job_dir / "meta.json", meta, indent=True)
+
+    METRICS.inc("surfcoach_storage_jobs_evicted_total", labels={"reason": reason})
+    for kind, amount in reclaimed.items():
+        METRICS.inc("surfcoach_storage_bytes_reclaimed_total", amount, labels={"kind": kind})
+    return reclaimed
+
+
+def _collect_orphan_blobs() -> int:
+    """Delete blobs no job links to any more, and stale upload temp files."""
+    if not BLOBS_DIR.exists():
+        return 0
+
+    freed = 0
+    now = time.time()
+    for path in BLOBS_DIR.glob("*/*"):
+        try:
+            st = path.stat()
+        except FileNotFoundError:
+            continue
+        if path.parent.name == "tmp":
+            if now - st.st_mtime > TMP_MAX_AGE:
+                freed += _unlink_counting(path)
+        elif st.st_nlink == 1 and now - st.st_ctime > BLOB_GRACE_PERIOD:
+            # ctime changes on every link/unlink, so this skips blobs mid-upload
+            freed += _unlink_counting(path)
+
+    METRICS.inc("surfcoach_storage_bytes_reclaimed_total", freed, labels={"kind": "input"})
+    return freed
+
+
+def _collect_stale_uploads(now: float) -> int:
+    """Delete resumable uploads that haven't received a chunk within UPLOAD_TTL_HOURS."""
+    if not UPLOADS_DIR.exists():
+        return 0
+
+    freed = 0
+    for directory in UPLOADS_DIR.iterdir():
+        data_path = directory / "data"
+        try:
+            last_write = (data_path if data_path.exists() else directory).stat().st_mtime
+        except FileNotFoundError:
+            continue
+        if now - last_write > UPLOAD_TTL_HOURS * 3600:
+            freed += sum(_unlink_counting(p) for p in list(_walk_files(directory)))
+            shutil.rmtree(directory, ignore_errors=True)
+
+    METRICS.inc("surfcoach_storage_bytes_reclaimed_total", freed, labels={"kind": "uploads"})
+    return freed
+
+
+def disk_usage() -> int:
+    """Bytes used by blobs, job directories and pending uploads, counting shared inodes once."""
+    seen: Set[Tuple[int, int]] = set()
+    total = 0
+    for root in (BLOBS_DIR, JOBS_DIR, UPLOADS_DIR):
+        for path in _walk_files(root):
+            try:
+                st = path.lstat()
+            except FileNotFoundError:
+                continue
+            if (st.st_dev, st.st_ino) not in seen:
+                seen.add((st.st_dev, st.st_ino))
+                total += st.st_size
+    return total
+
+
+def sweep(
+    now: Optional[float] = None,
+    ttl_days: Optional[float] = STORAGE_TTL_DAYS,
+    quota_gb: Optional[float] = STORAGE_QUOTA_GB
+) -> Dict[str, Any]:
+    """
+    Enforce the retention policy once.
+
+    Jobs unused for longer than the TTL are evicted first; then, while usage
+    is over the quota, the least recently used remaining jobs are evicted.
+    Blobs no longer linked from any job and abandoned uploads are deleted.
+
+    Returns:
+        Summary with jobs evicted and bytes reclaimed
+    """
+    now = time.time() if now is None else now
+    evicted = {"ttl": 0, "quota": 0}
+    reclaimed = {"input": 0, "artifacts": 0, "uploads": _collect_stale_uploads(now)}
+
+    def evict(job_dir: Path, reason: str) -> None:
+        freed = evict_job(job_dir, reason)
+        evicted[reason] += 1
+        for kind, amount in freed.items():
+            reclaimed[kind] += amount
+
+    candidates = []
+    if JOBS_DIR.exists():
+        for job_dir in JOBS_DIR.iterdir():
+            if not job_dir.is_dir():
+                continue
+            meta = _load_meta(job_dir)
+            if meta.get("status") in ACTIVE_STATUSES or meta.get("evicted"):
+                continue
+            candidates.append((_last_access(job_dir), job_dir))
+    candidates.sort()  # least recently used first
+
+    if ttl_days is not None:
+        cutoff = now - ttl_days * 86400
+        while candidates and candidates[0][0] < cutoff:
+            evict(candidates.pop(0)[1], "ttl")
+
+    reclaimed["input"] += _collect_orphan_blobs()
+    usage = disk_usage()
+
+    if quota_gb is not None:
+        quota = quota_gb * 1024 ** 3
+        while usage > quota and candidates:
+            job_dir = candidates.pop(0)[1]
+            expected = _job_freeable_bytes(job_dir)
+            evict(job_dir, "quota")
+            usage -= expected
+
+    reclaimed["input"] += _collect_orphan_blobs()
+    usage = disk_usage()
+
+    METRICS.inc("surfcoach_storage_sweeps_total")
+    METRICS.set("surfcoach_storage_bytes", usage)
+    return {
+        "evicted": evicted,
+        "bytesReclaimed": reclaimed,
+        "bytesUsed": usage
+    }
+
+
+async def run_sweeper(interval: float = STORAGE_SWEEP_INTERVAL) -> None:
+    """Run sweep() periodically off the event loop until cancelled."""
+    while True:
+        try:
+            summary = await asyncio.to_thread(sweep)
+            if any(summary["evicted"].values()):
+                logger.info("storage sweep: %s", summary)
+        except Exception:
+            logger.exception("storage sweep failed")
+        await asyncio.sleep(interval)
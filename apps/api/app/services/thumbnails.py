@@ -0,0 +1,95 @@
+import cv2
+import math
+import numpy as np
+from pathlib import Path
+from typing import List, Dict, Any
+from app.services.json_codec import write_json
+from app.config import (
+    THUMBNAIL_INTERVAL,
+    THUMBNAIL_MAX_TILES,
+    THUMBNAIL_WIDTH,
+    THUMBNAIL_COLUMNS,
+    THUMBNAIL_JPEG_QUALITY
+)
+
+SPRITE_FILENAME = "sprite.jpg"
+INDEX_FILENAME = "thumbnails.json"
+
+
+class SpriteSheetBuilder:
+    """
+    Collect downscaled frames into a single sprite sheet.
+
+    Frames are fed in as they are decoded (see `process_video_detections`),
+    so building the sprite never decodes the video a second time.
+    """
+    
+    def __init__(self, fps: float, frame_count: int, width: int, height: int):
+        self.fps = fps if fps > 0 else 30.0
+        duration = frame_count / self.fps
+        interval = max(THUMBNAIL_INTERVAL, duration / THUMBNAIL_MAX_TILES)
+        self.interval_frames = max(1, int(round(interval * self.fps)))
+        
+        self.tile_width = THUMBNAIL_WIDTH
+        aspect = height / width if width > 0 and height > 0 else 9 / 16
+        self.tile_height = max(1, int(round(THUMBNAIL_WIDTH * aspect)))
+        
+        self.tiles: List[np.ndarray] = []
+        self.tile_frames: List[int] = []
+    
+    def wants(self, frame_number: int) -> bool:
+        """Whether the frame falls on the tile interval (other frames needn't be decoded for us)."""
+        return frame_number % self.interval_frames == 0 and len(self.tiles) < THUMBNAIL_MAX_TILES
+    
+    def __call__(self, frame_number: int, frame: np.ndarray) -> None:
+        """Consume a decoded frame, keeping it if it falls on the tile interval."""
+        if not self.wants(frame_number):
+            return
+        
+        tile = cv2.resize(frame, (self.tile_width, self.tile_height), interpolation=cv2.INTER_AREA)
+        self.tiles.append(tile)
+        self.tile_frames.append(frame_number)
+    
+    def save(self, job_dir: Path) -> Dict[str, Any]:
+        """
+        Write sprite.jpg and thumbnails.json to the job directory.
+        
+        Returns:
+            The thumbnail index
+        """
+        if not self.tiles:
+            raise ValueError("No frames were collected for the sprite sheet")
+        
+        columns = min(THUMBNAIL_COLUMNS, len(self.tiles))
+        rows = math.ceil(len(self.tiles) / columns)
+        sprite = np.zeros(
+            (rows * self.tile_height, columns * self.tile_width, 3),
+            dtype=np.uint8
+        )
+        
+        tiles = []
+        for i, (tile, frame_number) in enumerate(zip(self.tiles, self.tile_frames)):
+            x = (i % columns) * self.tile_width
+            y = (i // columns) * self.tile_height
+            sprite[y:y + self.tile_height, x:x + self.tile_width] = tile
+            tiles.append({
+                "timestamp": frame_number / self.fps,
+                "x": x,
+                "y": y
+            })
+        
+        sprite_path = job_dir / SPRITE_FILENAME
+        cv2.imwrite(str(sprite_path), sprite, [cv2.IMWRITE_JPEG_QUALITY, THUMBNAIL_JPEG_QUALITY])
+        
+        index = {
+            "sprite": SPRITE_FILENAME,
+            "tileWidth": self.tile_width,
+            "tileHeight": self.tile_height,
+            "columns": columns,
+            "interval": self.interval_frames / self.fps,
+            "tiles": tiles
+        }
+        
+        write_json(job_dir / INDEX_FILENAME, index)
+        
+        return index
@@ -0,0 +1,108 @@
+from typing import List, Dict, Tuple
+import numpy as np
+
+
+def pad_tracks(tracks: List[List[Dict]], keys: Tuple[str, ...] = ("bbox", "centroid")) -> Tuple[Dict[str, np.ndarray], np.ndarray]:
+    """
+    Stack tracks of different lengths into padded (tracks, samples, ...) arrays.
+
+    Each row is padded by repeating its last sample, so differences across
+    the padding are zero and never produce NaNs.
+
+    Returns:
+        Tuple of ({key: array}, lengths)
+    """
+    lengths = np.array([len(track) for track in tracks], dtype=np.int64)
+    width = int(lengths.max()) if len(lengths) else 0
+
+    columns = {}
+    for key in keys:
+        rows = [np.array([sample[key] for sample in track], dtype=np.float64) for track in tracks]
+        shape = (len(tracks), width) + (rows[0].shape[1:] if rows else ())
+        padded = np.empty(shape, dtype=np.float64)
+        for k, row in enumerate(rows):
+            padded[k, :len(row)] = row
+            padded[k, len(row):] = row[-1] if len(row) else 0.0
+        columns[key] = padded
+    return columns, lengths
+
+
+def moving_average_rows(values: np.ndarray, lengths: np.ndarray, window_size: int = 5) -> np.ndarray:
+    """
+    Centered moving average along each row, with windows truncated at the row's own ends.
+
+    Matches `smooth_signal` and `smooth_tracks` element for element (the
+    shifted views are summed in window order, like `np.mean` over each
+    window slice). Rows shorter than the window are returned unchanged,
+    as those functions do.
+
+    Args:
+        values: (tracks, samples, ...) array
+        lengths: Valid samples per row
+    """
+    count, width = values.shape[:2]
+    half = window_size // 2
+    trailing = (1,) * (values.ndim - 2)
+
+    positions = np.arange(width)
+    valid = (positions[None, :] < lengths[:, None]).reshape((count, width) + trailing)
+    masked = np.where(valid, values, 0.0)
+    padded = np.pad(masked, [(0, 0), (half, half)] + [(0, 0)] * (values.ndim - 2))
+
+    sums = np.zeros(masked.shape)
+    for offset in range(window_size):
+        sums += padded[:, offset:offset + width]
+
+    counts = (
+        np.minimum(lengths[:, None], positions[None, :] + half + 1)
+        - np.maximum(0, positions[None, :] - half)
+    )
+    averaged = sums / np.maximum(counts, 1).reshape((count, width) + trailing)
+
+    short = (lengths < window_size).reshape((count, 1) + trailing)
+    return np.where(short, values, averaged)
+
+
+def calculate_features_batch(
+    centroids: np.ndarray,
+    bottoms: np.ndarray,
+    fps: float,
+    frame_width: int,
+    frame_height: int
+) -> Dict[str, np.ndarray]:
+    """
+    Per-sample features for padded tracks in one pass.
+
+    Row k equals what `calculate_speed_proxy`, `calculate_heading`,
+    `calculate_turn_rate` and `calculate_vertical_movement` return for
+    track k (before smoothing).
+
+    Args:
+        centroids: (tracks, samples, 2) centroid positions
+        bottoms: (tracks, samples) bbox bottom y-coordinates
+
+    Returns:
+        (tracks, samples) arrays: 'speeds', 'headings', 'turnRates', 'verticalVelocities'
+    """
+    dx = np.diff(centroids[:, :, 0], axis=1)
+    dy = np.diff(centroids[:, :, 1], axis=1)
+    frame_diagonal = np.sqrt(frame_width**2 + frame_height**2)
+
+    def with_leading_zero(values: np.ndarray) -> np.ndarray:
+        return np.concatenate([np.zeros((len(values), 1)), values], axis=1)
+
+    speeds = with_leading_zero(np.sqrt(dx**2 + dy**2) * fps / frame_diagonal)
+    headings = with_leading_zero(np.arctan2(dy, dx))
+
+    delta_heading = np.diff(headings, axis=1)
+    delta_heading = np.arctan2(np.sin(delta_heading), np.cos(delta_heading))
+    turn_rates = with_leading_zero(np.degrees(delta_heading) * fps)
+
+    vertical_velocities = with_leading_zero(np.diff(bottoms, axis=1))
+
+    return {
+        "speeds": speeds,
+        "headings": headings,
+        "turnRates": turn_rates,
+        "verticalVelocities": vertical_velocities
+    }
@@ -0,0 +1,257 @@
+import gzip
+import struct
+from pathlib import Path
+from typing import List, Dict, Optional, Tuple
+import numpy as np
+
+try:
+    import brotli
+except ImportError:  # brotli is optional; gzip is always available
+    brotli = None
+
+
+# Binary track layout (little-endian, columnar so the client can wrap each
+# column in a typed array without copying):
+#
+#   header    16 bytes   magic "SCTK", version u32, count u32, reserved u32
+#   frames    int32[count]
+#   trackIds  int32[count]
+#   bboxes    float32[count * 4]   x1, y1, x2, y2
+#   centroids float32[count * 2]   x, y
+#   interpolated uint8[count]      1 where filled in between detections (v2+)
+TRACKS_BINARY_MAGIC = b"SCTK"
+TRACKS_BINARY_VERSION = 2
+TRACKS_BINARY_MEDIA_TYPE = "application/vnd.surf-coach.tracks"
+
+_HEADER = struct.Struct("<4sIII")
+_COLUMNS = (
+    ("frames", "<i4", 1),
+    ("trackIds", "<i4", 1),
+    ("bboxes", "<f4", 4),
+    ("centroids", "<f4", 2),
+    ("interpolated", "u1", 1)
+)
+# Columns present in each readable version
+_VERSION_COLUMNS = {
+    1: _COLUMNS[:4],
+    2: _COLUMNS
+}
+
+
+def _column_layout(count: int, version: int = TRACKS_BINARY_VERSION):
+    """Yield (name, dtype, shape, byte offset) for each column of the binary layout."""
+    offset = _HEADER.size
+    for name, dtype, width in _VERSION_COLUMNS[version]:
+        shape = (count, width) if width > 1 else (count,)
+        yield name, dtype, shape, offset
+        offset += count * width * np.dtype(dtype).itemsize
+
+
+def tracks_to_columns(frames: List[Dict]) -> Dict[str, np.ndarray]:
+    """
+    Convert track frames into columns sorted by frame number.
+
+    Sorting makes the binary artifact its own frame index: windows are found
+    with a binary search over the frames column.
+    """
+    count = len(frames)
+    frame_numbers = np.array([t["frame"] for t in frames], dtype="<i4")
+    order = np.argsort(frame_numbers, kind="stable")
+
+    return {
+        "frames": frame_numbers[order],
+        "trackIds": np.array([t["trackId"] for t in frames], dtype="<i4")[order],
+        "bboxes": np.array([t["bbox"] for t in frames], dtype="<f4").reshape(count, 4)[order],
+        "centroids": np.array([t["centroid"] for t in frames], dtype="<f4").reshape(count, 2)[order],
+        "interpolated": np.array([t.get("interpolated", False) for t in frames], dtype="u1")[order]
+    }
+
+
+def columns_to_tracks(columns: Dict[str, np.ndarray], decimals: int = 3) -> List[Dict]:
+    """Convert track columns back into track frame dicts (JSON-ready)."""
+    frame_numbers = columns["frames"].tolist()
+    track_ids = columns["trackIds"].tolist()
+    # float32 -> float64 widening produces long reprs; round to sub-pixel precision
+    bboxes = np.round(columns["bboxes"].astype(np.float64), decimals).tolist()
+    centroids = np.round(columns["centroids"].astype(np.float64), decimals).tolist()
+    interpolated = columns["interpolated"].astype(bool).tolist()
+
+    return [
+        {
+            "frame": frame_numbers[i],
+            "bbox": bboxes[i],
+            "centroid": centroids[i],
+            "trackId": track_ids[i],
+            "interpolated": interpolated[i]
+        }
+        for i in range(len(frame_numbers))
+    ]
+
+
+def encode_track_columns(columns: Dict[str, np.ndarray]) -> bytes:
+    """Encode track columns into the binary layout."""
+    count = len(columns["frames"])
+    header = _HEADER.pack(TRACKS_BINARY_MAGIC, TRACKS_BINARY_VERSION, count, 0)
+    return b"".join(
+        [header] + [
+            np.ascontiguousarray(columns[name], dtype=dtype).tobytes()
+            for name, dtype, _ in _COLUMNS
+        ]
+    )
+
+
+def encode_tracks_binary(frames: List[Dict]) -> bytes:
+    """
+    Encode track frames into the columnar binary layout.
+
+    Args:
+        frames: List of track frames with 'frame', 'trackId', 'bbox', 'centroid'
+
+    Returns:
+        Encoded bytes
+    """
+    return encode_track_columns(tracks_to_columns(frames))
+
+
+def _read_header(data) -> Tuple[int, int]:
+    magic, version, count, _ = _HEADER.unpack_from(data, 0)
+    if magic != TRACKS_BINARY_MAGIC or version not in _VERSION_COLUMNS:
+        raise ValueError("Unsupported track encoding")
+    return version, count
+
+
+def _fill_missing_columns(columns: Dict[str, np.ndarray], count: int) -> Dict[str, np.ndarray]:
+    """Default columns added after older files were written."""
+    if "interpolated" not in columns:
+        columns["interpolated"] = np.zeros(count, dtype="u1")
+    return columns
+
+
+def decode_track_columns(data: bytes) -> Dict[str, np.ndarray]:
+    """Decode the binary layout into (read-only) column arrays."""
+    version, count = _read_header(data)
+    columns = {
+        name: np.frombuffer(data, dtype=dtype, count=int(np.prod(shape)), offset=offset).reshape(shape)
+        for name, dtype, shape, offset in _column_layout(count, version)
+    }
+    return _fill_missing_columns(columns, count)
+
+
+def decode_tracks_binary(data: bytes) -> List[Dict]:
+    """Decode the columnar binary layout back into track frame dicts."""
+    return columns_to_tracks(decode_track_columns(data))
+
+
+def open_track_columns(path: Path) -> Dict[str, np.ndarray]:
+    """
+    Memory-map the columns of a binary track file.
+
+    Only the pages touched by a window query are read from disk.
+    """
+    with open(path, "rb") as f:
+        version, count = _read_header(f.read(_HEADER.size))
+
+    if count == 0:
+        return {
+            name: np.zeros((0, width) if width > 1 else (0,), dtype=dtype)
+            for name, dtype, width in _COLUMNS
+        }
+
+    columns = {
+        name: np.memmap(path, dtype=dtype, mode="r", offset=offset, shape=shape)
+        for name, dtype, shape, offset in _column_layout(count, version)
+    }
+    return _fill_missing_columns(columns, count)
+
+
+def window_track_columns(
+    columns: Dict[str, np.ndarray],
+    start_frame: Optional[int] = None,
+    end_frame: Optional[int] = None
+) -> Dict[str, np.ndarray]:
+    """
+    Select rows with start_frame <= frame <= end_frame by binary search.
+
+    Either bound may be None for an open-ended window.
+    """
+    frame_numbers = columns["frames"]
+    lo = 0 if start_frame is None else int(np.searchsorted(frame_numbers, start_frame, side="left"))
+    hi = len(frame_numbers) if end_frame is None else int(np.searchsorted(frame_numbers, end_frame, side="right"))
+    hi = max(lo, hi)
+    return {name: np.asarray(column[lo:hi]) for name, column in columns.items()}
+
+
+def filter_track_columns(columns: Dict[str, np.ndarray], track_id: int) -> Dict[str, np.ndarray]:
+    """Select the rows of one track, keeping frame order."""
+    keep = np.asarray(columns["trackIds"]) == track_id
+    return {name: np.asarray(column)[keep] for name, column in columns.items()}
+
+
+def wants_binary(accept: Optional[str]) -> bool:
+    """Check whether the Accept header asks for the binary track layout."""
+    if not accept:
+        return False
+    media_types = [part.split(";")[0].strip().lower() for part in accept.split(",")]
+    return TRACKS_BINARY_MEDIA_TYPE in media_types or "application/octet-stream" in media_types
+
+
+def negotiate_encoding(accept_encoding: Optional[str]) -> Optional[str]:
+    """
+    Pick a content encoding from the Accept-Encoding header.
+
+    Prefers brotli when the brotli package is installed, then gzip.
+    Returns None when the body should be sent uncompressed.
+    """
+    if not accept_encoding:
+        return None
+
+    # coding -> q value; q=0 (in any spelling) refuses the coding
+    qualities = {}
+    for part in accept_encoding.split(","):
+        fields = [f.strip() for f in part.split(";")]
+        coding = fields[0].lower()
+        if not coding:
+            continue
+        q = 1.0
+        for field in fields[1:]:
+            name, _, value = field.partition("=")
+            if name.strip().lower() == "q":
+                try:
+                    q = float(value)
+                except ValueError:
+                    q = 0.0
+        qualities[coding] = q
+
+    def acceptable(coding: str) -> bool:
+        # "*" only covers codings the header doesn't list explicitly
+        return qualities.get(coding, qualities.get("*", 0.0)) > 0
+
+    if brotli is not None and acceptable("br"):
+        return "br"
+    if acceptable("gzip"):
+        return "gzip"
+    return None
+
+
+def compress_body(body: bytes, encoding: Optional[str]) -> bytes:
+    """Compress a response body with the negotiated content encoding."""
+    if encoding == "br":
+        return brotli.compress(body, quality=5)
+    if encoding == "gzip":
+        return gzip.compress(body, compresslevel=6)
+    return body
+
+
+def compress_response(body: bytes, accept_encoding: Optional[str]) -> Tuple[bytes, Dict[str, str]]:
+    """
+    Compress a response body according to Accept-Encoding.
+
+    Returns:
+        Tuple of (body, headers)
+    """
+    headers = {"Vary": "Accept, Accept-Encoding"}
+    encoding = negotiate_encoding(accept_encoding)
+    if encoding:
+        body = compress_body(body, encoding)
+        headers["Content-Encoding"] = encoding
+    return body, headers
@@ -1,4 +1,4 @@
-from typing import List, Dict, Tuple
+from typing import List, Dict, Tuple, Optional
 import numpy as np
 from collections import defaultdict
 
@@ -6,8 +6,17 @@ from collections import defaultdict
 class SimpleTracker:
     """Simple tracking implementation using IoU matching."""
     
-    def __init__(self, iou_threshold: float = 0.3):
+    def __init__(self, iou_threshold: float = 0.3, max_center_distance: Optional[float] = None):
+        """
+        Args:
+            iou_threshold: Minimum IoU with a track's last box to continue it
+            max_center_distance: When no track overlaps enough, continue the
+                nearest unmatched track whose last centroid is within this many
+                of its box diagonals. Sparse sampling moves boxes further than
+                IoU matching tolerates. None disables the fallback.
+        """
         self.iou_threshold = iou_threshold
+        self.max_center_distance = max_center_distance
         self.tracks = {}  # track_id -> list of detections
         self.next_track_id = 1
         self.max_missing_frames = 5
@@ -75,6 +84,9 @@ class SimpleTracker:
                     best_iou = iou
                     best_track_id = track_id
             
+            if best_track_id is None and self.max_center_distance is not None:
+                best_track_id = self._nearest_track(det["bbox"], matched_tracks)
+            
             # Assign to best track or create new track
             if best_track_id is not None:
                 track_id = best_track_id
@@ -104,6 +116,25 @@ class SimpleTracker:
         
         return tracked_detections
     
+    def _nearest_track(self, bbox: List[float], exclude: set) -> Optional[int]:
+        """Unmatched track with the closest last centroid, within max_center_distance diagonals."""
+        cx, cy = self.get_centroid(bbox)
+        best_distance = None
+        best_track_id = None
+        for track_id, track_history in self.tracks.items():
+            if not track_history or track_id in exclude:
+                continue
+            
+            x1, y1, x2, y2 = track_history[-1]["bbox"]
+            diagonal = np.hypot(x2 - x1, y2 - y1)
+            tx, ty = track_history[-1]["centroid"]
+            distance = np.hypot(cx - tx, cy - ty)
+            if distance <= self.max_center_distance * diagonal and (best_distance is None or distance < best_distance):
+                best_distance = distance
+                best_track_id = track_id
+        
+        return best_track_id
+    
     def get_primary_track_id(self) -> int:
         """Get track ID with largest average bounding box area."""
         if not self.tracks:
@@ -156,3 +187,89 @@ def smooth_tracks(tracks: List[Dict], window_size: int = 5) -> List[Dict]:
     
     return smoothed
 
+
+def interpolate_tracks(
+    tracks: List[Dict],
+    step: int = 1,
+    method: str = "linear",
+    max_gap: int = 30
+) -> List[Dict]:
+    """
+    Resample a track onto a uniform frame grid, leaving long gaps unfilled.
+    
+    Detection only runs every few frames and misses some, so samples are
+    unevenly spaced. This rebuilds the track every `step` frames across
+    each run of samples no more than `max_gap` frames apart, marking
+    filled-in samples with 'interpolated': True. Nothing is made up across
+    a longer gap (the surfer left the frame or was lost); use
+    split_at_gaps to get the runs back.
+    
+    Args:
+        tracks: Track samples with 'frame', 'bbox', 'centroid', sorted by frame
+        step: Frames between output samples
+        method: 'linear' or 'spline' (cubic, fitted to each run separately)
+        max_gap: Longest gap, in frames, that is filled in
+    
+    Returns:
+        Track samples, uniformly spaced within each run
+    """
+    if method not in ("linear", "spline"):
+        raise ValueError(f"Unknown interpolation method: {method}")
+    if len(tracks) < 2:
+        return [{**t, "interpolated": False} for t in tracks]
+    
+    frames = np.array([t["frame"] for t in tracks], dtype=np.int64)
+    # Keep the first sample of any repeated frame so frames are strictly increasing
+    frames, unique_idx = np.unique(frames, return_index=True)
+    values = np.column_stack([
+        np.array([t["bbox"] for t in tracks], dtype=np.float64),
+        np.array([t["centroid"] for t in tracks], dtype=np.float64),
+        np.array([t.get("confidence", 0.5) for t in tracks], dtype=np.float64)
+    ])[unique_idx]
+    track_id = tracks[0]["trackId"]
+    
+    resampled = []
+    bounds = np.concatenate([[0], np.flatnonzero(np.diff(frames) > max_gap) + 1, [len(frames)]])
+    for start, end in zip(bounds[:-1], bounds[1:]):
+        run_frames = frames[start:end]
+        run_values = values[start:end]
+        target = np.arange(run_frames[0], run_frames[-1] + 1, step)
+        
+        if method == "spline" and len(run_frames) >= 4:
+            from scipy.interpolate import CubicSpline
+            run = CubicSpline(run_frames, run_values, axis=0)(target)
+        else:
+            # Linear interpolation of every column at once
+            run = np.empty((len(target), values.shape[1]))
+            for j in range(values.shape[1]):
+                run[:, j] = np.interp(target, run_frames, run_values[:, j])
+        
+        observed = np.isin(target, run_frames)
+        resampled += [
+            {
+                "frame": int(target[i]),
+                "trackId": track_id,
+                "bbox": run[i, :4].tolist(),
+                "centroid": run[i, 4:6].tolist(),
+                "confidence": float(run[i, 6]),
+                "interpolated": not bool(observed[i])
+            }
+            for i in range(len(target))
+        ]
+    
+    return resampled
+
+
+def split_at_gaps(tracks: List[Dict], max_step: int) -> List[List[Dict]]:
+    """
+    Split a track where consecutive samples are more than max_step frames apart.
+    
+    Returns:
+        Runs of samples, in frame order
+    """
+    runs = []
+    for sample in tracks:
+        if not runs or sample["frame"] - runs[-1][-1]["frame"] > max_step:
+            runs.append([])
+        runs[-1].append(sample)
+    return runs
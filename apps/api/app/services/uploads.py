@@ -0,0 +1,86 @@
+import re
+import shutil
+import time
+import uuid
+from pathlib import Path
+from typing import Dict, Any, Optional
+
+from app.services.json_codec import read_json, write_json
+from app.config import UPLOADS_DIR
+
+UPLOAD_ID_PATTERN = re.compile(r"^[0-9a-f]{32}$")
+
+
+# A resumable upload lives in UPLOADS_DIR/<uploadId>/:
+#
+#   upload.json  filename, declared size, surfer id, creation time; once
+#                finalized, also the job id and probed metadata
+#   data         bytes received so far; its length is the resume offset
+#
+# The offset is never stored separately, so it can't disagree with what is
+# actually on disk after a crash or a dropped connection. Finalizing moves
+# the data into the blob store but keeps upload.json, so a client whose
+# finalize response was lost can retry and learn its job id; the sweeper
+# removes it after UPLOAD_TTL_HOURS like any other idle upload.
+
+
+def upload_dir(upload_id: str) -> Path:
+    return UPLOADS_DIR / upload_id
+
+
+def create_upload(filename: str, size: int, surfer_id: Optional[str] = None) -> Dict[str, Any]:
+    """Start a resumable upload of a file of the declared size."""
+    upload_id = uuid.uuid4().hex
+    directory = upload_dir(upload_id)
+    directory.mkdir(parents=True, exist_ok=True)
+
+    session = {
+        "uploadId": upload_id,
+        "filename": filename,
+        "size": size,
+        "surferId": surfer_id,
+        "createdAt": time.time()
+    }
+    write_json(directory / "upload.json", session)
+    (directory / "data").touch()
+    return session
+
+
+def load_upload(upload_id: str) -> Optional[Dict[str, Any]]:
+    """Load an upload session with its current offset, or None if it doesn't exist."""
+    if not UPLOAD_ID_PATTERN.match(upload_id):
+        return None
+    directory = upload_dir(upload_id)
+    try:
+        session = read_json(directory / "upload.json")
+        if "jobId" in session:
+            session["offset"] = session["size"]
+        else:
+            session["offset"] = (directory / "data").stat().st_size
+    except FileNotFoundError:
+        return None
+    return session
+
+
+def upload_data_path(upload_id: str) -> Path:
+    return upload_dir(upload_id) / "data"
+
+
+def complete_upload(upload_id: str, job_id: str, metadata: Dict[str, Any]) -> Dict[str, Any]:
+    """
+    Record the job a finalized upload created and drop whatever data is left.
+
+    Returns:
+        The session, as load_upload will return it from now on
+    """
+    directory = upload_dir(upload_id)
+    session = read_json(directory / "upload.json")
+    session.update({"jobId": job_id, "metadata": metadata})
+    write_json(directory / "upload.json", session)
+    (directory / "data").unlink(missing_ok=True)
+    session["offset"] = session["size"]
+    return session
+
+
+def delete_upload(upload_id: str) -> None:
+    shutil.rmtree(upload_dir(upload_id), ignore_errors=True)
@@ -1,9 +1,11 @@
 import cv2
-import json
+import os
 import subprocess
+import uuid
 from pathlib import Path
 from typing import Dict, Any
-from app.config import JOBS_DIR, VIDEO_CODEC, VIDEO_FORMAT
+from app.services.json_codec import read_json, write_json
+from app.config import JOBS_DIR, VIDEO_CODEC, VIDEO_FORMAT, HLS_SEGMENT_DURATION
 
 
 def extract_video_metadata(video_path: Path) -> Dict[str, Any]:
@@ -58,6 +60,113 @@ def normalize_video(input_path: Path, output_path: Path) -> None:
         raise RuntimeError("FFmpeg not found. Please install ffmpeg.")
 
 
+def extract_clip(input_path: Path, output_path: Path, start: float, duration: float) -> None:
+    """
+    Cut a clip out of a video without re-encoding.
+    
+    Input seeking with stream copy starts the clip on the keyframe at or before
+    `start`, so the cut is keyframe-aligned and costs only a remux. The clip is
+    written to a temporary file and renamed so concurrent readers never see a
+    partial file.
+    """
+    output_path.parent.mkdir(parents=True, exist_ok=True)
+    tmp_path = output_path.with_name(f".{output_path.stem}-{uuid.uuid4().hex}{output_path.suffix}")
+    
+    cmd = [
+        "ffmpeg",
+        "-ss", f"{max(0.0, start):.3f}",
+        "-i", str(input_path),
+        "-t", f"{duration:.3f}",
+        "-map", "0:v:0",
+        "-map", "0:a?",
+        "-c", "copy",
+        "-avoid_negative_ts", "make_zero",
+        "-movflags", "+faststart",
+        "-y",
+        str(tmp_path)
+    ]
+    
+    try:
+        subprocess.run(
+            cmd,
+            capture_output=True,
+            text=True,
+            check=True
+        )
+        os.replace(tmp_path, output_path)
+    except subprocess.CalledProcessError as e:
+        raise RuntimeError(f"FFmpeg clip extraction failed: {e.stderr}")
+    except FileNotFoundError:
+        raise RuntimeError("FFmpeg not found. Please install ffmpeg.")
+    finally:
+        if tmp_path.exists():
+            tmp_path.unlink()
+
+
+def package_hls(input_path: Path, output_dir: Path) -> Path:
+    """
+    Package a video as HLS segments plus a VOD playlist.
+    
+    Stream copy is tried first; if the source codecs can't be muxed into
+    MPEG-TS as-is, the video is re-encoded with keyframes on segment
+    boundaries. Segment names carry a random version, so a repackaged job
+    never reuses a (cached, immutable) segment URL; the previous packaging's
+    segments are removed once the new playlist is written.
+    
+    Returns:
+        Path to the playlist (index.m3u8)
+    """
+    output_dir.mkdir(parents=True, exist_ok=True)
+    playlist_path = output_dir / "index.m3u8"
+    segment_prefix = f"segment_{uuid.uuid4().hex[:8]}_"
+    
+    hls_args = [
+        "-f", "hls",
+        "-hls_time", str(HLS_SEGMENT_DURATION),
+        "-hls_playlist_type", "vod",
+        "-hls_segment_filename", str(output_dir / f"{segment_prefix}%05d.ts"),
+        "-y",
+        str(playlist_path)
+    ]
+    copy_cmd = [
+        "ffmpeg",
+        "-i", str(input_path),
+        "-map", "0:v:0",
+        "-map", "0:a?",
+        "-c", "copy",
+    ] + hls_args
+    encode_cmd = [
+        "ffmpeg",
+        "-i", str(input_path),
+        "-map", "0:v:0",
+        "-map", "0:a?",
+        "-c:v", VIDEO_CODEC,
+        "-preset", "veryfast",
+        "-crf", "23",
+        "-force_key_frames", f"expr:gte(t,n_forced*{HLS_SEGMENT_DURATION})",
+        "-c:a", "aac",
+        "-b:a", "128k",
+    ] + hls_args
+    
+    try:
+        subprocess.run(copy_cmd, capture_output=True, text=True, check=True)
+    except subprocess.CalledProcessError:
+        for partial in output_dir.glob(f"{segment_prefix}*"):
+            partial.unlink()
+        try:
+            subprocess.run(encode_cmd, capture_output=True, text=True, check=True)
+        except subprocess.CalledProcessError as e:
+            raise RuntimeError(f"FFmpeg HLS packaging failed: {e.stderr}")
+    except FileNotFoundError:
+        raise RuntimeError("FFmpeg not found. Please install ffmpeg.")
+    
+    for stale in output_dir.glob("segment_*.ts"):
+        if not stale.name.startswith(segment_prefix):
+            stale.unlink()
+    
+    return playlist_path
+
+
 def save_metadata(job_dir: Path, metadata: Dict[str, Any]) -> None:
     """Save metadata to meta.json in job directory."""
     meta_path = job_dir / "meta.json"
@@ -65,13 +174,11 @@ def save_metadata(job_dir: Path, metadata: Dict[str, Any]) -> None:
     # Load existing metadata if it exists
     existing_meta = {}
     if meta_path.exists():
-        with open(meta_path, "r") as f:
-            existing_meta = json.load(f)
+        existing_meta = read_json(meta_path)
     
     # Update with new metadata
     existing_meta.update(metadata)
     
     # Save
-    with open(meta_path, "w") as f:
-        json.dump(existing_meta, f, indent=2)
+    write_json(meta_path, existing_meta, indent=True)
 
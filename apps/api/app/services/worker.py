@@ -1,145 +1,216 @@
-import json
 import asyncio
+import logging
+import os
+import socket
 from pathlib import Path
-from typing import Dict
-
-from app.services.video_processor import extract_video_metadata, save_metadata
-from app.services.detection import process_video_detections
-from app.services.tracking import SimpleTracker, smooth_tracks
-from app.services.feature_extraction import (
-    calculate_speed_proxy,
-    calculate_heading,
-    calculate_turn_rate,
-    calculate_vertical_movement,
-    smooth_signal
-)
-from app.services.event_detection import detect_popup, detect_turns
-from app.services.metrics import calculate_metrics
-from app.services.coaching import calculate_confidence, generate_tips
-from app.config import JOBS_DIR
+from typing import Any, Dict, Optional
+
+from app.services.json_codec import read_json, write_json
+from app.services.video_processor import save_metadata, package_hls
+from app.services.pipeline import analyze_video, AnalysisError
+from app.services.fingerprints import get_fingerprint_index
+from app.services.inference_pool import get_inference_pool
+from app.services.analytics import record_job
+from app.services.profiling import JobProfiler, code_profiler, record_job_metrics
+from app.config import JOBS_DIR, HLS_ENABLED, PROFILE_JOBS, PREVIEW_ENABLED, DETECTION_REUSE_ENABLED
+
+logger = logging.getLogger(__name__)
+
+UNEXPECTED_ERROR_MESSAGE = "Processing failed unexpectedly. Please try uploading the video again."
+INTERRUPTED_ERROR_MESSAGE = "Processing was interrupted by a server restart. Please upload the video again."
 
 
 async def process_job(job_id: str) -> None:
     """
     Process a video job: detect, track, extract features, detect events, calculate metrics, generate tips.
+    
+    Per-stage timings, counters and peak memory are written to profile.json
+    and folded into the process-wide Prometheus metrics. Any unexpected
+    error marks the job failed instead of leaving it "processing".
     """
     job_dir = JOBS_DIR / job_id
     video_path = job_dir / "input.mp4"
     
+    if not job_dir.exists():
+        raise FileNotFoundError(f"Job not found: {job_dir}")
+    
     if not video_path.exists():
-        raise FileNotFoundError(f"Video file not found: {video_path}")
+        update_job_status(job_id, "failed", 0.0, "Video file not found.")
+        return
     
+    profiler = JobProfiler()
+    status = "failed"
+    try:
+        with code_profiler(PROFILE_JOBS, job_dir):
+            status = _run_job(job_id, job_dir, video_path, profiler)
+    except Exception:
+        logger.exception("job %s crashed", job_id)
+        fail_job(job_id, UNEXPECTED_ERROR_MESSAGE)
+    finally:
+        report = profiler.save(job_dir)
+        record_job_metrics(report, status)
+
+
+def _run_job(job_id: str, job_dir: Path, video_path: Path, profiler: JobProfiler) -> str:
+    """Run the analysis pipeline for a job. Returns the final job status."""
     # Update status to processing
     update_job_status(job_id, "processing", 0.1)
     
-    # Step 1: Extract metadata
-    metadata = extract_video_metadata(video_path)
-    save_metadata(job_dir, metadata)
-    update_job_status(job_id, "processing", 0.2)
-    
-    fps = metadata["fps"]
-    frame_width = metadata["width"]
-    frame_height = metadata["height"]
-    
-    # Step 2: Detection
-    frame_detections = process_video_detections(video_path)
-    update_job_status(job_id, "processing", 0.4)
-    
-    if not frame_detections or not any(d["detections"] for d in frame_detections):
-        update_job_status(job_id, "failed", 0.0, "Could not detect a surfer in this video. Please ensure the surfer is clearly visible.")
-        return
-    
-    # Step 3: Tracking
-    tracker = SimpleTracker()
-    all_tracked_frames = []
-    
-    for frame_data in frame_detections:
-        frame_num = frame_data["frame"]
-        detections = frame_data["detections"]
-        
-        tracked = tracker.update(detections)
-        
-        for track in tracked:
-            all_tracked_frames.append({
-                "frame": frame_num,
-                **track
-            })
-    
-    # Select primary surfer (largest track)
-    primary_track_id = tracker.get_primary_track_id()
-    if primary_track_id is None:
-        update_job_status(job_id, "failed", 0.0, "Could not identify primary surfer track.")
-        return
+    try:
+        analyze_video(
+            video_path,
+            job_dir,
+            profiler=profiler,
+            on_progress=lambda fraction: update_job_status(job_id, "processing", fraction),
+            preview=PREVIEW_ENABLED,
+            # Clients may show results.json while the refine pass runs
+            on_preview=lambda results: save_metadata(job_dir, {"provisional": True}),
+            fingerprint_index=get_fingerprint_index() if DETECTION_REUSE_ENABLED else None,
+            inference_pool=get_inference_pool()
+        )
+    except AnalysisError as e:
+        fail_job(job_id, str(e))
+        return "failed"
     
-    # Filter to primary track only
-    primary_tracks = [t for t in all_tracked_frames if t["trackId"] == primary_track_id]
-    
-    # Sort by frame number
-    primary_tracks.sort(key=lambda x: x["frame"])
-    
-    # Smooth tracks
-    primary_tracks = smooth_tracks(primary_tracks, window_size=5)
-    
-    update_job_status(job_id, "processing", 0.6)
-    
-    # Step 4: Feature extraction
-    speeds = calculate_speed_proxy(primary_tracks, fps, frame_width, frame_height)
-    headings = calculate_heading(primary_tracks)
-    turn_rates = calculate_turn_rate(headings, fps)
-    vertical_velocities = calculate_vertical_movement(primary_tracks)
-    
-    # Smooth signals
-    speeds = smooth_signal(speeds)
-    turn_rates = smooth_signal(turn_rates)
-    
-    update_job_status(job_id, "processing", 0.7)
-    
-    # Step 5: Event detection
-    popup_events = detect_popup(primary_tracks, vertical_velocities, fps)
-    turn_events = detect_turns(turn_rates, fps)
-    all_events = popup_events + turn_events
-    
-    update_job_status(job_id, "processing", 0.8)
+    # Update status to completed
+    save_metadata(job_dir, {"provisional": False})
+    update_job_status(job_id, "completed", 1.0)
     
-    # Step 6: Metrics calculation
-    metrics = calculate_metrics(primary_tracks, speeds, turn_rates, all_events, fps)
+    # Feed the trends store; a failure here is logged, never fails the job
+    with profiler.stage("recordMetrics"):
+        record_job(job_dir)
     
-    # Step 7: Coaching tips
-    overall_confidence = calculate_confidence(primary_tracks, speeds, headings)
-    tips = generate_tips(metrics, all_events, overall_confidence)
+    # Step 9 (optional): HLS packaging; results are already available and
+    # clients fall back to the MP4 until the playlist exists
+    if HLS_ENABLED:
+        with profiler.stage("hls"):
+            package_job_hls(job_dir)
     
-    update_job_status(job_id, "processing", 0.9)
+    return "completed"
+
+
+def package_job_hls(job_dir: Path) -> None:
+    """Package the job's input (and overlay, if present) as HLS."""
+    hls = {}
+    for source, filename in (("video", "input.mp4"), ("overlay", "overlay.mp4")):
+        source_path = job_dir / filename
+        if not source_path.exists():
+            continue
+        try:
+            package_hls(source_path, job_dir / "hls" / source)
+            hls[source] = f"hls/{source}/index.m3u8"
+        except RuntimeError as e:
+            # Packaging is best-effort; the MP4 endpoints keep working
+            save_metadata(job_dir, {"hlsError": str(e)})
+    
+    if hls:
+        save_metadata(job_dir, {"hls": hls})
+
+
+def _read_proc(path: str) -> Optional[str]:
+    try:
+        with open(path, "r") as f:
+            return f.read()
+    except OSError:
+        return None
+
+
+def _process_start_time(pid: int) -> Optional[str]:
+    """Start time of a process in clock ticks since boot (Linux), None if unknown."""
+    stat = _read_proc(f"/proc/{pid}/stat")
+    if stat is None:
+        return None
+    # Fields after the parenthesised command name; starttime is field 22
+    return stat.rsplit(")", 1)[1].split()[19]
+
+
+def process_owner() -> Dict[str, Any]:
+    """
+    Identify this process, for meta.json's "owner" of the jobs it runs.
     
-    # Step 8: Save results
-    results = {
-        "metrics": metrics,
-        "events": all_events,
-        "tips": tips
+    A PID alone is reused (every container restart is PID 1 again), so the
+    boot id and the process start time are kept with it where the OS has them.
+    """
+    boot_id = _read_proc("/proc/sys/kernel/random/boot_id")
+    return {
+        "host": socket.gethostname(),
+        "pid": os.getpid(),
+        "bootId": boot_id.strip() if boot_id else None,
+        "startTime": _process_start_time(os.getpid())
     }
+
+
+def owner_alive(owner: Optional[Dict[str, Any]]) -> bool:
+    """
+    Whether the process that owns a job may still be running it.
     
-    results_path = job_dir / "results.json"
-    with open(results_path, "w") as f:
-        json.dump(results, f, indent=2)
-    
-    # Save tracks
-    tracks_data = {
-        "frames": [
-            {
-                "frame": t["frame"],
-                "bbox": t["bbox"],
-                "centroid": t["centroid"],
-                "trackId": t["trackId"]
-            }
-            for t in primary_tracks
-        ]
-    }
+    Owners on another host can't be checked and count as alive; jobs from
+    before owners were recorded count as orphaned.
+    """
+    if not owner:
+        return False
+    current = process_owner()
+    if owner.get("host") != current["host"]:
+        return True
+    if owner.get("bootId") and current["bootId"] and owner["bootId"] != current["bootId"]:
+        return False
+    pid = owner.get("pid")
+    if pid == current["pid"]:
+        # Same PID as this process: alive only if it is this very process
+        return owner.get("startTime") == current["startTime"]
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except (PermissionError, TypeError):
+        # Exists but belongs to another user, or a malformed owner
+        return isinstance(pid, int)
+    if owner.get("startTime") is not None:
+        return _process_start_time(pid) == owner["startTime"]
+    return True
+
+
+def fail_interrupted_jobs() -> int:
+    """
+    Mark pending/processing jobs whose owning process is gone as failed.
     
-    tracks_path = job_dir / "tracks.json"
-    with open(tracks_path, "w") as f:
-        json.dump(tracks_data, f, indent=2)
+    Jobs run as in-process background tasks, so none survive a restart or a
+    crashed worker. Jobs owned by another live process (another uvicorn
+    worker, or the old process during a rolling restart) are left alone.
+    Returns the number of jobs marked failed.
+    """
+    if not JOBS_DIR.exists():
+        return 0
+    
+    count = 0
+    for meta_path in JOBS_DIR.glob("*/meta.json"):
+        try:
+            meta = read_json(meta_path)
+        except (OSError, ValueError):
+            continue
+        if meta.get("status") in ("pending", "processing") and not owner_alive(meta.get("owner")):
+            fail_job(meta_path.parent.name, INTERRUPTED_ERROR_MESSAGE)
+            count += 1
+    return count
+
+
+def fail_job(job_id: str, error: str) -> None:
+    """
+    Mark a job failed, discarding preview results left by an unfinished refine pass.
     
-    # Update status to completed
-    update_job_status(job_id, "completed", 1.0)
+    Provisional results would otherwise be polled for refinement forever;
+    they were never final, so a failed job shows none.
+    """
+    job_dir = JOBS_DIR / job_id
+    try:
+        provisional = read_json(job_dir / "results.json").get("provisional", False)
+    except (OSError, ValueError):
+        provisional = False
+    if provisional:
+        for name in ("results.json", "tracks.json", "tracks.bin"):
+            (job_dir / name).unlink(missing_ok=True)
+    save_metadata(job_dir, {"provisional": False})
+    update_job_status(job_id, "failed", 0.0, error)
 
 
 def run_job_sync(job_id: str) -> None:
@@ -155,18 +226,15 @@ def update_job_status(job_id: str, status: str, progress: float, error: str = No
     # Load existing metadata
     meta = {}
     if meta_path.exists():
-        with open(meta_path, "r") as f:
-            meta = json.load(f)
+        meta = read_json(meta_path)
     
     # Update status
     meta["status"] = status
     meta["progress"] = progress
+    if status == "processing":
+        meta["owner"] = process_owner()
     if error:
         meta["error"] = error
     
     # Save
-    with open(meta_path, "w") as f:
-        json.dump(meta, f, indent=2)
-
-
-
+    write_json(meta_path, meta, indent=True)
@@ -0,0 +1,197 @@
+"""
+Compare detector backends for latency and accuracy.
+
+    python -m benchmarks.compare_detectors yolov8n.pt yolov8n.onnx yolov8n-int8.onnx --videos clips/*.mp4
+
+The first model is the reference. For each other model, detections on the
+same frames are matched to the reference's (IoU >= --match-iou) to report
+recall, precision, mean IoU of matched boxes and mean confidence shift.
+Because tips are the product, each backend's detections are also run
+through analyze_detections and the resulting metrics are shown side by side.
+
+Latency is the detector call alone (letterbox, inference, postprocessing),
+excluding decode and the first --warmup frames. Pass "stub" as a model to
+include the synthetic stub detector.
+"""
+import argparse
+import json
+import statistics
+import sys
+import time
+from pathlib import Path
+from typing import Dict, List, Any
+
+import cv2
+import numpy as np
+
+from app.config import FRAME_PROCESSING_INTERVAL
+from app.services.detectors import load_detector, detector_backend
+from app.services.pipeline import analyze_detections, AnalysisError
+from benchmarks.synthetic import generate_clip, stub_detect_persons
+
+BENCHMARKS_DIR = Path(__file__).parent
+CACHE_DIR = BENCHMARKS_DIR / ".cache"
+
+
+def box_iou(a: np.ndarray, b: np.ndarray) -> np.ndarray:
+    """Pairwise IoU between (n, 4) and (m, 4) xyxy boxes."""
+    inter_w = (np.minimum(a[:, None, 2], b[:, 2]) - np.maximum(a[:, None, 0], b[:, 0])).clip(0)
+    inter_h = (np.minimum(a[:, None, 3], b[:, 3]) - np.maximum(a[:, None, 1], b[:, 1])).clip(0)
+    inter = inter_w * inter_h
+    area_a = (a[:, 2] - a[:, 0]) * (a[:, 3] - a[:, 1])
+    area_b = (b[:, 2] - b[:, 0]) * (b[:, 3] - b[:, 1])
+    return inter / np.maximum(area_a[:, None] + area_b - inter, 1e-9)
+
+
+def match_frame(reference: List[tuple], candidate: List[tuple], min_iou: float) -> List[tuple]:
+    """Greedily pair boxes by IoU; returns (iou, confidence delta) per match."""
+    if not reference or not candidate:
+        return []
+    ref = np.array(reference, dtype=np.float64)
+    cand = np.array(candidate, dtype=np.float64)
+    iou = box_iou(ref[:, :4], cand[:, :4])
+
+    matches = []
+    while True:
+        i, j = np.unravel_index(np.argmax(iou), iou.shape)
+        if iou[i, j] < min_iou:
+            break
+        matches.append((float(iou[i, j]), float(cand[j, 4] - ref[i, 4])))
+        iou[i, :] = -1
+        iou[:, j] = -1
+    return matches
+
+
+def run_detector(name: str, videos: List[Path], max_frames: int, warmup: int) -> Dict[str, Any]:
+    """Detect on every FRAME_PROCESSING_INTERVAL-th frame of each video, timing each call."""
+    detector = stub_detect_persons if name == "stub" else load_detector(name)
+
+    latencies = []
+    per_video = {}
+    for video in videos:
+        cap = cv2.VideoCapture(str(video))
+        metadata = {
+            "fps": cap.get(cv2.CAP_PROP_FPS),
+            "width": int(cap.get(cv2.CAP_PROP_FRAME_WIDTH)),
+            "height": int(cap.get(cv2.CAP_PROP_FRAME_HEIGHT))
+        }
+        frame_detections = []
+        frame_number = 0
+        while len(frame_detections) < max_frames:
+            ok, frame = cap.read()
+            if not ok:
+                break
+            if frame_number % FRAME_PROCESSING_INTERVAL == 0:
+                start = time.perf_counter()
+                detections = detector(frame)
+                latencies.append(time.perf_counter() - start)
+                frame_detections.append({
+                    "frame": frame_number,
+                    "detections": [
+                        {"bbox": [x1, y1, x2, y2], "confidence": conf}
+                        for x1, y1, x2, y2, conf in detections
+                    ]
+                })
+            frame_number += 1
+        per_video[str(video)] = {"metadata": metadata, "frames": frame_detections}
+        cap.release()
+
+    timed = latencies[warmup:] or latencies
+    return {
+        "model": name,
+        "backend": "stub" if name == "stub" else detector_backend(name),
+        "frames": len(latencies),
+        "latencyMs": {
+            "median": statistics.median(timed) * 1000,
+            "p90": float(np.percentile(timed, 90)) * 1000,
+            "mean": statistics.fmean(timed) * 1000
+        },
+        "videos": per_video
+    }
+
+
+def accuracy(reference: Dict[str, Any], candidate: Dict[str, Any], min_iou: float) -> Dict[str, Any]:
+    """Agreement of a candidate's detections with the reference's, over all frames."""
+    ref_count = cand_count = 0
+    matches = []
+    for video, ref_video in reference["videos"].items():
+        for ref_frame, cand_frame in zip(ref_video["frames"], candidate["videos"][video]["frames"]):
+            ref = [(*d["bbox"], d["confidence"]) for d in ref_frame["detections"]]
+            cand = [(*d["bbox"], d["confidence"]) for d in cand_frame["detections"]]
+            ref_count += len(ref)
+            cand_count += len(cand)
+            matches += match_frame(ref, cand, min_iou)
+
+    return {
+        "recall": len(matches) / ref_count if ref_count else None,
+        "precision": len(matches) / cand_count if cand_count else None,
+        "meanIou": statistics.fmean(m[0] for m in matches) if matches else None,
+        "meanConfidenceDelta": statistics.fmean(m[1] for m in matches) if matches else None
+    }
+
+
+def downstream_metrics(run: Dict[str, Any]) -> Dict[str, Any]:
+    """Analysis metrics per video from this backend's detections."""
+    metrics = {}
+    for video, data in run["videos"].items():
+        try:
+            results, _ = analyze_detections(data["frames"], data["metadata"])
+            metrics[video] = {**results["metrics"], "tips": [t["id"] for t in results["tips"]]}
+        except AnalysisError as e:
+            metrics[video] = {"error": str(e)}
+    return metrics
+
+
+def _fmt(value, spec: str = ".3f") -> str:
+    return "-" if value is None else format(value, spec)
+
+
+def main(argv: List[str] = None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("models", nargs="+", help="Model paths (first is the reference) or 'stub'")
+    parser.add_argument("--videos", type=Path, nargs="*", default=[], help="Clips to run on (default: a synthetic clip)")
+    parser.add_argument("--max-frames", type=int, default=300, help="Detected frames per video")
+    parser.add_argument("--warmup", type=int, default=3, help="Initial calls excluded from latency")
+    parser.add_argument("--match-iou", type=float, default=0.5)
+    parser.add_argument("--output", type=Path, help="Write the full comparison as JSON")
+    args = parser.parse_args(argv)
+
+    videos = args.videos or [generate_clip(CACHE_DIR / "clip-10s-1280x720-crowd3.mp4", 10, 1280, 720, 3)]
+
+    runs = []
+    for model in args.models:
+        print(f"running {model}", file=sys.stderr)
+        runs.append(run_detector(model, videos, args.max_frames, args.warmup))
+
+    reference = runs[0]
+    print(f"\n{'model':<32} {'backend':<12} {'median ms':>10} {'p90 ms':>8} {'speedup':>8} {'recall':>7} {'precis.':>7} {'IoU':>6} {'dConf':>7}")
+    for run in runs:
+        run["accuracy"] = accuracy(reference, run, args.match_iou)
+        run["metrics"] = downstream_metrics(run)
+        acc = run["accuracy"]
+        speedup = reference["latencyMs"]["median"] / run["latencyMs"]["median"]
+        print(
+            f"{run['model']:<32} {run['backend']:<12} {run['latencyMs']['median']:>10.2f} "
+            f"{run['latencyMs']['p90']:>8.2f} {speedup:>7.2f}x {_fmt(acc['recall']):>7} "
+            f"{_fmt(acc['precision']):>7} {_fmt(acc['meanIou']):>6} {_fmt(acc['meanConfidenceDelta'], '+.3f'):>7}"
+        )
+
+    print("\nanalysis metrics")
+    for video in reference["videos"]:
+        print(f"  {video}")
+        for run in runs:
+            print(f"    {run['model']:<30} {json.dumps(run['metrics'][video])}")
+
+    if args.output:
+        for run in runs:
+            del run["videos"]  # raw detections; large and reproducible
+        args.output.parent.mkdir(parents=True, exist_ok=True)
+        with open(args.output, "w") as f:
+            json.dump(runs, f, indent=2)
+        print(f"wrote {args.output}", file=sys.stderr)
+
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,138 @@
+"""
+Export the YOLOv8 weights for the CPU inference backends.
+
+    python -m benchmarks.export_model yolov8n.pt                          # yolov8n.onnx
+    python -m benchmarks.export_model yolov8n.pt --int8 --calibration clips/*.mp4
+    python -m benchmarks.export_model yolov8n.pt --openvino               # yolov8n_openvino_model/
+
+--int8 statically quantizes the ONNX model with ONNX Runtime (QDQ format,
+per-channel weights), calibrated on frames sampled from the given clips.
+Calibrate on real footage: the activation ranges come from these frames.
+The detection head's box decoding is kept in float, since quantizing it
+costs localisation accuracy for little speed.
+
+Point YOLO_MODEL in app/config.py at the output, then check accuracy and
+latency against the PyTorch model with benchmarks.compare_detectors.
+"""
+import argparse
+import sys
+from pathlib import Path
+from typing import List, Iterator
+
+import cv2
+import numpy as np
+
+from app.services.detectors import letterbox, static_input_size
+from benchmarks.synthetic import generate_clip
+
+CACHE_DIR = Path(__file__).parent / ".cache"
+
+
+def sample_frames(videos: List[Path], count: int) -> Iterator[np.ndarray]:
+    """Yield up to `count` frames spread evenly across the videos."""
+    per_video = max(1, count // len(videos))
+    for video in videos:
+        cap = cv2.VideoCapture(str(video))
+        total = int(cap.get(cv2.CAP_PROP_FRAME_COUNT)) or per_video
+        step = max(1, total // per_video)
+        for index in range(0, total, step)[:per_video]:
+            cap.set(cv2.CAP_PROP_POS_FRAMES, index)
+            ok, frame = cap.read()
+            if ok:
+                yield frame
+        cap.release()
+
+
+class FrameCalibrationReader:
+    """Feeds letterboxed frames to ONNX Runtime's static quantization calibrator."""
+
+    def __init__(self, model_path: Path, videos: List[Path], count: int):
+        import onnxruntime as ort
+
+        model_input = ort.InferenceSession(str(model_path), providers=["CPUExecutionProvider"]).get_inputs()[0]
+        size = static_input_size(model_input.shape)
+        self.input_name = model_input.name
+        self.frames = (letterbox(frame, size)[0] for frame in sample_frames(videos, count))
+
+    def get_next(self):
+        blob = next(self.frames, None)
+        return None if blob is None else {self.input_name: blob}
+
+
+def export_onnx(weights: Path, imgsz: int) -> Path:
+    from ultralytics import YOLO
+    return Path(YOLO(str(weights)).export(format="onnx", imgsz=imgsz, dynamic=False, simplify=True))
+
+
+def export_openvino(weights: Path, imgsz: int) -> Path:
+    from ultralytics import YOLO
+    return Path(YOLO(str(weights)).export(format="openvino", imgsz=imgsz, half=False))
+
+
+def head_nodes_to_exclude(model_path: Path) -> List[str]:
+    """Non-conv nodes of the YOLOv8 detection head (DFL, box decode, concat)."""
+    import onnx
+
+    graph = onnx.load(str(model_path)).graph
+    conv_layers = [n.name for n in graph.node if n.op_type == "Conv" and n.name.startswith("/model.")]
+    if not conv_layers:
+        return []
+    # The head is the last numbered module, e.g. /model.22/ for YOLOv8
+    head = "/".join(conv_layers[-1].split("/")[:2]) + "/"
+    return [n.name for n in graph.node if n.name.startswith(head) and n.op_type != "Conv"]
+
+
+def quantize_int8(model_path: Path, output_path: Path, videos: List[Path], frames: int) -> Path:
+    from onnxruntime.quantization import quantize_static, QuantFormat, QuantType, CalibrationMethod
+    from onnxruntime.quantization.shape_inference import quant_pre_process
+
+    prepared = model_path.with_name(model_path.stem + "-prep.onnx")
+    # Exported models have static shapes, so symbolic shape inference isn't needed
+    quant_pre_process(str(model_path), str(prepared), skip_symbolic_shape=True)
+    try:
+        quantize_static(
+            str(prepared),
+            str(output_path),
+            FrameCalibrationReader(prepared, videos, frames),
+            quant_format=QuantFormat.QDQ,
+            per_channel=True,
+            activation_type=QuantType.QUInt8,
+            weight_type=QuantType.QInt8,
+            calibrate_method=CalibrationMethod.MinMax,
+            nodes_to_exclude=head_nodes_to_exclude(prepared)
+        )
+    finally:
+        prepared.unlink(missing_ok=True)
+    return output_path
+
+
+def main(argv: List[str] = None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("weights", type=Path, help="Ultralytics .pt weights (or an exported .onnx for --int8)")
+    parser.add_argument("--imgsz", type=int, default=640)
+    parser.add_argument("--int8", action="store_true", help="Also write an INT8-quantized ONNX model")
+    parser.add_argument("--openvino", action="store_true", help="Export OpenVINO IR instead of ONNX")
+    parser.add_argument("--calibration", type=Path, nargs="*", default=[], help="Clips to calibrate INT8 on")
+    parser.add_argument("--calibration-frames", type=int, default=200)
+    args = parser.parse_args(argv)
+
+    if args.openvino:
+        print(export_openvino(args.weights, args.imgsz))
+        return 0
+
+    onnx_path = args.weights if args.weights.suffix == ".onnx" else export_onnx(args.weights, args.imgsz)
+    print(onnx_path)
+
+    if args.int8:
+        videos = args.calibration
+        if not videos:
+            print("warning: no --calibration clips; calibrating on a synthetic clip", file=sys.stderr)
+            videos = [generate_clip(CACHE_DIR / "calibration.mp4", 20, 1280, 720, 3)]
+        int8_path = onnx_path.with_name(onnx_path.stem + "-int8.onnx")
+        print(quantize_int8(onnx_path, int8_path, videos, args.calibration_frames))
+
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,157 @@
+"""
+Golden-file regression check for the post-detection pipeline.
+
+Stored detection fixtures are run through tracking, features, events,
+metrics and tips (analyze_detections). The results and tracks are compared
+against golden files with a numeric tolerance, and the run time is reported
+against the time recorded with the golden file. A performance rewrite can
+then show its speedup and any drift side by side.
+
+    python -m benchmarks.golden                      # check against goldens
+    python -m benchmarks.golden --update             # accept current output
+    python -m benchmarks.golden --generate-fixtures  # (re)write detection fixtures
+
+Exit status is 1 when any fixture drifts beyond tolerance.
+"""
+import argparse
+import json
+import math
+import statistics
+import sys
+import time
+from pathlib import Path
+from typing import Any, Dict, List
+
+from app.services.pipeline import analyze_detections, AnalysisError
+from benchmarks.synthetic import generate_detections
+
+BENCHMARKS_DIR = Path(__file__).parent
+FIXTURES_DIR = BENCHMARKS_DIR / "fixtures"
+GOLDEN_DIR = BENCHMARKS_DIR / "golden"
+
+# Detection fixtures: (name, generate_detections kwargs)
+FIXTURES = [
+    # Dense, confident detections: exercises pop-up detection and tips
+    ("single-surfer", {"duration": 20, "width": 1920, "height": 1080, "crowd": 1, "interval": 1, "confidence": (0.9, 0.99)}),
+    ("crowded-lineup", {"duration": 20, "width": 1280, "height": 720, "crowd": 5}),
+    ("sparse-detections", {"duration": 20, "width": 1920, "height": 1080, "crowd": 2, "interval": 5, "miss_rate": 0.3}),
+]
+FIXTURE_FPS = 30.0
+
+
+def generate_fixtures() -> None:
+    """Write the detection fixtures from the seeded synthetic generator."""
+    FIXTURES_DIR.mkdir(parents=True, exist_ok=True)
+    for name, params in FIXTURES:
+        frames = generate_detections(fps=FIXTURE_FPS, **params)
+        fixture = {
+            "metadata": {"fps": FIXTURE_FPS, "width": params["width"], "height": params["height"]},
+            "frames": frames
+        }
+        with open(FIXTURES_DIR / f"{name}.detections.json", "w") as f:
+            json.dump(fixture, f, separators=(",", ":"))
+        print(f"wrote fixture {name}", file=sys.stderr)
+
+
+def run_fixture(fixture: Dict[str, Any], repeat: int) -> Dict[str, Any]:
+    """Run analyze_detections on a fixture; returns output and median wall time."""
+    timings = []
+    output = None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        try:
+            results, tracks = analyze_detections(fixture["frames"], fixture["metadata"])
+            output = {"results": results, "tracks": tracks}
+        except AnalysisError as e:
+            output = {"error": str(e)}
+        timings.append(time.perf_counter() - start)
+    # Round-trip through JSON so numpy scalars compare like the stored files
+    return {"output": json.loads(json.dumps(output)), "wallSeconds": statistics.median(timings)}
+
+
+def diff(expected: Any, actual: Any, rel_tol: float, abs_tol: float, path: str = "") -> List[str]:
+    """List differences between two JSON values, comparing numbers with tolerance."""
+    if isinstance(expected, bool) or isinstance(actual, bool):
+        return [] if expected == actual else [f"{path}: {expected!r} != {actual!r}"]
+
+    if isinstance(expected, (int, float)) and isinstance(actual, (int, float)):
+        if math.isclose(expected, actual, rel_tol=rel_tol, abs_tol=abs_tol):
+            return []
+        return [f"{path}: {expected!r} != {actual!r}"]
+
+    if isinstance(expected, dict) and isinstance(actual, dict):
+        differences = []
+        for key in sorted(set(expected) | set(actual)):
+            if key not in actual:
+                differences.append(f"{path}.{key}: missing")
+            elif key not in expected:
+                differences.append(f"{path}.{key}: unexpected")
+            else:
+                differences += diff(expected[key], actual[key], rel_tol, abs_tol, f"{path}.{key}")
+        return differences
+
+    if isinstance(expected, list) and isinstance(actual, list):
+        if len(expected) != len(actual):
+            return [f"{path}: length {len(expected)} != {len(actual)}"]
+        differences = []
+        for i, (e, a) in enumerate(zip(expected, actual)):
+            differences += diff(e, a, rel_tol, abs_tol, f"{path}[{i}]")
+        return differences
+
+    return [] if expected == actual else [f"{path}: {expected!r} != {actual!r}"]
+
+
+def main(argv: List[str] = None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--update", action="store_true", help="Rewrite golden files from the current output")
+    parser.add_argument("--generate-fixtures", action="store_true", help="Regenerate detection fixtures")
+    parser.add_argument("--rel-tol", type=float, default=1e-6)
+    parser.add_argument("--abs-tol", type=float, default=1e-9)
+    parser.add_argument("--repeat", type=int, default=5, help="Runs per fixture for timing (median is kept)")
+    parser.add_argument("--max-diffs", type=int, default=10, help="Differences shown per fixture")
+    args = parser.parse_args(argv)
+
+    if args.generate_fixtures:
+        generate_fixtures()
+
+    fixture_paths = sorted(FIXTURES_DIR.glob("*.detections.json"))
+    if not fixture_paths:
+        print("no fixtures found; run with --generate-fixtures", file=sys.stderr)
+        return 1
+
+    GOLDEN_DIR.mkdir(parents=True, exist_ok=True)
+    drifted = 0
+    print(f"{'fixture':<24} {'status':<8} {'golden':>9} {'current':>9} {'speedup':>8}")
+    for fixture_path in fixture_paths:
+        name = fixture_path.name[:-len(".detections.json")]
+        with open(fixture_path, "r") as f:
+            fixture = json.load(f)
+        run = run_fixture(fixture, args.repeat)
+
+        golden_path = GOLDEN_DIR / f"{name}.golden.json"
+        if args.update or not golden_path.exists():
+            with open(golden_path, "w") as f:
+                json.dump(run, f, indent=2)
+            print(f"{name:<24} {'written':<8} {'':>9} {run['wallSeconds']:>9.4f}")
+            continue
+
+        with open(golden_path, "r") as f:
+            golden = json.load(f)
+
+        differences = diff(golden["output"], run["output"], args.rel_tol, args.abs_tol)
+        speedup = golden["wallSeconds"] / run["wallSeconds"] if run["wallSeconds"] > 0 else float("inf")
+        status = "DRIFT" if differences else "ok"
+        print(f"{name:<24} {status:<8} {golden['wallSeconds']:>9.4f} {run['wallSeconds']:>9.4f} {speedup:>7.2f}x")
+
+        if differences:
+            drifted += 1
+            for line in differences[:args.max_diffs]:
+                print(f"    {line}")
+            if len(differences) > args.max_diffs:
+                print(f"    ... {len(differences) - args.max_diffs} more")
+
+    return 1 if drifted else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,216 @@
+"""
+Load test: job status polling while a large video is uploaded.
+
+    python -m benchmarks.load_test                                # in-process, multipart upload
+    python -m benchmarks.load_test --upload chunked --pollers 50
+    python -m benchmarks.load_test --url http://localhost:8000    # a running server
+
+Pollers GET /api/jobs/{id} for a synthetic job --rate times a second each,
+first with the server idle and then while one client uploads --upload-mb of
+data. Latency is measured from when each poll was due, not when it was
+sent, so a stalled event loop counts in full. Work that blocks the loop
+shows up as a p99 and max that grow with the upload size.
+
+In-process runs drive the ASGI app on this script's own event loop
+(httpx's ASGITransport, no uvicorn needed), so pollers stall exactly when a
+handler blocks the loop; the client shares the process, so absolute numbers
+are pessimistic. A --url server must share this checkout's data
+directory, where the synthetic job is created. The upload is an MP4 header
+followed by zeros: it passes the container check but fails the probe, so no
+job is queued. Requires httpx.
+"""
+import argparse
+import asyncio
+import hashlib
+import io
+import json
+import math
+import random
+import shutil
+import sys
+import time
+import uuid
+from pathlib import Path
+from typing import Dict, List, Any, Optional, Tuple
+
+import httpx
+import numpy as np
+
+from app.config import UPLOAD_CHUNK_SIZE
+from app.routes.jobs import JOBS_DIR
+from app.services.json_codec import write_json
+from app.services.storage import blob_path
+from app.services.uploads import delete_upload
+
+# An ftyp box with an 'isom' brand, enough to pass the upload's container check
+MP4_HEADER = b"\x00\x00\x00\x18ftypisom\x00\x00\x02\x00isomiso2"
+# Request bodies are sent in pieces of this size, as a server would receive them
+BODY_PIECE_SIZE = 64 * 1024
+
+
+def make_payload(size_mb: int) -> bytes:
+    size = size_mb * 1024 * 1024
+    return MP4_HEADER + bytes(size - len(MP4_HEADER))
+
+
+def create_job() -> str:
+    """A finished job for the pollers to query."""
+    job_id = f"loadtest-{uuid.uuid4()}"
+    job_dir = JOBS_DIR / job_id
+    job_dir.mkdir(parents=True)
+    write_json(job_dir / "meta.json", {"jobId": job_id, "status": "completed", "progress": 1.0}, indent=True)
+    return job_id
+
+
+async def poll(
+    client: httpx.AsyncClient,
+    job_id: str,
+    interval: float,
+    schedule: Dict[str, float],
+    samples: List[Tuple[float, float]]
+) -> None:
+    """Poll on a fixed schedule until schedule['end'], recording (due, latency)."""
+    # Stagger the pollers across the first interval
+    due = time.perf_counter() + random.uniform(0, interval)
+    while True:
+        await asyncio.sleep(max(0.0, due - time.perf_counter()))
+        # Polls that fell due while the loop was stalled are still sent, late
+        if due >= schedule["end"]:
+            return
+        response = await client.get(f"/api/jobs/{job_id}")
+        samples.append((due, time.perf_counter() - due))
+        response.raise_for_status()
+        due += interval
+
+
+async def body_pieces(data: bytes):
+    for offset in range(0, len(data), BODY_PIECE_SIZE):
+        yield data[offset:offset + BODY_PIECE_SIZE]
+
+
+async def upload_multipart(client: httpx.AsyncClient, payload: bytes) -> int:
+    # A file object is streamed in pieces; bytes would be sent in one
+    files = {"file": ("loadtest.mp4", io.BytesIO(payload), "video/mp4")}
+    response = await client.post("/api/videos", files=files)
+    return response.status_code
+
+
+async def upload_chunked(client: httpx.AsyncClient, payload: bytes, in_process: bool) -> int:
+    response = await client.post("/api/uploads", json={"filename": "loadtest.mp4", "size": len(payload)})
+    response.raise_for_status()
+    upload_id = response.json()["uploadId"]
+    try:
+        for offset in range(0, len(payload), UPLOAD_CHUNK_SIZE):
+            response = await client.put(
+                f"/api/uploads/{upload_id}",
+                params={"offset": offset},
+                content=body_pieces(payload[offset:offset + UPLOAD_CHUNK_SIZE])
+            )
+            response.raise_for_status()
+    finally:
+        if in_process:
+            delete_upload(upload_id)
+    return response.status_code
+
+
+def summarize(samples: List[Tuple[float, float]], start: float, end: float) -> Dict[str, Any]:
+    """Latency percentiles of the polls due in [start, end)."""
+    ms = np.array([latency for due, latency in samples if start <= due < end]) * 1000
+    return {
+        "requests": len(ms),
+        "seconds": end - start,
+        "latencyMs": {
+            name: float(np.percentile(ms, q)) if len(ms) else None
+            for name, q in (("p50", 50), ("p90", 90), ("p99", 99), ("max", 100))
+        }
+    }
+
+
+async def run(args: argparse.Namespace) -> Dict[str, Any]:
+    in_process = args.url is None
+    if in_process:
+        from app.main import app
+        client = httpx.AsyncClient(transport=httpx.ASGITransport(app=app), base_url="http://loadtest", timeout=None)
+    else:
+        client = httpx.AsyncClient(base_url=args.url, timeout=None)
+
+    payload = make_payload(args.upload_mb)
+    job_id = create_job()
+    schedule = {"end": math.inf}
+    samples: List[Tuple[float, float]] = []
+    try:
+        async with client:
+            pollers = [
+                asyncio.create_task(poll(client, job_id, 1.0 / args.rate, schedule, samples))
+                for _ in range(args.pollers)
+            ]
+            idle_start = time.perf_counter()
+            await asyncio.sleep(args.idle_seconds)
+
+            upload_start = time.perf_counter()
+            if args.upload == "multipart":
+                upload_status = await upload_multipart(client, payload)
+            else:
+                upload_status = await upload_chunked(client, payload, in_process)
+            upload_end = time.perf_counter()
+
+            schedule["end"] = upload_end
+            await asyncio.gather(*pollers)
+    finally:
+        shutil.rmtree(JOBS_DIR / job_id, ignore_errors=True)
+        # The rejected multipart upload leaves its input in the blob store
+        blob = blob_path(hashlib.sha256(payload).hexdigest())
+        if in_process and blob.exists() and blob.stat().st_nlink == 1:
+            blob.unlink()
+
+    during_upload = summarize(samples, upload_start, upload_end)
+    during_upload["uploadStatus"] = upload_status
+    return {
+        "target": args.url or "in-process",
+        "upload": args.upload,
+        "uploadMb": args.upload_mb,
+        "pollers": args.pollers,
+        "rate": args.rate,
+        "idle": summarize(samples, idle_start, upload_start),
+        "duringUpload": during_upload
+    }
+
+
+def _fmt(value: Optional[float]) -> str:
+    return "-" if value is None else f"{value:.1f}"
+
+
+def main(argv: List[str] = None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--url", help="Base URL of a running server (default: the app in-process)")
+    parser.add_argument("--upload", choices=["multipart", "chunked"], default="multipart")
+    parser.add_argument("--upload-mb", type=int, default=200)
+    parser.add_argument("--pollers", type=int, default=20, help="Concurrent status pollers")
+    parser.add_argument("--rate", type=float, default=10.0, help="Polls per second per poller")
+    parser.add_argument("--idle-seconds", type=float, default=2.0, help="Length of the idle baseline phase")
+    parser.add_argument("--output", type=Path, help="Write the results as JSON")
+    args = parser.parse_args(argv)
+
+    report = asyncio.run(run(args))
+
+    print(f"{'phase':<14} {'requests':>9} {'p50 ms':>8} {'p90 ms':>8} {'p99 ms':>8} {'max ms':>8}")
+    for phase in ("idle", "duringUpload"):
+        result = report[phase]
+        latency = result["latencyMs"]
+        print(
+            f"{phase:<14} {result['requests']:>9} {_fmt(latency['p50']):>8} {_fmt(latency['p90']):>8} "
+            f"{_fmt(latency['p99']):>8} {_fmt(latency['max']):>8}"
+        )
+    print(f"upload: HTTP {report['duringUpload']['uploadStatus']} in {report['duringUpload']['seconds']:.2f}s", file=sys.stderr)
+
+    if args.output:
+        args.output.parent.mkdir(parents=True, exist_ok=True)
+        with open(args.output, "w") as f:
+            json.dump(report, f, indent=2)
+        print(f"wrote {args.output}", file=sys.stderr)
+
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,223 @@
+"""
+Benchmark the analysis pipeline on synthetic inputs.
+
+Runs offline on a CPU-only machine. Clips are rendered locally and cached,
+and a stub detector stands in for YOLO when the model weights are absent.
+
+    python -m benchmarks.run                        # default matrix
+    python -m benchmarks.run --quick                # small matrix for a smoke run
+    python -m benchmarks.run --output new.json --baseline benchmarks/baseline.json
+    python -m benchmarks.run --two-pass             # also time preview-then-refine
+    python -m benchmarks.run --inference-processes 4   # detect in worker processes
+
+Each case records per-stage wall time (the minimum over --repeat runs) and
+the pipeline counters. With --two-pass, each clip is also analysed with a
+preview pass; its "preview" stage is the time to first (provisional)
+results. With --baseline, stages that got slower by more than
+--tolerance are reported, and --fail-on-regression turns that into a
+non-zero exit code for CI. With --inference-processes, full-quality
+detection runs in that many worker processes fed through shared memory;
+its "inference" stage then sums the workers' time, so compare the
+"detection" stage and totalWallSeconds.
+"""
+import argparse
+import json
+import os
+import platform
+import sys
+import tempfile
+from contextlib import nullcontext
+from pathlib import Path
+from typing import Dict, List, Any, Optional
+
+import numpy as np
+
+from app.config import YOLO_MODEL, FRAME_PROCESSING_INTERVAL
+from app.services.pipeline import analyze_video, analyze_detections
+from app.services.inference_pool import InferencePool
+from app.services.profiling import JobProfiler
+from benchmarks.synthetic import generate_clip, generate_detections, stub_detector, stub_detect_persons
+
+BENCHMARKS_DIR = Path(__file__).parent
+CACHE_DIR = BENCHMARKS_DIR / ".cache"
+
+# Stages faster than this are dominated by timer noise and never flagged
+NOISE_FLOOR_SECONDS = 0.005
+
+
+def parse_resolution(value: str) -> tuple:
+    width, height = value.lower().split("x")
+    return int(width), int(height)
+
+
+def detector_context(choice: str):
+    """Pick the detector: the real model when its weights exist, else the stub."""
+    if choice == "auto":
+        choice = "yolo" if Path(YOLO_MODEL).exists() else "stub"
+    if choice == "stub":
+        return "stub", stub_detector()
+    return "yolo", nullcontext()
+
+
+def best_of(reports: List[Dict[str, Any]]) -> Dict[str, Any]:
+    """Collapse repeated runs: minimum wall time per stage, counters from the first run."""
+    stages = {}
+    for name in reports[0]["stages"]:
+        stages[name] = min(r["stages"][name]["wallSeconds"] for r in reports if name in r["stages"])
+    return {
+        "stages": stages,
+        "totalWallSeconds": min(r["totalWallSeconds"] for r in reports),
+        "counters": reports[0]["counters"],
+        "peakRssBytes": max(r["peakRssBytes"] or 0 for r in reports)
+    }
+
+
+def run_pipeline_case(
+    duration: float,
+    resolution: tuple,
+    crowd: int,
+    repeat: int,
+    preview: bool = False,
+    inference_pool: Optional[InferencePool] = None
+) -> Dict[str, Any]:
+    """Time analyze_video end to end on a synthetic clip."""
+    width, height = resolution
+    clip = generate_clip(CACHE_DIR / f"clip-{duration:g}s-{width}x{height}-crowd{crowd}.mp4", duration, width, height, crowd)
+
+    reports = []
+    for _ in range(repeat):
+        with tempfile.TemporaryDirectory() as output_dir:
+            profiler = JobProfiler()
+            analyze_video(clip, Path(output_dir), profiler=profiler, preview=preview, inference_pool=inference_pool)
+            reports.append(profiler.report())
+    return best_of(reports)
+
+
+def run_analysis_case(duration: float, resolution: tuple, crowd: int, repeat: int) -> Dict[str, Any]:
+    """Time the post-detection stages on a synthetic detection stream."""
+    width, height = resolution
+    fps = 30.0
+    frame_detections = generate_detections(duration, width, height, crowd, fps=fps, interval=FRAME_PROCESSING_INTERVAL)
+    metadata = {"fps": fps, "width": width, "height": height}
+
+    reports = []
+    for _ in range(repeat):
+        profiler = JobProfiler()
+        analyze_detections(frame_detections, metadata, profiler=profiler)
+        reports.append(profiler.report())
+    return best_of(reports)
+
+
+def compare(results: Dict[str, Any], baseline: Dict[str, Any], tolerance: float) -> List[str]:
+    """Print a comparison table; return descriptions of regressions."""
+    baseline_cases = {case["name"]: case for case in baseline["cases"]}
+    regressions = []
+
+    print(f"\n{'case':<42} {'stage':<16} {'baseline':>10} {'current':>10} {'ratio':>7}")
+    for case in results["cases"]:
+        base = baseline_cases.get(case["name"])
+        if base is None:
+            continue
+        rows = [("total", base["totalWallSeconds"], case["totalWallSeconds"])]
+        rows += [
+            (stage, base["stages"][stage], seconds)
+            for stage, seconds in case["stages"].items()
+            if stage in base["stages"]
+        ]
+        for stage, before, after in rows:
+            ratio = after / before if before > 0 else float("inf")
+            flag = ""
+            if before >= NOISE_FLOOR_SECONDS and ratio > 1 + tolerance:
+                flag = "  REGRESSION"
+                regressions.append(f"{case['name']} {stage}: {before:.4f}s -> {after:.4f}s")
+            print(f"{case['name']:<42} {stage:<16} {before:>10.4f} {after:>10.4f} {ratio:>7.2f}{flag}")
+
+    return regressions
+
+
+def main(argv: List[str] = None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--lengths", default="10,30", help="Clip lengths in seconds for full-pipeline cases")
+    parser.add_argument("--resolutions", default="640x360,1280x720", help="Clip resolutions, e.g. 640x360,1920x1080")
+    parser.add_argument("--crowds", default="1,5", help="Surfers in frame")
+    parser.add_argument("--analysis-lengths", default="60,600", help="Detection-stream lengths in seconds for post-detection cases")
+    parser.add_argument("--repeat", type=int, default=3, help="Runs per case; the fastest is kept")
+    parser.add_argument("--detector", choices=["auto", "stub", "yolo"], default="auto")
+    parser.add_argument("--two-pass", action="store_true", help="Also run pipeline cases with the preview pass")
+    parser.add_argument("--inference-processes", type=int, default=0, help="Detector worker processes (0 = in-process)")
+    parser.add_argument("--quick", action="store_true", help="Tiny matrix for smoke testing")
+    parser.add_argument("--output", type=Path, default=BENCHMARKS_DIR / "results" / "latest.json")
+    parser.add_argument("--baseline", type=Path, help="Earlier results file to compare against")
+    parser.add_argument("--tolerance", type=float, default=0.2, help="Allowed slowdown before flagging (0.2 = 20%%)")
+    parser.add_argument("--fail-on-regression", action="store_true")
+    args = parser.parse_args(argv)
+
+    if args.quick:
+        args.lengths, args.resolutions, args.crowds, args.analysis_lengths, args.repeat = "5", "640x360", "1,3", "60", 1
+
+    lengths = [float(v) for v in args.lengths.split(",") if v]
+    resolutions = [parse_resolution(v) for v in args.resolutions.split(",") if v]
+    crowds = [int(v) for v in args.crowds.split(",") if v]
+    analysis_lengths = [float(v) for v in args.analysis_lengths.split(",") if v]
+
+    detector_name, detector = detector_context(args.detector)
+    inference_pool = None
+    if args.inference_processes > 1:
+        # Workers are separate processes; the stub has to be handed to them
+        worker_detector = stub_detect_persons if detector_name == "stub" else None
+        inference_pool = InferencePool(args.inference_processes, detector=worker_detector)
+    cases = []
+    with detector:
+        for duration in lengths:
+            for resolution in resolutions:
+                for crowd in crowds:
+                    for preview in ([False, True] if args.two_pass else [False]):
+                        name = f"pipeline-{duration:g}s-{resolution[0]}x{resolution[1]}-crowd{crowd}"
+                        name += "-two-pass" if preview else ""
+                        print(f"running {name}", file=sys.stderr)
+                        result = run_pipeline_case(duration, resolution, crowd, args.repeat, preview, inference_pool)
+                        cases.append({"name": name, "kind": "pipeline", **result})
+
+        for duration in analysis_lengths:
+            for crowd in crowds:
+                name = f"analysis-{duration:g}s-crowd{crowd}"
+                print(f"running {name}", file=sys.stderr)
+                result = run_analysis_case(duration, resolutions[0], crowd, args.repeat)
+                cases.append({"name": name, "kind": "analysis", **result})
+    if inference_pool is not None:
+        inference_pool.close()
+
+    results = {
+        "environment": {
+            "python": platform.python_version(),
+            "numpy": np.__version__,
+            "platform": platform.platform(),
+            "cpuCount": os.cpu_count(),
+            "detector": detector_name,
+            "inferenceProcesses": args.inference_processes,
+            "model": YOLO_MODEL if detector_name == "yolo" else None
+        },
+        "cases": cases
+    }
+
+    args.output.parent.mkdir(parents=True, exist_ok=True)
+    with open(args.output, "w") as f:
+        json.dump(results, f, indent=2)
+    print(f"wrote {args.output}", file=sys.stderr)
+
+    if args.baseline:
+        with open(args.baseline, "r") as f:
+            baseline = json.load(f)
+        if baseline["environment"].get("detector") != detector_name:
+            print("warning: baseline was recorded with a different detector", file=sys.stderr)
+        regressions = compare(results, baseline, args.tolerance)
+        if regressions:
+            print(f"\n{len(regressions)} stage(s) slower than baseline by more than {args.tolerance:.0%}")
+            if args.fail_on_regression:
+                return 1
+
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
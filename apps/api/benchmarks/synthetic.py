@@ -0,0 +1,193 @@
+"""
+Synthetic clips and detection streams for offline benchmarking.
+
+Surfers are drawn as coloured rectangles on a noisy sea background. The
+primary surfer carves a sinusoidal line, pops up early in the clip, and
+is the largest figure. The rest of the crowd paddles slowly. Everything is
+seeded, so the same parameters always give the same clip.
+"""
+import shutil
+import subprocess
+from contextlib import contextmanager
+from pathlib import Path
+from typing import List, Dict, Tuple
+import cv2
+import numpy as np
+
+from app.services import detection
+
+POPUP_RAMP_SECONDS = 0.4
+POPUP_DROP = 0.15  # fraction of frame height the board drops during the pop-up
+
+
+def surfer_boxes(
+    frame_number: int,
+    fps: float,
+    duration: float,
+    width: int,
+    height: int,
+    crowd: int,
+    seed: int = 0
+) -> List[Tuple[float, float, float, float]]:
+    """Ground-truth boxes (x1, y1, x2, y2) for every surfer in a frame; primary first."""
+    t = frame_number / fps
+    rng = np.random.default_rng(seed)
+    scale = height / 360.0
+
+    # Primary surfer: prone until the pop-up, then standing and carving. The
+    # pop-up is a short ramp (box grows, board drops down the face) so IoU
+    # tracking can follow it.
+    popup_time = min(2.0, duration * 0.2)
+    stand = float(np.clip((t - popup_time) / POPUP_RAMP_SECONDS, 0.0, 1.0))
+    box_w = 18 * scale
+    box_h = (14 + 26 * stand) * scale
+    cx = width * (0.15 + 0.7 * (t / max(duration, 1e-6)))
+    carve = 0.1 * np.sin(2 * np.pi * max(0.0, t - popup_time - POPUP_RAMP_SECONDS) / 4.0)
+    cy = height * (0.45 + POPUP_DROP * stand + carve)
+    boxes = [(cx - box_w / 2, cy - box_h, cx + box_w / 2, cy)]
+
+    # Crowd: small paddlers drifting in the line-up
+    for _ in range(crowd - 1):
+        x0, y0 = rng.uniform(0.05, 0.9) * width, rng.uniform(0.2, 0.45) * height
+        vx = rng.uniform(-8, 8) * scale
+        x = (x0 + vx * t) % (width * 0.95)
+        w, h = 12 * scale, 8 * scale
+        boxes.append((x, y0, x + w, y0 + h))
+
+    return boxes
+
+
+def render_frame(
+    frame_number: int,
+    boxes: List[Tuple[float, float, float, float]],
+    width: int,
+    height: int,
+    noise: np.ndarray
+) -> np.ndarray:
+    """Draw one frame: dark sea with texture, bright rectangles for surfers."""
+    frame = np.empty((height, width, 3), dtype=np.uint8)
+    frame[:] = (90, 60, 20)
+    shift = (frame_number * 3) % noise.shape[1]
+    frame[:, :, 0] = np.clip(90 + np.roll(noise, shift, axis=1)[:height, :width], 0, 255)
+
+    for i, (x1, y1, x2, y2) in enumerate(boxes):
+        colour = (40, 200, 250) if i == 0 else (220, 220, 220)
+        cv2.rectangle(frame, (int(x1), int(y1)), (int(x2), int(y2)), colour, -1)
+    return frame
+
+
+def generate_clip(
+    path: Path,
+    duration: float,
+    width: int,
+    height: int,
+    crowd: int,
+    fps: float = 30.0,
+    seed: int = 0
+) -> Path:
+    """
+    Render a synthetic clip to path (cached: an existing file is reused).
+
+    Encodes H.264 with ffmpeg when it is installed, falling back to
+    OpenCV's mp4v writer otherwise.
+    """
+    if path.exists():
+        return path
+    path.parent.mkdir(parents=True, exist_ok=True)
+
+    rng = np.random.default_rng(seed)
+    noise = rng.integers(-12, 12, size=(height, width), dtype=np.int16)
+    frame_count = int(round(duration * fps))
+
+    tmp_path = path.with_name(f".{path.name}")
+    ffmpeg = shutil.which("ffmpeg")
+    if ffmpeg:
+        proc = subprocess.Popen(
+            [
+                ffmpeg, "-loglevel", "error",
+                "-f", "rawvideo", "-pix_fmt", "bgr24",
+                "-s", f"{width}x{height}", "-r", str(fps),
+                "-i", "-",
+                "-c:v", "libx264", "-preset", "ultrafast", "-pix_fmt", "yuv420p",
+                "-f", "mp4", "-y", str(tmp_path)
+            ],
+            stdin=subprocess.PIPE
+        )
+        for n in range(frame_count):
+            boxes = surfer_boxes(n, fps, duration, width, height, crowd, seed)
+            proc.stdin.write(render_frame(n, boxes, width, height, noise).tobytes())
+        proc.stdin.close()
+        if proc.wait() != 0:
+            raise RuntimeError("ffmpeg failed to encode the synthetic clip")
+    else:
+        writer = cv2.VideoWriter(str(tmp_path), cv2.VideoWriter_fourcc(*"mp4v"), fps, (width, height))
+        for n in range(frame_count):
+            boxes = surfer_boxes(n, fps, duration, width, height, crowd, seed)
+            writer.write(render_frame(n, boxes, width, height, noise))
+        writer.release()
+
+    tmp_path.replace(path)
+    return path
+
+
+def generate_detections(
+    duration: float,
+    width: int,
+    height: int,
+    crowd: int,
+    fps: float = 30.0,
+    interval: int = 3,
+    jitter: float = 1.5,
+    miss_rate: float = 0.05,
+    confidence: Tuple[float, float] = (0.8, 0.99),
+    seed: int = 0
+) -> List[Dict]:
+    """
+    Synthetic detection stream in the process_video_detections format.
+
+    Boxes follow the same motion as generate_clip, with positional jitter,
+    randomly missed detections and confidences drawn from `confidence`.
+    """
+    rng = np.random.default_rng(seed + 1)
+    frame_detections = []
+    for n in range(0, int(round(duration * fps)), interval):
+        detections = []
+        for x1, y1, x2, y2 in surfer_boxes(n, fps, duration, width, height, crowd, seed):
+            if rng.random() < miss_rate:
+                continue
+            dx1, dy1, dx2, dy2 = rng.normal(0, jitter, 4)
+            detections.append({
+                "bbox": [float(x1 + dx1), float(y1 + dy1), float(x2 + dx2), float(y2 + dy2)],
+                "confidence": float(rng.uniform(*confidence))
+            })
+        frame_detections.append({"frame": n, "detections": detections})
+    return frame_detections
+
+
+def stub_detect_persons(frame: np.ndarray) -> List[Tuple[float, float, float, float, float]]:
+    """
+    Detector stand-in for synthetic clips: bright blobs are surfers.
+
+    Costs a threshold and a connected-components pass per frame, so
+    benchmarks exercise the decode loop without YOLO weights.
+    """
+    gray = cv2.cvtColor(frame, cv2.COLOR_BGR2GRAY)
+    _, mask = cv2.threshold(gray, 150, 255, cv2.THRESH_BINARY)
+    count, _, stats, _ = cv2.connectedComponentsWithStats(mask)
+    detections = []
+    for x, y, w, h, area in stats[1:count]:
+        if area >= 20:
+            detections.append((float(x), float(y), float(x + w), float(y + h), 0.9))
+    return detections
+
+
+@contextmanager
+def stub_detector():
+    """Route detection (both passes) through stub_detect_persons for the duration of the block."""
+    previous = detection.set_detector(stub_detect_persons)
+    previous_preview = detection.set_detector(stub_detect_persons, preview=True)
+    try:
+        yield
+    finally:
+        detection.set_detector(previous)
+        detection.set_detector(previous_preview, preview=True)
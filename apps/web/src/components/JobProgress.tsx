@@ -18,7 +18,8 @@ export function JobProgress({ jobId }: JobProgressProps) {
     },
     refetchInterval: (query) => {
       const data = query.state.data
-      if (data?.status === 'completed') {
+      // Preview results are worth showing while the refine pass runs
+      if (data?.status === 'completed' || data?.provisional) {
         navigate({ to: '/jobs/$jobId/results', params: { jobId } })
         return false
       }
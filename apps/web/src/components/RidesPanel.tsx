@@ -0,0 +1,49 @@
+interface Ride {
+  rideId: number
+  start: number
+  end: number
+  metrics: {
+    turnCount?: number
+  }
+}
+
+interface RidesPanelProps {
+  rides: Ride[]
+  selectedRideId: number | null
+  onSelect: (ride: Ride | null) => void
+}
+
+export function RidesPanel({ rides, selectedRideId, onSelect }: RidesPanelProps) {
+  const itemClass = (selected: boolean) =>
+    `w-full flex justify-between items-center px-4 py-2 rounded border text-left ${
+      selected ? 'border-blue-500 bg-blue-50' : 'border-gray-200 hover:bg-gray-50'
+    }`
+
+  return (
+    <div className="bg-white rounded-lg shadow p-6">
+      <h3 className="text-lg font-semibold text-gray-900 mb-4">Rides</h3>
+      <div className="space-y-2">
+        <button
+          className={itemClass(selectedRideId === null)}
+          onClick={() => onSelect(null)}
+        >
+          <span className="font-medium text-gray-900">Whole clip</span>
+        </button>
+        {rides.map((ride) => (
+          <button
+            key={ride.rideId}
+            className={itemClass(selectedRideId === ride.rideId)}
+            onClick={() => onSelect(ride)}
+          >
+            <span className="font-medium text-gray-900">Ride {ride.rideId}</span>
+            <span className="text-sm text-gray-500">
+              {ride.start.toFixed(1)}s – {ride.end.toFixed(1)}s
+              {ride.metrics.turnCount !== undefined &&
+                ` · ${ride.metrics.turnCount} turns`}
+            </span>
+          </button>
+        ))}
+      </div>
+    </div>
+  )
+}
@@ -0,0 +1,47 @@
+interface Surfer {
+  trackId: number
+  primary: boolean
+  start: number
+  end: number
+  metrics: {
+    turnCount?: number
+  }
+}
+
+interface SurfersPanelProps {
+  surfers: Surfer[]
+  selectedTrackId: number | null
+  onSelect: (surfer: Surfer) => void
+}
+
+export function SurfersPanel({ surfers, selectedTrackId, onSelect }: SurfersPanelProps) {
+  const itemClass = (selected: boolean) =>
+    `w-full flex justify-between items-center px-4 py-2 rounded border text-left ${
+      selected ? 'border-blue-500 bg-blue-50' : 'border-gray-200 hover:bg-gray-50'
+    }`
+
+  return (
+    <div className="bg-white rounded-lg shadow p-6">
+      <h3 className="text-lg font-semibold text-gray-900 mb-4">Surfers</h3>
+      <div className="space-y-2">
+        {surfers.map((surfer, index) => (
+          <button
+            key={surfer.trackId}
+            className={itemClass(selectedTrackId === surfer.trackId)}
+            onClick={() => onSelect(surfer)}
+          >
+            <span className="font-medium text-gray-900">
+              Surfer {index + 1}
+              {surfer.primary && ' (main)'}
+            </span>
+            <span className="text-sm text-gray-500">
+              {surfer.start.toFixed(1)}s – {surfer.end.toFixed(1)}s
+              {surfer.metrics.turnCount !== undefined &&
+                ` · ${surfer.metrics.turnCount} turns`}
+            </span>
+          </button>
+        ))}
+      </div>
+    </div>
+  )
+}
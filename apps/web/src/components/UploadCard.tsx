@@ -4,9 +4,99 @@ interface UploadCardProps {
   onUploadSuccess: (jobId: string) => void
 }
 
+interface UploadSession {
+  uploadId: string
+  size: number
+  offset: number
+  chunkSize: number
+}
+
+// Consecutive network failures tolerated before giving up on an upload
+const MAX_CHUNK_RETRIES = 8
+
+class UploadError extends Error {}
+
+async function readError(response: Response): Promise<UploadError> {
+  const errorData = await response.json().catch(() => ({}))
+  return new UploadError(errorData.detail || 'Upload failed')
+}
+
+async function fetchSession(uploadId: string): Promise<UploadSession | null> {
+  const response = await fetch(`/api/uploads/${uploadId}`)
+  return response.ok ? response.json() : null
+}
+
+/**
+ * Upload a file in chunks, resuming after dropped connections (and page
+ * reloads: the upload id is kept in localStorage per file).
+ */
+async function uploadResumable(
+  file: File,
+  onProgress: (fraction: number) => void
+): Promise<string> {
+  const storageKey = `upload:${file.name}:${file.size}:${file.lastModified}`
+  const savedId = localStorage.getItem(storageKey)
+  let session = savedId ? await fetchSession(savedId) : null
+
+  if (!session) {
+    const response = await fetch('/api/uploads', {
+      method: 'POST',
+      headers: { 'Content-Type': 'application/json' },
+      body: JSON.stringify({ filename: file.name, size: file.size }),
+    })
+    if (!response.ok) throw await readError(response)
+    session = (await response.json()) as UploadSession
+    localStorage.setItem(storageKey, session.uploadId)
+  }
+
+  const { uploadId, chunkSize } = session
+  let offset = session.offset
+  let failures = 0
+  onProgress(offset / file.size)
+
+  while (offset < file.size) {
+    try {
+      const response = await fetch(`/api/uploads/${uploadId}?offset=${offset}`, {
+        method: 'PUT',
+        headers: { 'Content-Type': 'application/octet-stream' },
+        body: file.slice(offset, Math.min(offset + chunkSize, file.size)),
+      })
+      if (response.status === 409) {
+        // Out of sync (e.g. an earlier attempt landed after all): ask where to continue
+        const current = await fetchSession(uploadId)
+        if (!current) throw new UploadError('Upload expired. Please try again.')
+        offset = current.offset
+      } else if (!response.ok) {
+        throw await readError(response)
+      } else {
+        offset = ((await response.json()) as UploadSession).offset
+        failures = 0
+      }
+    } catch (err) {
+      if (err instanceof UploadError || ++failures > MAX_CHUNK_RETRIES) {
+        throw err
+      }
+      // Network error: back off, then resume from what the server has
+      await new Promise((resolve) => setTimeout(resolve, Math.min(1000 * 2 ** failures, 30000)))
+      const current = await fetchSession(uploadId).catch(() => null)
+      if (current) offset = current.offset
+    }
+    onProgress(offset / file.size)
+  }
+
+  const response = await fetch(`/api/uploads/${uploadId}/finalize`, { method: 'POST' })
+  if (!response.ok) {
+    if (response.status !== 409) localStorage.removeItem(storageKey)
+    throw await readError(response)
+  }
+  localStorage.removeItem(storageKey)
+  return (await response.json()).jobId
+}
+
 export function UploadCard({ onUploadSuccess }: UploadCardProps) {
   const [isDragging, setIsDragging] = useState(false)
   const [isUploading, setIsUploading] = useState(false)
+  const [progress, setProgress] = useState(0)
   const [error, setError] = useState<string | null>(null)
 
   const handleFile = useCallback(
@@ -26,24 +116,12 @@ export function UploadCard({ onUploadSuccess }: UploadCardProps) {
       }
 
       setIsUploading(true)
+      setProgress(0)
       setError(null)
 
       try {
-        const formData = new FormData()
-        formData.append('file', file)
-
-        const response = await fetch('/api/videos', {
-          method: 'POST',
-          body: formData,
-        })
-
-        if (!response.ok) {
-          const errorData = await response.json()
-          throw new Error(errorData.detail || 'Upload failed')
-        }
-
-        const data = await response.json()
-        onUploadSuccess(data.jobId)
+        const jobId = await uploadResumable(file, setProgress)
+        onUploadSuccess(jobId)
       } catch (err) {
         setError(err instanceof Error ? err.message : 'Upload failed')
         setIsUploading(false)
@@ -103,7 +181,9 @@ export function UploadCard({ onUploadSuccess }: UploadCardProps) {
         {isUploading ? (
           <div>
             <div className="animate-spin rounded-full h-12 w-12 border-b-2 border-blue-600 mx-auto mb-4"></div>
-            <p className="text-gray-600">Uploading video...</p>
+            <p className="text-gray-600">
+              Uploading video... {Math.floor(progress * 100)}%
+            </p>
           </div>
         ) : (
           <>
@@ -3,7 +3,10 @@ import { VideoPlayerWithCanvasOverlay } from '@/components/VideoPlayerWithCanvas
 import { Timeline } from '@/components/Timeline'
 import { MetricsPanel } from '@/components/MetricsPanel'
 import { TipsPanel } from '@/components/TipsPanel'
+import { RidesPanel } from '@/components/RidesPanel'
+import { SurfersPanel } from '@/components/SurfersPanel'
 import { useQuery } from '@tanstack/react-query'
+import { useState } from 'react'
 
 export const Route = createFileRoute('/jobs/$jobId/results')({
   component: ResultsPage,
@@ -11,6 +14,8 @@ export const Route = createFileRoute('/jobs/$jobId/results')({
 
 function ResultsPage() {
   const { jobId } = Route.useParams()
+  const [selectedRideId, setSelectedRideId] = useState<number | null>(null)
+  const [selectedTrackId, setSelectedTrackId] = useState<number | null>(null)
 
   const { data: results } = useQuery({
     queryKey: ['job-results', jobId],
@@ -19,12 +24,17 @@ function ResultsPage() {
       if (!res.ok) throw new Error('Failed to fetch results')
       return res.json()
     },
+    // Preview results are replaced once the refine pass finishes
+    refetchInterval: (query) => (query.state.data?.provisional ? 2000 : false),
   })
 
+  // Overlay the selected surfer, or the primary one
+  const trackId = selectedTrackId ?? results?.primaryTrackId
   const { data: tracks } = useQuery({
-    queryKey: ['job-tracks', jobId],
+    queryKey: ['job-tracks', jobId, results?.provisional, trackId],
     queryFn: async () => {
-      const res = await fetch(`/api/jobs/${jobId}/tracks`)
+      const query = trackId !== undefined ? `?trackId=${trackId}` : ''
+      const res = await fetch(`/api/jobs/${jobId}/tracks${query}`)
       if (!res.ok) throw new Error('Failed to fetch tracks')
       return res.json()
     },
@@ -37,6 +47,7 @@ function ResultsPage() {
       if (!res.ok) throw new Error('Failed to fetch job status')
       return res.json()
     },
+    refetchInterval: results?.provisional ? 2000 : false,
   })
 
   if (!results || !tracks) {
@@ -46,33 +57,77 @@ function ResultsPage() {
   // Get duration from metadata or default to 30 seconds
   const duration = 30 // Default, could be fetched from metadata endpoint
 
+  const seek = (timestamp: number) => {
+    const video = document.querySelector('video') as HTMLVideoElement
+    if (video) {
+      video.currentTime = timestamp
+    }
+  }
+
+  // Metrics and tips of the selected ride or surfer, or of the whole clip
+  const rides = results.rides ?? []
+  const surfers = results.surfers ?? []
+  const selectedRide = rides.find((ride: any) => ride.rideId === selectedRideId)
+  const selectedSurfer = surfers.find((surfer: any) => surfer.trackId === selectedTrackId)
+  const shown = selectedRide ?? selectedSurfer ?? results
+  const surferEvents = (selectedSurfer ?? results).events
+
   return (
     <div className="space-y-6">
       <h2 className="text-3xl font-bold text-gray-900">Analysis Results</h2>
 
+      {results.provisional && (
+        <div className="p-4 bg-blue-50 border border-blue-200 rounded-lg">
+          <p className="text-blue-800 text-sm">
+            Preview results. Refining around key moments
+            {jobStatus?.progress ? ` (${Math.round(jobStatus.progress * 100)}%)` : ''}...
+          </p>
+        </div>
+      )}
+
       <div className="bg-white rounded-lg shadow p-6">
         <VideoPlayerWithCanvasOverlay
           jobId={jobId}
           tracks={tracks.frames}
-          events={results.events}
+          events={surferEvents}
         />
       </div>
 
+      {rides.length > 0 && (
+        <RidesPanel
+          rides={rides}
+          selectedRideId={selectedRideId}
+          onSelect={(ride) => {
+            setSelectedRideId(ride ? ride.rideId : null)
+            // Ride results are the ride's primary surfer's
+            setSelectedTrackId(null)
+            if (ride) seek(ride.start)
+          }}
+        />
+      )}
+
+      {surfers.length > 1 && (
+        <SurfersPanel
+          surfers={surfers}
+          selectedTrackId={trackId ?? null}
+          onSelect={(surfer) => {
+            setSelectedTrackId(surfer.trackId)
+            setSelectedRideId(null)
+            seek(surfer.start)
+          }}
+        />
+      )}
+
       <div className="grid grid-cols-1 lg:grid-cols-2 gap-6">
-        <MetricsPanel metrics={results.metrics} />
-        <TipsPanel tips={results.tips} />
+        <MetricsPanel metrics={shown.metrics} />
+        <TipsPanel tips={shown.tips} />
       </div>
 
       <div className="bg-white rounded-lg shadow p-6">
         <Timeline
-          events={results.events}
+          events={surferEvents}
           duration={duration}
-          onSeek={(timestamp) => {
-            const video = document.querySelector('video') as HTMLVideoElement
-            if (video) {
-              video.currentTime = timestamp
-            }
-          }}
+          onSeek={seek}
         />
       </div>
     </div>
@@ -3,6 +3,8 @@ export interface JobStatus {
   status: 'pending' | 'processing' | 'completed' | 'failed'
   progress: number
   error?: string
+  evicted?: boolean // video and derived artifacts removed; results remain
+  provisional?: boolean // preview results are available while the refine pass runs
 }
 
 export interface Event {
@@ -19,6 +21,31 @@ export interface Tip {
   impact: 'high' | 'medium' | 'low'
 }
 
+export interface Ride {
+  rideId: number
+  start: number // seconds
+  end: number
+  startFrame: number
+  endFrame: number // exclusive
+  metrics: JobResults['metrics']
+  events: Event[]
+  tips: Tip[]
+  confidence?: number
+}
+
+export interface Surfer {
+  trackId: number
+  primary: boolean
+  start: number // seconds
+  end: number
+  startFrame: number
+  endFrame: number // exclusive
+  metrics: JobResults['metrics']
+  events: Event[]
+  tips: Tip[]
+  confidence?: number
+}
+
 export interface JobResults {
   metrics: {
     popUpTime?: number
@@ -29,6 +56,12 @@ export interface JobResults {
   }
   events: Event[]
   tips: Tip[]
+  confidence?: number // overall analysis confidence the tips were scored at
+  rulesVersion?: string // coaching rules the tips come from
+  provisional?: boolean // from the preview pass; replaced when refinement finishes
+  rides?: Ride[] // per-ride results when the clip was segmented into rides
+  primaryTrackId?: number
+  surfers?: Surfer[] // per-track results; the primary's match the top level
 }
 
 export interface TrackFrame {
@@ -36,9 +69,91 @@ export interface TrackFrame {
   bbox: number[]
   centroid: number[]
   trackId: number
+  interpolated?: boolean
 }
 
 export interface JobTracks {
   frames: TrackFrame[]
 }
 
+
+// Columnar binary track layout served for
+// `Accept: application/vnd.surf-coach.tracks`
+export const TRACKS_BINARY_MEDIA_TYPE = 'application/vnd.surf-coach.tracks'
+
+export interface TrackColumns {
+  frames: Int32Array
+  trackIds: Int32Array
+  bboxes: Float32Array // x1, y1, x2, y2 per frame
+  centroids: Float32Array // x, y per frame
+  interpolated: Uint8Array // 1 where filled in between detections
+}
+
+export function decodeTrackColumns(buffer: ArrayBuffer): TrackColumns {
+  const header = new DataView(buffer, 0, 16)
+  const magic = String.fromCharCode(
+    header.getUint8(0),
+    header.getUint8(1),
+    header.getUint8(2),
+    header.getUint8(3)
+  )
+  const version = header.getUint32(4, true)
+  if (magic !== 'SCTK' || (version !== 1 && version !== 2)) {
+    throw new Error('Unsupported track encoding')
+  }
+  const count = header.getUint32(8, true)
+
+  let offset = 16
+  const frames = new Int32Array(buffer, offset, count)
+  offset += count * 4
+  const trackIds = new Int32Array(buffer, offset, count)
+  offset += count * 4
+  const bboxes = new Float32Array(buffer, offset, count * 4)
+  offset += count * 16
+  const centroids = new Float32Array(buffer, offset, count * 2)
+  offset += count * 8
+  const interpolated =
+    version >= 2 ? new Uint8Array(buffer, offset, count) : new Uint8Array(count)
+
+  return { frames, trackIds, bboxes, centroids, interpolated }
+}
+
+export interface ThumbnailTile {
+  timestamp: number
+  x: number
+  y: number
+}
+
+export interface ThumbnailIndex {
+  sprite: string
+  tileWidth: number
+  tileHeight: number
+  columns: number
+  interval: number
+  tiles: ThumbnailTile[]
+}
+
+export interface UploadSession {
+  uploadId: string
+  filename: string
+  size: number // declared total, bytes
+  offset: number // bytes received so far; the next PUT starts here
+  chunkSize: number // suggested bytes per PUT
+  surferId?: string
+  jobId?: string // set once finalized
+}
+
+export interface TrendBucket {
+  periodStart: string // ISO date of the day, week (Monday) or month
+  count: number // jobs in the period with the metric defined
+  mean: number
+  min: number
+  max: number
+}
+
+export interface MetricTrend {
+  metric: keyof JobResults['metrics']
+  period: 'day' | 'week' | 'month'
+  surferId?: string // absent: every surfer's jobs
+  buckets: TrendBucket[]
+}